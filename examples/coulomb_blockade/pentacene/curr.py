@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 
+import os
 import pickle
+import time
 from argparse import ArgumentParser
 from pathlib import Path
 
@@ -9,6 +11,8 @@ from ase.units import _e, _hplanck, kB
 
 G0 = 2.0 * _e**2 / _hplanck
 
+CURRENT_DIRNAME = "current_folder"
+
 
 def natural_sort(filepath: Path) -> float:
     """docstring"""
@@ -61,6 +65,25 @@ def numerical_derivative(x, y):
     return dy_dx
 
 
+def compute_dmu_current(
+    bias: np.ndarray,
+    energies: np.ndarray,
+    filepath: Path,
+    temperature: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Compute the current and its derivative from a transmission file."""
+
+    transmission = np.load(filepath)
+
+    # transmission on its own (non-uniform) energy grid
+    if transmission.ndim == 2:
+        energies, transmission = transmission
+
+    current = get_current(bias, energies, transmission, temperature)
+
+    return current, numerical_derivative(bias, current)
+
+
 def compute_current(
     energies: np.ndarray,
     V_min=-2.5,
@@ -82,23 +105,86 @@ def compute_current(
         files.append(file)
 
     bias = np.linspace(V_min, V_max, int((V_max - V_min) / dV) + 1)
-    transmissions = np.asarray([np.load(fn) for fn in files])
 
     energies = energies.real
 
-    current = np.asarray(
-        [
-            get_current(bias, energies, transmission, temperature)
-            for transmission in transmissions
-        ]
-    )
+    results = [compute_dmu_current(bias, energies, fn, temperature) for fn in files]
 
-    derivative = np.asarray([numerical_derivative(bias, i) for i in current])
+    current = np.asarray([current for current, _ in results])
+    derivative = np.asarray([derivative for _, derivative in results])
 
     np.save(output_dir / "current.npy", current)
     np.save(output_dir / "derivative.npy", derivative)
 
 
+def stream_current(
+    energies: np.ndarray,
+    done_filepath: str,
+    V_min=-2.5,
+    V_max=2.5,
+    dV=0.1,
+    temperature=300.0,
+    poll_interval=1.0,
+    idle_timeout=None,
+    transmission_folder_path="transmission_folder",
+) -> None:
+    """Compute the current of each transmission file as soon as it is written.
+
+    The current and its derivative are stacked in a file per dmu value, such that
+    a partial map is available while the transmission is still running. Stops
+    once the file at `done_filepath` exists and all transmission files are
+    processed, the transmission marking its end even if it fails. By default,
+    waits as long as the job runs, as the time between two transmission files
+    grows with the number of energies. Otherwise, fails if no transmission file
+    is written for `idle_timeout` seconds.
+    """
+
+    output_dir = Path("results")
+    current_dir = output_dir / CURRENT_DIRNAME
+    current_dir.mkdir(parents=True, exist_ok=True)
+
+    bias = np.linspace(V_min, V_max, int((V_max - V_min) / dV) + 1)
+
+    energies = energies.real
+
+    processed = set()
+    last_activity = time.monotonic()
+
+    while True:
+        # checked first, such that the last written files are not missed
+        done = Path(done_filepath).exists()
+
+        for filepath in Path(transmission_folder_path).glob("dmu_*"):
+            if filepath.name in processed:
+                continue
+
+            current, derivative = compute_dmu_current(
+                bias,
+                energies,
+                filepath,
+                temperature,
+            )
+
+            temp_filepath = current_dir / f".{filepath.name}"
+            with open(temp_filepath, "wb") as file:
+                np.save(file, np.stack((current, derivative)))
+            os.replace(temp_filepath, current_dir / filepath.name)
+
+            processed.add(filepath.name)
+            last_activity = time.monotonic()
+
+        if done:
+            break
+
+        if idle_timeout is not None and time.monotonic() - last_activity > idle_timeout:
+            raise TimeoutError(
+                f"No transmission file written in {idle_timeout} seconds, and "
+                f"{done_filepath} does not exist"
+            )
+
+        time.sleep(poll_interval)
+
+
 if __name__ == "__main__":
     """docstring"""
 
@@ -122,6 +208,13 @@ if __name__ == "__main__":
         help="path to folder containing transmission files",
     )
 
+    parser.add_argument(
+        "-df",
+        "--done-filepath",
+        help="path to the file marking the end of the transmission; if provided, "
+        "transmission files are processed as they are written",
+    )
+
     args = parser.parse_args()
 
     input_dir = Path("inputs")
@@ -131,8 +224,16 @@ if __name__ == "__main__":
 
     energies = np.load(args.energies_filepath)
 
-    compute_current(
-        energies,
-        transmission_folder_path=args.transmission_folder_path,
-        **parameters,
-    )
+    if args.done_filepath is not None:
+        stream_current(
+            energies,
+            args.done_filepath,
+            transmission_folder_path=args.transmission_folder_path,
+            **parameters,
+        )
+    else:
+        compute_current(
+            energies,
+            transmission_folder_path=args.transmission_folder_path,
+            **parameters,
+        )
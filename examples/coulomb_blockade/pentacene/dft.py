@@ -3,10 +3,15 @@
 from __future__ import annotations
 
 import pickle
-from argparse import ArgumentParser
+from argparse import ArgumentParser, BooleanOptionalAction
 from pathlib import Path
 
 import numpy as np
+from aiida_quantum_transport.formats import (
+    write_hamiltonian,
+    write_lcao_bundle,
+    write_manifest,
+)
 from ase.atoms import Atoms
 from gpaw import GPAW
 from gpaw.lcao.tools import get_lcao_hamiltonian
@@ -17,13 +22,23 @@ def run_gpaw(
     structure: Atoms,
     kpoints: np.ndarray,
     parameters: dict,
+    hamiltonian_threshold=0.0,
+    compress=True,
+    restart_filepath=None,
+    lcao_bundle=False,
 ) -> None:
     """docstring"""
 
     output_dir = Path("results")
     output_dir.mkdir(exist_ok=True)
 
-    calc = GPAW(kpts=kpoints, txt=output_dir / "log.txt", **parameters)
+    if restart_filepath is None:
+        calc = GPAW(kpts=kpoints, txt=output_dir / "log.txt", **parameters)
+    else:
+        # seed the SCF with the density of the previous run; parameters that
+        # invalidate it (e.g., the basis or grid) make GPAW start from scratch
+        calc = GPAW(restart_filepath, txt=output_dir / "log.txt")
+        calc.set(kpts=kpoints, **parameters)
 
     structure.set_calculator(calc)
     structure.get_potential_energy()
@@ -38,8 +53,31 @@ def run_gpaw(
 
     if rank == 0:
         H_kMM = H_skMM[0]
+
+        filenames = ["restart.gpw", "hs.npz"]
+
+        if lcao_bundle:
+            nao_a = np.array([setup.nao for setup in calc.wfs.setups])
+            write_lcao_bundle(
+                output_dir / "lcao.npz",
+                H_kMM[0],
+                S_kMM[0],
+                fermi_level=fermi,
+                nao_a=nao_a,
+                atoms=structure,
+                compress=compress,
+            )
+            filenames.append("lcao.npz")
+
         H_kMM -= fermi * S_kMM
-        np.save(output_dir / "hs.npy", (H_kMM, S_kMM))
+        write_hamiltonian(
+            output_dir / "hs.npz",
+            H_kMM,
+            S_kMM,
+            threshold=hamiltonian_threshold,
+            compress=compress,
+        )
+        write_manifest(output_dir, filenames)
 
 
 if __name__ == "__main__":
@@ -65,6 +103,35 @@ if __name__ == "__main__":
         help="name of pickled parameters file",
     )
 
+    parser.add_argument(
+        "-ht",
+        "--hamiltonian-threshold",
+        type=float,
+        default=0.0,
+        help="magnitude at or below which hamiltonian elements are dropped",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--compress",
+        action=BooleanOptionalAction,
+        default=True,
+        help="if the hamiltonian file should be compressed",
+    )
+
+    parser.add_argument(
+        "-rf",
+        "--restart-filepath",
+        help="path to the gpaw restart file of a previous run to start from",
+    )
+
+    parser.add_argument(
+        "-lb",
+        "--lcao-bundle",
+        action="store_true",
+        help="if the lcao bundle for the localization should be written",
+    )
+
     args = parser.parse_args()
 
     input_dir = Path("inputs")
@@ -78,4 +145,12 @@ if __name__ == "__main__":
     with open(input_dir / args.parameters_filename, "rb") as file:
         parameters = pickle.load(file)
 
-    run_gpaw(structure, kpoints, parameters)
+    run_gpaw(
+        structure,
+        kpoints,
+        parameters,
+        hamiltonian_threshold=args.hamiltonian_threshold,
+        compress=args.compress,
+        restart_filepath=args.restart_filepath,
+        lcao_bundle=args.lcao_bundle,
+    )
@@ -2,7 +2,9 @@
 
 from __future__ import annotations
 
+import os
 import pickle
+import shutil
 from argparse import ArgumentParser, BooleanOptionalAction
 from pathlib import Path
 
@@ -17,6 +19,14 @@ DELTA_DIRNAME = "delta_folder"
 SIGMA_DIRNAME = "sigma_folder"
 
 
+def save(filepath: Path, array: np.ndarray) -> None:
+    """Save an array atomically, such that a killed job leaves no partial file."""
+    temp_filepath = filepath.with_name(f".{filepath.name}")
+    with open(temp_filepath, "wb") as file:
+        np.save(file, array)
+    os.replace(temp_filepath, filepath)
+
+
 def run_dmft(
     device: Atoms,
     scattering_region: np.ndarray,
@@ -35,10 +45,19 @@ def run_dmft(
     dmu_min=0.0,
     dmu_max=0.9,
     dmu_step=1.0,
-    inner_max_iter=1000,  # TODO check restart feature
+    number_of_chunks=1,
+    chunk_index=0,
+    inner_max_iter=1000,
     outer_max_iter=1000,
+    restart_dir: Path | None = None,
 ) -> None:
-    """docstring"""
+    """docstring
+
+    The delta of each dmu point is checkpointed after every solver run, and its
+    sigma saved only once converged. Given the `restart_dir` of a previous run
+    (its delta and sigma folders), points with a sigma file are carried over
+    as is, while the others resume from their last delta.
+    """
 
     output_dir = Path("results")
     output_dir.mkdir(exist_ok=True)
@@ -120,46 +139,75 @@ def run_dmft(
         """docstring"""
         L, ne = sigma_diag.shape
         sigma = np.zeros((ne, L, L), complex)
+        for diag, mat in zip(sigma_diag.T, sigma):
+            mat.flat[:: (L + 1)] = diag
+        save(sigma_dir / f"dmu_{dmu:1.4f}.npy", sigma)
+
+    number_of_steps = int((dmu_max - dmu_min) / dmu_step + 1)
+    dmu_values = np.linspace(dmu_min, dmu_max, number_of_steps)
 
-        def save():
-            """docstring"""
-            for diag, mat in zip(sigma_diag.T, sigma):
-                mat.flat[:: (L + 1)] = diag
-            np.save(sigma_dir / f"dmu_{dmu:1.4f}.npy", sigma)
+    # only the points of this chunk of the sweep (all points by default)
+    dmu_values = np.array_split(dmu_values, number_of_chunks)[chunk_index]
 
-        save()
+    if outer_max_iter < inner_max_iter:
+        raise ValueError(
+            "absolute maximum iterations must be greater than internal DMFT maximum iterations"
+        )
 
-    number_of_steps = int((dmu_max - dmu_min) / dmu_step + 1)
+    unconverged = []
+
+    for dmu in dmu_values:
+        filename = f"dmu_{dmu:1.4f}.npy"
+
+        if (
+            restart_dir is not None
+            and (restart_dir / SIGMA_DIRNAME / filename).exists()
+        ):
+            print(f"Reusing converged dmu = {dmu:1.4f}")
+            shutil.copy(restart_dir / SIGMA_DIRNAME / filename, sigma_dir / filename)
+            shutil.copy(restart_dir / DELTA_DIRNAME / filename, delta_dir / filename)
+            continue
 
-    for dmu in np.linspace(dmu_min, dmu_max, number_of_steps):
         new_mu = mu + dmu
         delta = dmft.initialize(V.diagonal().mean(), Sigma, mu=new_mu)
 
-        dmft.it = 0
+        if (
+            restart_dir is not None
+            and (restart_dir / DELTA_DIRNAME / filename).exists()
+        ):
+            print(f"Restarting dmu = {dmu:1.4f} from its last delta")
+            delta = np.load(restart_dir / DELTA_DIRNAME / filename)
 
-        if outer_max_iter < inner_max_iter:
-            raise ValueError(
-                "absolute maximum iterations must be greater than internal DMFT maximum iterations"
-            )
+        dmft.it = 0
+        dmft.max_iter = inner_max_iter
+        converged = False
 
         while dmft.it < outer_max_iter:
             if dmft.it > 0:
                 print("Restarting")
             outcome = dmft.solve(delta, verbose=False)
             delta = dmft.delta
+
+            # checkpoint, to be restarted from if the job is killed
+            save(delta_dir / filename, delta)
+            if adjust_mu:
+                with open(output_dir / "mu.txt", "w") as file:
+                    file.write(str(gfloc.mu))
+
             if outcome == "converged":
                 print(f"Converged in {dmft.it} steps")
+                converged = True
                 break
             print(outcome)
             dmft.max_iter += inner_max_iter
 
-        np.save(delta_dir / f"dmu_{dmu:1.4f}.npy", dmft.delta)
+        if converged:
+            save_sigma(_Sigma(energies), dmu)
+        else:
+            unconverged.append(dmu)
 
-        if adjust_mu:
-            with open(output_dir / "mu.txt", "w") as file:
-                file.write(str(gfloc.mu))
-
-        save_sigma(_Sigma(energies), dmu)
+    if unconverged:
+        print(f"Unconverged dmu points: {unconverged}")
 
 
 if __name__ == "__main__":
@@ -238,7 +286,14 @@ if __name__ == "__main__":
         "-mf",
         "--mu-filepath",
         required=False,
-        help="path to converged mu file",
+        help="path to converged mu file (initial mu if adjusting mu)",
+    )
+
+    parser.add_argument(
+        "-rf",
+        "--restart-folder-path",
+        required=False,
+        help="path to the delta and sigma folders of a previous run",
     )
 
     args = parser.parse_args()
@@ -272,7 +327,7 @@ if __name__ == "__main__":
     occupancies = np.load(args.occupancies_filepath)
 
     if args.adjust_mu:
-        mu = 0.0
+        mu = np.loadtxt(args.mu_filepath) if args.mu_filepath else 0.0
     elif not args.mu_filepath:
         raise ValueError("missing mu file")
     else:
@@ -289,6 +344,9 @@ if __name__ == "__main__":
         occupancies,
         mu=mu,
         adjust_mu=args.adjust_mu or False,
+        restart_dir=Path(args.restart_folder_path)
+        if args.restart_folder_path
+        else None,
         **parameters,
         **sweep_parameters,
     )
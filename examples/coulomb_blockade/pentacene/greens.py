@@ -2,12 +2,24 @@
 
 from __future__ import annotations
 
+import json
 import pickle
-from argparse import ArgumentParser
+import typing as t
+from argparse import ArgumentParser, BooleanOptionalAction
 from pathlib import Path
 
 import numpy as np
+from aiida_quantum_transport.formats import (
+    CachedSelfEnergy,
+    EmbeddedSelfEnergy,
+    MirroredSelfEnergy,
+    read_hamiltonian,
+    write_block_tridiagonal,
+    write_self_energy_table,
+)
+from aiida_quantum_transport.formats.hamiltonian import get_block_offsets
 from ase.atoms import Atoms
+from ase.units import kB
 from qtpyt.base.leads import LeadSelfEnergy
 from qtpyt.basis import Basis
 from qtpyt.block_tridiag import graph_partition
@@ -15,6 +27,291 @@ from qtpyt.surface.tools import prepare_leads_matrices
 from qtpyt.tools import remove_pbc
 
 
+def is_layered(
+    m_ii: np.ndarray,
+    m_ij: np.ndarray,
+    size: int,
+    tolerance: float,
+) -> bool:
+    """Check if a principal layer repeats a smaller one, of the given size.
+
+    The layer repeats the smaller one if its onsite matrix is made of the
+    onsite block of the smaller layer, coupled only to its nearest neighbours,
+    and its coupling to the next layer is that of its last smaller layer to the
+    first smaller layer of the next one.
+    """
+    layers = m_ii.shape[0] // size
+    m00 = m_ii[:size, :size]
+    m01 = m_ii[:size, size : 2 * size]
+    expected_ii = (
+        np.kron(np.eye(layers), m00)
+        + np.kron(np.eye(layers, k=1), m01)
+        + np.kron(np.eye(layers, k=-1), m01.T.conj())
+    )
+    expected_ij = np.kron(np.eye(layers, k=1 - layers), m01)
+    return np.allclose(m_ii, expected_ii, rtol=0.0, atol=tolerance) and np.allclose(
+        m_ij, expected_ij, rtol=0.0, atol=tolerance
+    )
+
+
+def get_principal_layer_size(
+    h_ii: np.ndarray,
+    s_ii: np.ndarray,
+    h_ij: np.ndarray,
+    s_ij: np.ndarray,
+    tolerance=1e-5,
+) -> int:
+    """Get the size of the smallest principal layer of the leads.
+
+    The smallest principal layer is the smallest layer the unit cell of the
+    leads is a repetition of, still coupled only to its nearest neighbours.
+    The orbitals of the unit cell are expected to be ordered along the
+    transport direction; otherwise, the unit cell is the principal layer.
+
+    Parameters
+    ----------
+    `h_ii` : `np.ndarray`
+        The onsite Hamiltonian of the unit cell.
+    `s_ii` : `np.ndarray`
+        The onsite overlap of the unit cell.
+    `h_ij` : `np.ndarray`
+        The Hamiltonian coupling the unit cell to the next.
+    `s_ij` : `np.ndarray`
+        The overlap coupling the unit cell to the next.
+    `tolerance` : `float`
+        The (absolute) tolerance on the repeated matrix elements.
+
+    Returns
+    -------
+    `int`
+        The number of orbitals of the principal layer.
+    """
+    nao = h_ii.shape[0]
+    for size in range(1, nao // 2 + 1):
+        if nao % size == 0 and all(
+            is_layered(m_ii, m_ij, size, tolerance)
+            for m_ii, m_ij in ((h_ii, h_ij), (s_ii, s_ij))
+        ):
+            return size
+    return nao
+
+
+def get_mirror_symmetry(
+    leads: Atoms,
+    basis: dict,
+    h_ii: np.ndarray,
+    s_ii: np.ndarray,
+    h_ij: np.ndarray,
+    s_ij: np.ndarray,
+    tolerance=1e-5,
+) -> tuple[np.ndarray, np.ndarray] | None:
+    """Find the mirror of the leads exchanging their left and right ends.
+
+    The mirror planes considered are those normal to the transport direction,
+    mapping each atom of the unit cell onto one of the same species. A mirror
+    is a symmetry of the leads if, represented by the signed permutation `P`
+    of the orbitals of the unit cell, it leaves its onsite matrices unchanged
+    and maps its coupling to the next unit cell onto the coupling to the
+    previous one, i.e., `P m_ii P^T = m_ii` and `P m_ij P^T = m_ij^H`. The
+    signs of the orbitals are inferred from the overlap.
+
+    Parameters
+    ----------
+    `leads` : `Atoms`
+        The unit cell of the leads, periodic along the transport direction.
+    `basis` : `dict`
+        The number of orbitals of each species.
+    `h_ii` : `np.ndarray`
+        The onsite Hamiltonian of the unit cell.
+    `s_ii` : `np.ndarray`
+        The onsite overlap of the unit cell.
+    `h_ij` : `np.ndarray`
+        The Hamiltonian coupling the unit cell to the next.
+    `s_ij` : `np.ndarray`
+        The overlap coupling the unit cell to the next.
+    `tolerance` : `float`
+        The (absolute) tolerance on the mirrored matrix elements.
+
+    Returns
+    -------
+    `tuple[np.ndarray, np.ndarray] | None`
+        The orbital each orbital is mirrored onto and the sign it picks up, or
+        `None` if the leads are not mirror symmetric.
+    """
+
+    numbers = leads.numbers
+    positions = leads.get_scaled_positions()
+    nao_a = np.array([basis[symbol] for symbol in leads.get_chemical_symbols()])
+    offsets = get_block_offsets(nao_a)
+
+    def is_symmetric(permutation: np.ndarray, signs: np.ndarray) -> bool:
+        P = np.zeros((offsets[-1], offsets[-1]))
+        P[np.arange(offsets[-1]), permutation] = signs
+        return all(
+            np.allclose(P @ m_ii @ P.T, m_ii, rtol=0.0, atol=tolerance)
+            and np.allclose(P @ m_ij @ P.T, m_ij.T.conj(), rtol=0.0, atol=tolerance)
+            for m_ii, m_ij in ((h_ii, h_ij), (s_ii, s_ij))
+        )
+
+    for center in np.unique(np.round(positions[0, 0] + positions[:, 0], 6)):
+        mirrored = positions.copy()
+        mirrored[:, 0] = center - mirrored[:, 0]
+
+        # the atom each atom is mirrored onto, up to the periodicity
+        distances = mirrored[:, None, :] - positions[None, :, :]
+        distances -= np.round(distances)
+        matches = np.all(np.abs(distances) < 1e-3, axis=2)
+        matches &= numbers[:, None] == numbers[None, :]
+        if not np.all(matches.sum(axis=1) == 1):
+            continue
+        atom_permutation = np.argmax(matches, axis=1)
+
+        permutation = np.concatenate(
+            [np.arange(offsets[b], offsets[b + 1]) for b in atom_permutation]
+        )
+
+        # propagate the signs over the orbitals coupled by the overlap
+        signs = np.zeros(offsets[-1])
+        s_mirrored = s_ii[np.ix_(permutation, permutation)]
+        for root in range(offsets[-1]):
+            if signs[root]:
+                continue
+            signs[root] = 1.0
+            stack = [root]
+            while stack:
+                i = stack.pop()
+                for j in np.flatnonzero(np.abs(s_ii[i]) > tolerance):
+                    if not signs[j] and abs(s_mirrored[i, j]) > tolerance:
+                        ratio = s_ii[i, j] / s_mirrored[i, j]
+                        signs[j] = signs[i] * np.sign(ratio.real)
+                        stack.append(int(j))
+
+        if is_symmetric(permutation, signs):
+            return permutation, signs
+
+    return None
+
+
+def get_partition_cost(nodes: list[int]) -> int:
+    """Estimate the cost, in FLOPs, of a recursive Green's function solve.
+
+    Each block of size `n_i` costs its inversion, `n_i^3`, and the products
+    with its coupling to the next block, `n_i^2 n_{i+1} + n_i n_{i+1}^2`.
+    """
+    sizes = np.diff(nodes).astype(np.int64)
+    products = sizes[:-1] * sizes[1:] * (sizes[:-1] + sizes[1:])
+    return int(np.sum(sizes**3) + np.sum(products))
+
+
+def partition(
+    H: np.ndarray,
+    S: np.ndarray,
+    leads_nao: int,
+    los_indices: np.ndarray | None = None,
+    threshold=1e-10,
+) -> list[int]:
+    """Partition the device into the narrowest block-tridiagonal blocks.
+
+    Past the block of the left lead, each block extends to the farthest orbital
+    coupled to the previous one, such that no coupling beyond neighbouring
+    blocks is dropped. The blocks are then merged where needed, such that the
+    last block is that of the right lead, and the local orbitals, if any, lie
+    within a single block. As merging only grows the cost of a solve, the
+    narrowest valid blocks minimize it.
+
+    Parameters
+    ----------
+    `H` : `np.ndarray`
+        The `(n, n)` Hamiltonian of the device.
+    `S` : `np.ndarray`
+        The `(n, n)` overlap of the device.
+    `leads_nao` : `int`
+        The number of orbitals of the leads, i.e., of the first and last block.
+    `los_indices` : `np.ndarray | None`
+        The indices of the local orbitals, kept within a single block.
+    `threshold` : `float`
+        The magnitude below which matrix elements are considered zero.
+
+    Returns
+    -------
+    `list[int]`
+        The boundaries (nodes) of the blocks.
+    """
+
+    nao = H.shape[0]
+    coupled = (np.abs(H) > threshold) | (np.abs(S) > threshold)
+    # the farthest orbital coupled to each orbital
+    reach = np.maximum(
+        nao - 1 - np.argmax(coupled[:, ::-1], axis=1),
+        np.arange(nao),
+    )
+
+    nodes = [0, leads_nao]
+    while nodes[-1] < nao - leads_nao:
+        start, end = nodes[-2:]
+        nodes.append(min(max(reach[start:end].max() + 1, end + 1), nao - leads_nao))
+    nodes.append(nao)
+
+    fixed = {0, leads_nao, nao - leads_nao, nao}
+
+    # a block coupled past its neighbour grows the neighbour, or, if the
+    # neighbour is bounded by the right lead, is merged with it
+    k = 0
+    while k < len(nodes) - 2:
+        if reach[nodes[k] : nodes[k + 1]].max() < nodes[k + 2]:
+            k += 1
+        elif nodes[k + 2] not in fixed:
+            del nodes[k + 2]
+        elif nodes[k + 1] not in fixed:
+            del nodes[k + 1]
+        else:
+            raise ValueError("The leads are coupled beyond their neighbouring block")
+
+    if los_indices is not None and len(los_indices):
+        first, last = np.min(los_indices), np.max(los_indices)
+        nodes = [node for node in nodes if node in fixed or not first < node <= last]
+
+    return nodes
+
+
+def tabulate_self_energies(
+    self_energies: list,
+    temperature=300.0,
+    eta=1e-4,
+    E_min=-3.0,
+    E_max=3.0,
+    E_step=1e-2,
+    matsubara_grid_size=3000,
+) -> dict:
+    """Tabulate the lead self-energies on the real and Matsubara energy grids,
+    at the broadening of the hybridization and transmission on each grid."""
+
+    energies = np.linspace(E_min, E_max, int((E_max - E_min) / E_step) + 1)
+
+    beta = 1 / (kB * temperature)
+    matsubara_energies = 1.0j * (2 * np.arange(matsubara_grid_size) + 1) * np.pi / beta
+
+    # the leads at each energy in turn, such that a mirrored lead reuses the other
+    grids = {}
+    for grid, grid_energies, grid_eta in (
+        ("real", energies, eta),
+        ("matsubara", matsubara_energies, 0.0),
+    ):
+        for _, selfenergy in self_energies:
+            selfenergy.eta = grid_eta
+        sigmas = [
+            [selfenergy.retarded(energy) for _, selfenergy in self_energies]
+            for energy in grid_energies
+        ]
+        grids[grid] = (
+            grid_energies,
+            [np.array(sigma) for sigma in zip(*sigmas)],
+            grid_eta,
+        )
+
+    return grids
+
+
 def compute_gf_parameters(
     leads: Atoms,
     device: Atoms,
@@ -24,6 +321,11 @@ def compute_gf_parameters(
     H_los: np.ndarray,
     S_los: np.ndarray,
     basis: dict,
+    self_energies_parameters: dict | None = None,
+    optimize_partition=False,
+    los_indices: np.ndarray | None = None,
+    minimize_principal_layer=False,
+    leads_symmetry="none",
 ) -> None:
     """docstring"""
 
@@ -49,10 +351,48 @@ def compute_gf_parameters(
     remove_pbc(basis_device, H_los)
     remove_pbc(basis_device, S_los)
 
-    se = [
-        LeadSelfEnergy((h_pl_ii, s_pl_ii), (h_pl_ij, s_pl_ij)),
-        LeadSelfEnergy((h_pl_ii, s_pl_ii), (h_pl_ij, s_pl_ij), id="right"),
-    ]
+    mirror = None
+    if leads_symmetry != "none":
+        mirror = get_mirror_symmetry(
+            leads,
+            basis,
+            h_pl_ii,
+            s_pl_ii,
+            h_pl_ij,
+            s_pl_ij,
+        )
+        if mirror is None and leads_symmetry == "mirror":
+            raise ValueError("The leads are not mirror symmetric")
+
+    if minimize_principal_layer:
+        nao = basis_leads.nao
+        size = get_principal_layer_size(h_pl_ii, s_pl_ii, h_pl_ij, s_pl_ij)
+        h_pl_ii, s_pl_ii = h_pl_ii[:size, :size], s_pl_ii[:size, :size]
+        h_pl_ij, s_pl_ij = h_pl_ij[-size:, :size], s_pl_ij[-size:, :size]
+
+        # coupled to the first and last layer of the outer blocks of the device
+        se: list[t.Any] = [
+            EmbeddedSelfEnergy(
+                LeadSelfEnergy((h_pl_ii, s_pl_ii), (h_pl_ij, s_pl_ij)),
+                nao,
+                0,
+            ),
+            EmbeddedSelfEnergy(
+                LeadSelfEnergy((h_pl_ii, s_pl_ii), (h_pl_ij, s_pl_ij), id="right"),
+                nao,
+                nao - size,
+            ),
+        ]
+    else:
+        se = [
+            LeadSelfEnergy((h_pl_ii, s_pl_ii), (h_pl_ij, s_pl_ij)),
+            LeadSelfEnergy((h_pl_ii, s_pl_ii), (h_pl_ij, s_pl_ij), id="right"),
+        ]
+
+    # the right self-energy derived from the left one, at the same energy
+    if mirror is not None:
+        left = CachedSelfEnergy(se[0])
+        se = [left, MirroredSelfEnergy(left, *mirror)]
 
     nodes = [
         0,
@@ -61,6 +401,21 @@ def compute_gf_parameters(
         basis_device.nao,
     ]
 
+    if optimize_partition:
+        default_cost = get_partition_cost(nodes)
+        nodes = partition(H_los[0], S_los[0], basis_leads.nao, los_indices)
+        cost = get_partition_cost(nodes)
+        with open(output_dir / "partition.json", "w") as file:
+            json.dump(
+                {
+                    "nodes": nodes,
+                    "cost": cost,
+                    "default_cost": default_cost,
+                    "savings": 1.0 - cost / default_cost,
+                },
+                file,
+            )
+
     hs_list_ii, hs_list_ij = graph_partition.tridiagonalize(
         nodes,
         H_los[0],
@@ -71,15 +426,21 @@ def compute_gf_parameters(
 
     np.save(output_dir / "leads_nao.npy", basis_leads.nao)
 
-    with open(output_dir / "hamiltonian_ii.pkl", "wb") as file:
-        pickle.dump(hs_list_ii, file)
-
-    with open(output_dir / "hamiltonian_ij.pkl", "wb") as file:
-        pickle.dump(hs_list_ij, file)
+    write_block_tridiagonal(
+        output_dir / "hamiltonian_blocks.btd",
+        hs_list_ii,
+        hs_list_ij,
+    )
 
     with open(output_dir / "self_energies.pkl", "wb") as file:
         pickle.dump(self_energies, file)
 
+    if self_energies_parameters is not None:
+        write_self_energy_table(
+            output_dir / "self_energies_table.set",
+            tabulate_self_energies(self_energies, **self_energies_parameters),
+        )
+
 
 if __name__ == "__main__":
     """docstring"""
@@ -122,6 +483,44 @@ if __name__ == "__main__":
         help="path to local orbitals hamiltonian file",
     )
 
+    parser.add_argument(
+        "-sepf",
+        "--self-energies-parameters-filename",
+        help="name of self-energies tabulation parameters file; if provided, "
+        "the lead self-energies are tabulated on the energy grids",
+    )
+
+    parser.add_argument(
+        "-op",
+        "--optimize-partition",
+        action=BooleanOptionalAction,
+        help="if the device should be partitioned into the narrowest blocks, "
+        "rather than a single central block",
+    )
+
+    parser.add_argument(
+        "-mpl",
+        "--minimize-principal-layer",
+        action=BooleanOptionalAction,
+        help="if the principal layer of the leads should be reduced to the "
+        "smallest layer their unit cell repeats, rather than the unit cell",
+    )
+
+    parser.add_argument(
+        "-ls",
+        "--leads-symmetry",
+        choices=["none", "auto", "mirror"],
+        default="none",
+        help="if the right lead self-energy should be mirrored from the left one; "
+        "`auto` if the leads are found mirror symmetric, `mirror` if asserted",
+    )
+
+    parser.add_argument(
+        "-loif",
+        "--los-indices-filepath",
+        help="path to local orbitals index file, kept within a single block",
+    )
+
     args = parser.parse_args()
 
     input_dir = Path("inputs")
@@ -138,9 +537,18 @@ if __name__ == "__main__":
     with open(input_dir / args.basis_filename, "rb") as file:
         basis = pickle.load(file)
 
-    H_leads, S_leads = np.load(args.leads_hamiltonian_filepath)
+    self_energies_parameters = None
+    if args.self_energies_parameters_filename:
+        with open(input_dir / args.self_energies_parameters_filename, "rb") as file:
+            self_energies_parameters = pickle.load(file)
+
+    H_leads, S_leads = read_hamiltonian(args.leads_hamiltonian_filepath)
+
+    H_los, S_los = read_hamiltonian(args.los_hamiltonian_filepath)
 
-    H_los, S_los = np.load(args.los_hamiltonian_filepath)
+    los_indices = None
+    if args.los_indices_filepath:
+        los_indices = np.load(args.los_indices_filepath)
 
     compute_gf_parameters(
         leads,
@@ -151,4 +559,9 @@ if __name__ == "__main__":
         H_los,
         S_los,
         basis,
+        self_energies_parameters,
+        optimize_partition=bool(args.optimize_partition),
+        los_indices=los_indices,
+        minimize_principal_layer=bool(args.minimize_principal_layer),
+        leads_symmetry=args.leads_symmetry,
     )
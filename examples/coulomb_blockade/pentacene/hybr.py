@@ -7,6 +7,11 @@ from argparse import ArgumentParser
 from pathlib import Path
 
 import numpy as np
+from aiida_quantum_transport.formats import (
+    read_block_tridiagonal,
+    read_self_energy_table,
+    tabulate_self_energies,
+)
 from ase.units import kB
 from qtpyt.block_tridiag import greenfunction
 from qtpyt.continued_fraction import get_ao_charge
@@ -103,16 +108,24 @@ if __name__ == "__main__":
         help="path to local orbitals index file",
     )
 
+    parser.add_argument(
+        "-hbf",
+        "--hamiltonian-blocks-filepath",
+        help="path to block-tridiagonal hamiltonian file",
+    )
+
     parser.add_argument(
         "-hiif",
         "--hamiltonian-ii-filepath",
-        help="path to pickled diagonal hamiltonian elements hamiltonian file",
+        help="path to pickled diagonal hamiltonian elements hamiltonian file "
+        "(legacy, if no block-tridiagonal hamiltonian file is given)",
     )
 
     parser.add_argument(
         "-hijf",
         "--hamiltonian-ij-filepath",
-        help="path to pickled off-diagonal hamiltonian elements hamiltonian file",
+        help="path to pickled off-diagonal hamiltonian elements hamiltonian file "
+        "(legacy, if no block-tridiagonal hamiltonian file is given)",
     )
 
     parser.add_argument(
@@ -121,6 +134,13 @@ if __name__ == "__main__":
         help="path to pickled self-energies file",
     )
 
+    parser.add_argument(
+        "-setf",
+        "--self-energies-table-filepath",
+        help="path to tabulated self-energies file; if provided, the lead "
+        "self-energies are looked up on its energy grids",
+    )
+
     args = parser.parse_args()
 
     input_dir = Path("inputs")
@@ -128,15 +148,27 @@ if __name__ == "__main__":
     with open(input_dir / args.parameters_filename, "rb") as file:
         parameters = pickle.load(file)
 
-    with open(args.hamiltonian_ii_filepath, "rb") as file:
-        hs_list_ii = pickle.load(file)
+    if args.hamiltonian_blocks_filepath:
+        # memory-mapped, such that the ranks of a node share the blocks
+        hs_list_ii, hs_list_ij = read_block_tridiagonal(
+            args.hamiltonian_blocks_filepath
+        )
+    else:
+        with open(args.hamiltonian_ii_filepath, "rb") as file:
+            hs_list_ii = pickle.load(file)
 
-    with open(args.hamiltonian_ij_filepath, "rb") as file:
-        hs_list_ij = pickle.load(file)
+        with open(args.hamiltonian_ij_filepath, "rb") as file:
+            hs_list_ij = pickle.load(file)
 
     with open(args.self_energies_filepath, "rb") as file:
         self_energies = pickle.load(file)
 
+    if args.self_energies_table_filepath:
+        self_energies = tabulate_self_energies(
+            self_energies,
+            read_self_energy_table(args.self_energies_table_filepath),
+        )
+
     los_indices = np.load(args.los_indices_filepath)
 
     hybridize_orbitals(
@@ -7,56 +7,163 @@ from argparse import ArgumentParser, BooleanOptionalAction
 from pathlib import Path
 
 import numpy as np
+from aiida_quantum_transport.formats import (
+    read_lcao_bundle,
+    write_hamiltonian,
+    write_manifest,
+)
+from aiida_quantum_transport.formats.hamiltonian import get_block_offsets
+from ase.atoms import Atoms
 from gpaw import restart
 from gpaw.lcao.pwf2 import LCAOwrap
 from qtpyt.basis import Basis
 from qtpyt.lo.tools import lowdin_rotation, rotate_matrix, subdiagonalize_atoms
 
 
-def localize_orbitals(
+def load_restart(
     restart_filepath: str,
+) -> tuple[Atoms, np.ndarray, np.ndarray, np.ndarray, float]:
+    """docstring"""
+
+    atoms, calc = restart(restart_filepath, txt=None)
+    lcao = LCAOwrap(calc)
+
+    nao_a = np.array([setup.nao for setup in calc.wfs.setups])
+    fermi = calc.get_fermi_level()
+
+    return atoms, nao_a, lcao.get_hamiltonian(), lcao.get_overlap(), fermi
+
+
+def load_lcao_bundle(
+    lcao_bundle_filepath: str,
+) -> tuple[Atoms, np.ndarray, np.ndarray, np.ndarray, float]:
+    """docstring"""
+
+    bundle = read_lcao_bundle(lcao_bundle_filepath)
+
+    atoms = Atoms(
+        numbers=bundle["numbers"],
+        positions=bundle["positions"],
+        cell=bundle["cell"],
+        pbc=bundle["pbc"],
+    )
+
+    return atoms, bundle["nao"], bundle["H"], bundle["S"], bundle["fermi_level"]
+
+
+def is_block_rotation(U: np.ndarray, blocks: list[np.ndarray]) -> bool:
+    """docstring"""
+
+    # block-diagonal on the blocks and identity elsewhere, checked without
+    # allocating arrays of the size of the matrix
+    outside = np.setdiff1d(np.arange(U.shape[0]), np.concatenate(blocks))
+
+    nonzero = sum(np.count_nonzero(U[np.ix_(block, block)]) for block in blocks)
+
+    return np.count_nonzero(U) == nonzero + outside.size and bool(
+        np.all(U[outside, outside] == 1.0)
+    )
+
+
+def rotate_blocks(
+    M: np.ndarray,
+    U: np.ndarray,
+    blocks: list[np.ndarray],
+) -> np.ndarray:
+    """docstring"""
+
+    # U^H M U for U block-diagonal on the disjoint blocks and identity
+    # elsewhere only touches the rows and columns of the blocks, at O(n nb^2)
+    # per block rather than O(n^3)
+    if not is_block_rotation(U, blocks):
+        return rotate_matrix(M, U)
+
+    M = M.astype(np.result_type(M, U))
+
+    for block in blocks:
+        U_b = U[np.ix_(block, block)]
+        M[block, :] = U_b.T.conj() @ M[block, :]
+        M[:, block] = M[:, block] @ U_b
+
+    return M
+
+
+def localize_orbitals(
+    restart_filepath: str | None,
     scattering_region: np.ndarray,
     active: dict,
     lowdin=False,
+    hamiltonian_threshold=0.0,
+    compress=True,
+    lcao_bundle_filepath=None,
+    block_sparse=False,
+    variants=None,
 ) -> None:
     """docstring"""
 
     output_dir = Path("results")
     output_dir.mkdir(exist_ok=True)
 
-    atoms, calc = restart(restart_filepath, txt=None)
-    lcao = LCAOwrap(calc)
+    if lcao_bundle_filepath is not None:
+        atoms, nao_a, H, S, fermi = load_lcao_bundle(lcao_bundle_filepath)
+    elif restart_filepath is not None:
+        atoms, nao_a, H, S, fermi = load_restart(restart_filepath)
+    else:
+        raise ValueError("Either a restart file or an LCAO bundle is required")
 
-    nao_a = np.array([setup.nao for setup in calc.wfs.setups])
     basis = Basis(atoms, nao_a)
 
     basis_p = basis[scattering_region]
     index_p = basis_p.get_indices()
-    index_c = basis_p.extract().take(active)
 
-    fermi = calc.get_fermi_level()
-    H = lcao.get_hamiltonian()
-    S = lcao.get_overlap()
     H -= fermi * S
 
+    # the subdiagonalization is shared by the variants, which differ only by
+    # the signs of their active orbitals and the lowdin rotation
     Usub, _ = subdiagonalize_atoms(basis, H, S, a=scattering_region)
 
-    # Positive projection onto p-z AOs
-    for idx_lo in index_p[index_c]:
-        if Usub[idx_lo - 1, idx_lo] < 0.0:  # change sign
-            Usub[:, idx_lo] *= -1
+    # the subdiagonalization only mixes the orbitals of each atom
+    offsets = get_block_offsets(nao_a)
+    atom_blocks = [np.arange(offsets[a], offsets[a + 1]) for a in scattering_region]
+
+    H = rotate_blocks(H, Usub, atom_blocks)
+    S = rotate_blocks(S, Usub, atom_blocks)
 
-    H = rotate_matrix(H, Usub)
-    S = rotate_matrix(S, Usub)
+    variant_dirs: dict[Path, dict] = {output_dir: {}}
+    for name, variant in (variants or {}).items():
+        variant_dirs[output_dir / "variants" / name] = variant
 
-    if lowdin:
-        Ulow = lowdin_rotation(H, S, index_p[index_c])
+    for variant_dir, variant in variant_dirs.items():
+        variant_dir.mkdir(parents=True, exist_ok=True)
 
-        H = rotate_matrix(H, Ulow)
-        S = rotate_matrix(S, Ulow)
+        index_c = basis_p.extract().take(variant.get("active", active))
+        index_lo = index_p[index_c]
 
-    np.save(output_dir / "idx_los.npy", index_p[index_c])
-    np.save(output_dir / "hs_los.npy", (H[None, ...], S[None, ...]))
+        # Positive projection onto p-z AOs
+        sign = np.ones(len(H))
+        sign[[idx for idx in index_lo if Usub[idx - 1, idx] < 0.0]] = -1.0
+
+        H_lo = sign[:, None] * H * sign[None, :]
+        S_lo = sign[:, None] * S * sign[None, :]
+
+        if variant.get("lowdin", lowdin):
+            Ulow = lowdin_rotation(H_lo, S_lo, index_lo)
+
+            # the lowdin rotation only mixes the active orbitals
+            H_lo = rotate_blocks(H_lo, Ulow, [index_lo])
+            S_lo = rotate_blocks(S_lo, Ulow, [index_lo])
+
+        np.save(variant_dir / "idx_los.npy", index_lo)
+        write_hamiltonian(
+            variant_dir / "hs_los.npz",
+            H_lo[None, ...],
+            S_lo[None, ...],
+            threshold=hamiltonian_threshold,
+            compress=compress,
+            block_sizes=nao_a if block_sparse else None,
+        )
+
+    write_manifest(output_dir)
 
 
 if __name__ == "__main__":
@@ -70,6 +177,12 @@ if __name__ == "__main__":
         help="path to gpaw restart file",
     )
 
+    parser.add_argument(
+        "-lbf",
+        "--lcao-bundle-filepath",
+        help="path to lcao bundle file, used instead of the restart file",
+    )
+
     parser.add_argument(
         "-af",
         "--active-species-filename",
@@ -89,6 +202,35 @@ if __name__ == "__main__":
         help="if lowdin rotation should be used",
     )
 
+    parser.add_argument(
+        "-ht",
+        "--hamiltonian-threshold",
+        type=float,
+        default=0.0,
+        help="magnitude at or below which hamiltonian elements are dropped",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--compress",
+        action=BooleanOptionalAction,
+        default=True,
+        help="if the hamiltonian file should be compressed",
+    )
+
+    parser.add_argument(
+        "-bs",
+        "--block-sparse",
+        action="store_true",
+        help="if the hamiltonian file should keep the atom block-sparse layout",
+    )
+
+    parser.add_argument(
+        "-vf",
+        "--variants-filename",
+        help="name of pickled variants file",
+    )
+
     args = parser.parse_args()
 
     input_dir = Path("inputs")
@@ -98,9 +240,19 @@ if __name__ == "__main__":
 
     region = np.load(args.scattering_region_filepath)
 
+    variants = None
+    if args.variants_filename:
+        with open(input_dir / args.variants_filename, "rb") as file:
+            variants = pickle.load(file)
+
     localize_orbitals(
         args.restart_filepath,
         region,
         active,
         lowdin=args.lowdin or False,
+        hamiltonian_threshold=args.hamiltonian_threshold,
+        compress=args.compress,
+        lcao_bundle_filepath=args.lcao_bundle_filepath,
+        block_sparse=args.block_sparse,
+        variants=variants,
     )
@@ -2,11 +2,18 @@
 
 from __future__ import annotations
 
+import os
 import pickle
-from argparse import ArgumentParser
+from argparse import ArgumentParser, BooleanOptionalAction
 from pathlib import Path
 
 import numpy as np
+from aiida_quantum_transport.formats import (
+    read_block_tridiagonal,
+    read_self_energy_table,
+    refine_energy_grid,
+    tabulate_self_energies,
+)
 from qtpyt.base.selfenergy import DataSelfEnergy as BaseDataSelfEnergy
 from qtpyt.block_tridiag import greenfunction
 from qtpyt.parallel import comm
@@ -16,9 +23,34 @@ from qtpyt.projector import expand
 TRANSMISSION_DIRNAME = "transmission_folder"
 
 
+def save(filepath: Path, array: np.ndarray) -> None:
+    """Save an array atomically, such that readers only see complete files."""
+    temp_filepath = filepath.with_name(f".{filepath.name}")
+    with open(temp_filepath, "wb") as file:
+        np.save(file, array)
+    os.replace(temp_filepath, filepath)
+
+
+def interpolate_self_energy(
+    energy: float,
+    energies: np.ndarray,
+    sigma: np.ndarray,
+) -> np.ndarray:
+    """Linearly interpolate a tabulated self-energy at the given energy."""
+    index = np.clip(np.searchsorted(energies, energy), 1, energies.size - 1)
+    weight = (energy - energies[index - 1]) / (energies[index] - energies[index - 1])
+    return (1.0 - weight) * sigma[index - 1] + weight * sigma[index]
+
+
+def get_los_block(hs_list_ii, los_indices: np.ndarray) -> tuple[int, np.ndarray]:
+    """Get the block holding the local orbitals, and their indices within it."""
+    offsets = np.cumsum([0] + [h.shape[0] for h, _ in hs_list_ii])
+    block = int(np.searchsorted(offsets, np.min(los_indices), side="right")) - 1
+    return block, los_indices - offsets[block]
+
+
 def compute_transmission(
     los_indices: np.ndarray,
-    leads_nao: np.ndarray,
     hs_list_ii,
     hs_list_ij,
     self_energies,
@@ -27,7 +59,12 @@ def compute_transmission(
     E_min=-3.0,
     E_max=3.0,
     E_step=1e-2,
+    adaptive=False,
+    E_coarse_step=1e-1,
+    refinement_tolerance=1e-3,
+    max_refinement_depth=10,
     sigma_folder_path="sigma_folder",
+    dft_transmission=True,
 ) -> None:
     """docstring"""
 
@@ -47,8 +84,9 @@ def compute_transmission(
 
     energies = np.linspace(E_min, E_max, int((E_max - E_min) / E_step) + 1)
 
-    i1 = los_indices - leads_nao
-    s1 = hs_list_ii[1][1]
+    # the block the dmft self-energy is embedded into
+    b1, i1 = get_los_block(hs_list_ii, los_indices)
+    s1 = hs_list_ii[b1][1]
 
     class DataSelfEnergy(BaseDataSelfEnergy):
         """Wrapper"""
@@ -56,22 +94,56 @@ def compute_transmission(
         def retarded(self, energy):
             return expand(s1, super().retarded(energy), i1)
 
-    def run(filepath: Path):
+    class InterpolatedDataSelfEnergy(BaseDataSelfEnergy):
+        """Wrapper interpolating the self-energy off its energy grid"""
+
+        def __init__(self, energies, sigma):
+            super().__init__(energies, sigma)
+            self.sigma_energies = energies
+            self.sigma = sigma
+
+        def retarded(self, energy):
+            sigma = interpolate_self_energy(energy, self.sigma_energies, self.sigma)
+            return expand(s1, sigma, i1)
+
+    def get_transmission(energies: np.ndarray) -> np.ndarray:
         gd = GridDesc(energies, 1, float)
         T = np.empty(gd.energies.size)
 
         for e, energy in enumerate(gd.energies):
             T[e] = gf.get_transmission(energy)
 
-        T = gd.gather_energies(T)
+        return gd.gather_energies(T)
 
+    def run(filepath: Path):
+        if not adaptive:
+            T = get_transmission(energies)
+            if comm.rank == 0:
+                save(filepath, T.real)
+            return
+
+        # all ranks take part in deciding on the refinement
+        E, T = refine_energy_grid(
+            lambda energies: comm.bcast(get_transmission(energies).real, root=0),
+            E_min,
+            E_max,
+            E_coarse_step,
+            refinement_tolerance,
+            max_refinement_depth,
+        )
+
+        # non-uniform grid, stored alongside the transmission
         if comm.rank == 0:
-            np.save(filepath, T.real)
+            save(filepath, np.stack((E, T)))
+
+    if dft_transmission:
+        run(output_dir / "transmission_dft.npy")
+
+    SelfEnergy = InterpolatedDataSelfEnergy if adaptive else DataSelfEnergy
 
-    run(output_dir / "transmission_dft.npy")
     for filepath in Path(sigma_folder_path).glob("dmu_*"):
-        dmft_self_energy = DataSelfEnergy(energies, np.load(filepath))
-        gf.selfenergies.append((1, dmft_self_energy))
+        dmft_self_energy = SelfEnergy(energies, np.load(filepath))
+        gf.selfenergies.append((b1, dmft_self_energy))
         run(transmission_dir / filepath.name)
         gf.selfenergies.pop()
 
@@ -94,21 +166,23 @@ if __name__ == "__main__":
     )
 
     parser.add_argument(
-        "-lnf",
-        "--leads-nao-filepath",
-        help="path to leads nao file",
+        "-hbf",
+        "--hamiltonian-blocks-filepath",
+        help="path to block-tridiagonal hamiltonian file",
     )
 
     parser.add_argument(
         "-hiif",
         "--hamiltonian-ii-filepath",
-        help="path to pickled diagonal hamiltonian elements hamiltonian file",
+        help="path to pickled diagonal hamiltonian elements hamiltonian file "
+        "(legacy, if no block-tridiagonal hamiltonian file is given)",
     )
 
     parser.add_argument(
         "-hijf",
         "--hamiltonian-ij-filepath",
-        help="path to pickled off-diagonal hamiltonian elements hamiltonian file",
+        help="path to pickled off-diagonal hamiltonian elements hamiltonian file "
+        "(legacy, if no block-tridiagonal hamiltonian file is given)",
     )
 
     parser.add_argument(
@@ -117,38 +191,73 @@ if __name__ == "__main__":
         help="path to pickled self-energies file",
     )
 
+    parser.add_argument(
+        "-setf",
+        "--self-energies-table-filepath",
+        help="path to tabulated self-energies file; if provided, the lead "
+        "self-energies are looked up on its energy grids",
+    )
+
     parser.add_argument(
         "-sfp",
         "--sigma-folder-path",
         help="path to folder containing self-energy files",
     )
 
-    args = parser.parse_args()
-
-    input_dir = Path("inputs")
-
-    with open(input_dir / args.parameters_filename, "rb") as file:
-        parameters = pickle.load(file)
-
-    with open(args.hamiltonian_ii_filepath, "rb") as file:
-        hs_list_ii = pickle.load(file)
-
-    with open(args.hamiltonian_ij_filepath, "rb") as file:
-        hs_list_ij = pickle.load(file)
-
-    with open(args.self_energies_filepath, "rb") as file:
-        self_energies = pickle.load(file)
+    parser.add_argument(
+        "-dt",
+        "--dft-transmission",
+        action=BooleanOptionalAction,
+        help="if the transmission without dmft self-energy should be computed",
+    )
 
-    los_indices = np.load(args.los_indices_filepath)
+    parser.add_argument(
+        "-df",
+        "--done-filepath",
+        help="path to the file marking the end of the transmission",
+    )
 
-    leads_nao = np.load(args.leads_nao_filepath)
+    args = parser.parse_args()
 
-    compute_transmission(
-        los_indices,
-        leads_nao,
-        hs_list_ii,
-        hs_list_ij,
-        self_energies,
-        **parameters,
-        sigma_folder_path=args.sigma_folder_path,
-    )
+    # releases any process watching the transmission folder, also on failure
+    try:
+        input_dir = Path("inputs")
+
+        with open(input_dir / args.parameters_filename, "rb") as file:
+            parameters = pickle.load(file)
+
+        if args.hamiltonian_blocks_filepath:
+            # memory-mapped, such that the ranks of a node share the blocks
+            hs_list_ii, hs_list_ij = read_block_tridiagonal(
+                args.hamiltonian_blocks_filepath
+            )
+        else:
+            with open(args.hamiltonian_ii_filepath, "rb") as file:
+                hs_list_ii = pickle.load(file)
+
+            with open(args.hamiltonian_ij_filepath, "rb") as file:
+                hs_list_ij = pickle.load(file)
+
+        with open(args.self_energies_filepath, "rb") as file:
+            self_energies = pickle.load(file)
+
+        if args.self_energies_table_filepath:
+            self_energies = tabulate_self_energies(
+                self_energies,
+                read_self_energy_table(args.self_energies_table_filepath),
+            )
+
+        los_indices = np.load(args.los_indices_filepath)
+
+        compute_transmission(
+            los_indices,
+            hs_list_ii,
+            hs_list_ij,
+            self_energies,
+            **parameters,
+            sigma_folder_path=args.sigma_folder_path,
+            dft_transmission=args.dft_transmission is not False,
+        )
+    finally:
+        if args.done_filepath is not None and comm.rank == 0:
+            Path(args.done_filepath).touch()
@@ -12,6 +12,10 @@ __all__ = [
     "CustomCalculation",
     "DFTCalculation",
     "get_scattering_region",
+    "merge_folders",
+    "build_sweep_grid",
+    "stack_current",
+    "build_performance_report",
     "LocalizationCalculation",
     "GreensFunctionParametersCalculation",
     "HybridizationCalculation",
@@ -1,13 +1,65 @@
 from __future__ import annotations
 
+import typing as t
+from glob import has_magic
+from pathlib import PurePosixPath
+
+import plumpy
+from aiida import orm
+from aiida.common import timezone
+from aiida.common.datastructures import CalcJobState
 from aiida.engine import CalcJob
 
+from aiida_quantum_transport.formats import MANIFEST_FILENAME
+
+# the extra holding the time each phase of a calculation was entered
+PHASE_TIMESTAMPS_EXTRA = "phase_timestamps"
+
+# the phase a waiting calculation enters, by the last state of its job
+WAITING_PHASES = {
+    None: "upload",
+    CalcJobState.UPLOADING: "upload",
+    CalcJobState.SUBMITTING: "submit",
+    CalcJobState.WITHSCHEDULER: "update",
+    CalcJobState.STASHING: "stash",
+    CalcJobState.RETRIEVING: "retrieve",
+}
+
+# how the large output files of a calculation are retrieved
+RETRIEVAL_POLICIES = ("always", "on_demand", "never")
+
+
+class OutputRule(t.NamedTuple):
+    """The retrieval rule of an output of the results directory.
+
+    Attributes
+    ----------
+    `pattern` : `str`
+        The path to the file or folder, relative to the results directory, or
+        a glob, the matches of which are collected into a folder.
+    `large` : `bool`
+        If the output is subject to the retrieval policy of the calculation.
+    `max_size` : `int | None`
+        The size in bytes above which the output is attached as a remote
+        reference rather than stored.
+    `required` : `bool`
+        If a missing output is an error.
+    """
+
+    pattern: str
+    large: bool = False
+    max_size: int | None = None
+    required: bool = True
+
 
 class BaseCalculation(CalcJob):
     """docstring"""
 
     _default_parser_name = ""
 
+    # the retrieval rules of the outputs of the results directory, by port
+    _OUTPUT_RULES: dict[str, OutputRule] = {}
+
     @classmethod
     def define(cls, spec) -> None:
         """docstring"""
@@ -27,3 +79,108 @@ class BaseCalculation(CalcJob):
 
         for port, default in _DEFAULTS.items():
             spec.inputs.get_port(port).default = default
+
+        if any(rule.large for rule in cls._OUTPUT_RULES.values()):
+            spec.input(
+                "retrieval_policy",
+                valid_type=orm.Str,
+                default=lambda: orm.Str("on_demand"),
+                validator=cls._validate_retrieval_policy,
+                help="How the large output files are retrieved: `always`, into "
+                "the repository; `on_demand`, as remote references with size and "
+                "checksum; or `never`",
+            )
+
+    @classmethod
+    def get_output_rules(cls, inputs: t.Mapping) -> dict[str, OutputRule]:
+        """Get the retrieval rules of the outputs of a calculation.
+
+        Parameters
+        ----------
+        `inputs` : `Mapping`
+            The inputs of the calculation.
+
+        Returns
+        -------
+        `dict[str, OutputRule]`
+            The retrieval rules, by output port.
+        """
+        return cls._OUTPUT_RULES
+
+    @staticmethod
+    def get_retrieval_policy(inputs: t.Mapping) -> str:
+        """Get the retrieval policy of a calculation, `always` if it has none."""
+        if "retrieval_policy" in inputs:
+            return inputs["retrieval_policy"].value
+        return "always"
+
+    @staticmethod
+    def _validate_retrieval_policy(value: orm.Str, _) -> str | None:
+        """Validate the retrieval policy."""
+        if value.value not in RETRIEVAL_POLICIES:
+            return (
+                f"unknown retrieval policy `{value.value}`; expected one of "
+                f"{', '.join(RETRIEVAL_POLICIES)}"
+            )
+        return None
+
+    def _get_retrieve_temporary_list(self) -> list[tuple[str, str, int | None]]:
+        """Get the files of the results directory to retrieve for parsing.
+
+        The files are retrieved temporarily, such that the parser stores each
+        output once, rather than alongside a copy in the retrieved folder. The
+        large outputs are left on the remote computer unless the retrieval
+        policy is `always`. Paths are retrieved to the same relative path.
+        """
+
+        policy = self.get_retrieval_policy(self.inputs)
+
+        patterns = [
+            rule.pattern
+            for rule in self.get_output_rules(self.inputs).values()
+            if not rule.large or policy == "always"
+        ]
+
+        if policy != "always":
+            patterns.append(MANIFEST_FILENAME)
+
+        retrieve_list = []
+        for pattern in patterns:
+            path = PurePosixPath("results") / pattern
+            depth = None if has_magic(pattern) else len(path.parts)
+            retrieve_list.append((path.as_posix(), ".", depth))
+
+        return retrieve_list
+
+    def on_entered(self, from_state: plumpy.process_states.State | None) -> None:
+        """Record the time the calculation enters each of its phases.
+
+        The phases are the transport tasks of the waiting state (`upload`,
+        `submit`, `update`, `stash`, `retrieve`), followed by `parse` and
+        `terminated`. The transport task is derived from the state of the job
+        recorded on the node, set as each task completes. Only the first entry
+        of each phase is kept, such that re-entering a phase after a daemon
+        restart does not reset it.
+        """
+
+        super().on_entered(from_state)
+
+        phase: str | None
+        if self.has_terminated():
+            phase = "terminated"
+        elif self.state is plumpy.ProcessState.WAITING:
+            phase = WAITING_PHASES.get(self.node.get_state())
+        elif from_state is not None and (
+            from_state.LABEL is plumpy.ProcessState.WAITING
+        ):
+            phase = "parse"
+        else:
+            phase = None
+
+        if phase is None:
+            return
+
+        timestamps = self.node.base.extras.get(PHASE_TIMESTAMPS_EXTRA, {})
+        if phase not in timestamps:
+            timestamps[phase] = timezone.now().timestamp()
+            self.node.base.extras.set(PHASE_TIMESTAMPS_EXTRA, timestamps)
@@ -7,7 +7,7 @@ from aiida import orm
 from aiida.common.datastructures import CalcInfo, CodeInfo
 from aiida.common.folders import Folder
 
-from .base import BaseCalculation
+from .base import BaseCalculation, OutputRule
 
 
 class CurrentCalculation(BaseCalculation):
@@ -15,6 +15,11 @@ class CurrentCalculation(BaseCalculation):
 
     _default_parser_name = "quantum_transport.current"
 
+    _OUTPUT_RULES = {
+        "current_file": OutputRule("current.npy"),
+        "derivative_file": OutputRule("derivative.npy"),
+    }
+
     @classmethod
     def define(cls, spec) -> None:
         """docstring"""
@@ -50,9 +55,18 @@ class CurrentCalculation(BaseCalculation):
         spec.input(
             "transmission.remote_results_folder",
             valid_type=orm.RemoteData,
+            required=False,
             help="The results folder of the transmission calculation",
         )
 
+        spec.input(
+            "transmission.transmission_folder",
+            valid_type=orm.FolderData,
+            required=False,
+            help="The (merged) transmission folder, used in place of the results "
+            "folder",
+        )
+
         spec.output(
             "remote_results_folder",
             valid_type=orm.RemoteData,
@@ -111,7 +125,14 @@ class CurrentCalculation(BaseCalculation):
         ]
 
         hybridization_data = self.inputs.hybridization.remote_results_folder
-        transmission_data = self.inputs.transmission.remote_results_folder
+        transmission_data = self.inputs.transmission.get("remote_results_folder")
+        transmission_folder = self.inputs.transmission.get("transmission_folder")
+
+        if (transmission_data is None) == (transmission_folder is None):
+            raise ValueError(
+                "Expected exactly one of `transmission.remote_results_folder` "
+                "and `transmission.transmission_folder`"
+            )
 
         if not isinstance(hybridization_data, orm.RemoteData):
             raise ValueError(
@@ -121,13 +142,14 @@ class CurrentCalculation(BaseCalculation):
         if hybridization_data.computer is None:
             raise ValueError("Missing `Computer` node for hybridization step")
 
-        if not isinstance(transmission_data, orm.RemoteData):
-            raise ValueError(
-                f"Expected `RemoteData` instance; got `{type(transmission_data)}`"
-            )
+        if transmission_data is not None:
+            if not isinstance(transmission_data, orm.RemoteData):
+                raise ValueError(
+                    f"Expected `RemoteData` instance; got `{type(transmission_data)}`"
+                )
 
-        if transmission_data.computer is None:
-            raise ValueError("Missing `Computer` node for transmission step")
+            if transmission_data.computer is None:
+                raise ValueError("Missing `Computer` node for transmission step")
 
         calcinfo = CalcInfo()
         calcinfo.codes_info = [codeinfo]
@@ -138,12 +160,25 @@ class CurrentCalculation(BaseCalculation):
                 f"{hybridization_data.get_remote_path()}/energies.npy",
                 energies_filepath,
             ),
-            (
-                transmission_data.computer.uuid,
-                f"{transmission_data.get_remote_path()}/transmission_folder",
-                transmission_folder_path,
-            ),
         ]
-        calcinfo.retrieve_list = ["results"]
+        calcinfo.retrieve_list = []
+        calcinfo.retrieve_temporary_list = self._get_retrieve_temporary_list()
+
+        if transmission_data is not None:
+            calcinfo.remote_symlink_list.append(
+                (
+                    transmission_data.computer.uuid,
+                    f"{transmission_data.get_remote_path()}/transmission_folder",
+                    transmission_folder_path,
+                )
+            )
+        else:
+            calcinfo.local_copy_list.append(
+                (
+                    transmission_folder.uuid,
+                    ".",
+                    transmission_folder_path,
+                )
+            )
 
         return calcinfo
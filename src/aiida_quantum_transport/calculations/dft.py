@@ -1,13 +1,16 @@
 from __future__ import annotations
 
 import pickle
+import typing as t
 from pathlib import Path
 
 from aiida import orm
 from aiida.common.datastructures import CalcInfo, CodeInfo
 from aiida.common.folders import Folder
 
-from .base import BaseCalculation
+from aiida_quantum_transport.data import RemoteFileData
+
+from .base import BaseCalculation, OutputRule
 
 
 class DFTCalculation(BaseCalculation):
@@ -15,6 +18,15 @@ class DFTCalculation(BaseCalculation):
 
     _default_parser_name = "quantum_transport.dft"
 
+    _OUTPUT_RULES = {
+        "log_file": OutputRule("log.txt", max_size=2**26),
+        "restart_file": OutputRule("restart.gpw", large=True),
+        "hamiltonian_file": OutputRule("hs.npz", large=True),
+    }
+
+    # the retrieval rule of the optional lcao bundle
+    _LCAO_BUNDLE_RULE = OutputRule("lcao.npz", large=True)
+
     @classmethod
     def define(cls, spec) -> None:
         """docstring"""
@@ -45,6 +57,46 @@ class DFTCalculation(BaseCalculation):
             help="The input parameters",
         )
 
+        spec.input(
+            "parent_folder",
+            valid_type=orm.RemoteData,
+            required=False,
+            help="The results folder of a previous dft calculation, the restart "
+            "file of which seeds the SCF",
+        )
+
+        spec.input(
+            "restart_file",
+            valid_type=(orm.SinglefileData, RemoteFileData),
+            required=False,
+            help="The restart file of a previous dft calculation, seeding the SCF",
+        )
+
+        spec.input(
+            "hamiltonian.threshold",
+            valid_type=orm.Float,
+            default=lambda: orm.Float(0.0),
+            help="The magnitude at or below which the elements of the packed "
+            "hamiltonian and overlap matrices are dropped",
+        )
+
+        spec.input(
+            "hamiltonian.compress",
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(True),
+            help="If the hamiltonian file should be compressed",
+        )
+
+        spec.input(
+            "lcao_bundle",
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help="If True, a compact bundle of the Gamma-point hamiltonian and "
+            "overlap matrices, the Fermi level, the number of orbitals per atom "
+            "and the atoms is exported, from which the localization runs without "
+            "the restart file",
+        )
+
         spec.output(
             "remote_results_folder",
             valid_type=orm.RemoteData,
@@ -53,16 +105,32 @@ class DFTCalculation(BaseCalculation):
         for file in ("log", "restart", "hamiltonian"):
             spec.output(
                 f"{file}_file",
-                valid_type=orm.SinglefileData,
+                valid_type=(orm.SinglefileData, RemoteFileData),
+                required=file == "log",
                 help=f"The {file} file",
             )
 
+        spec.output(
+            "lcao_bundle_file",
+            valid_type=(orm.SinglefileData, RemoteFileData),
+            required=False,
+            help="The lcao bundle file",
+        )
+
         spec.exit_code(
             400,
             "ERROR_ACCESSING_OUTPUT_FILE",
             "an issue occurred while accessing an expected retrieved file",
         )
 
+    @classmethod
+    def get_output_rules(cls, inputs: t.Mapping) -> dict[str, OutputRule]:
+        """docstring"""
+        rules = dict(cls._OUTPUT_RULES)
+        if "lcao_bundle" in inputs and inputs["lcao_bundle"].value:
+            rules["lcao_bundle_file"] = cls._LCAO_BUNDLE_RULE
+        return rules
+
     def prepare_for_submission(self, folder: Folder) -> CalcInfo:
         """docstring"""
 
@@ -97,9 +165,69 @@ class DFTCalculation(BaseCalculation):
             parameters_filename,
         ]
 
+        codeinfo.cmdline_params.extend(
+            [
+                "--hamiltonian-threshold",
+                str(self.inputs.hamiltonian.threshold.value),
+                "--compress" if self.inputs.hamiltonian.compress else "--no-compress",
+            ]
+        )
+
+        if self.inputs.lcao_bundle:
+            codeinfo.cmdline_params.append("--lcao-bundle")
+
         calcinfo = CalcInfo()
         calcinfo.codes_info = [codeinfo]
         calcinfo.local_copy_list = []
-        calcinfo.retrieve_list = ["results"]
+        calcinfo.remote_symlink_list = []
+        calcinfo.retrieve_list = []
+        calcinfo.retrieve_temporary_list = self._get_retrieve_temporary_list()
+
+        parent_folder = self.inputs.get("parent_folder")
+        restart_file = self.inputs.get("restart_file")
+
+        if parent_folder is not None and restart_file is not None:
+            raise ValueError(
+                "Expected at most one of `parent_folder` and `restart_file`"
+            )
+
+        if parent_folder is not None or restart_file is not None:
+            precomputed_input_dir = input_dir / "precomputed"
+            (temp_dir / precomputed_input_dir).mkdir()
+            restart_filepath = (precomputed_input_dir / "parent_restart.gpw").as_posix()
+            codeinfo.cmdline_params.extend(["--restart-filepath", restart_filepath])
+
+        if parent_folder is not None:
+            if parent_folder.computer is None:
+                raise ValueError("Missing `Computer` node for parent dft step")
+
+            calcinfo.remote_symlink_list.append(
+                (
+                    parent_folder.computer.uuid,
+                    f"{parent_folder.get_remote_path()}/restart.gpw",
+                    restart_filepath,
+                )
+            )
+
+        elif isinstance(restart_file, RemoteFileData):
+            if restart_file.computer is None:
+                raise ValueError("Missing `Computer` node for parent dft step")
+
+            calcinfo.remote_symlink_list.append(
+                (
+                    restart_file.computer.uuid,
+                    restart_file.get_file_path(),
+                    restart_filepath,
+                )
+            )
+
+        elif restart_file is not None:
+            calcinfo.local_copy_list.append(
+                (
+                    restart_file.uuid,
+                    restart_file.filename,
+                    restart_filepath,
+                )
+            )
 
         return calcinfo
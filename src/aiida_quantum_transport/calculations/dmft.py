@@ -8,7 +8,37 @@ from aiida import orm
 from aiida.common.datastructures import CalcInfo, CodeInfo
 from aiida.common.folders import Folder
 
-from .base import BaseCalculation
+from .base import BaseCalculation, OutputRule
+
+# defaults of the chemical potential sweep in the DMFT script
+DMU_SWEEP_DEFAULTS = {
+    "dmu_min": 0.0,
+    "dmu_max": 0.9,
+    "dmu_step": 1.0,
+}
+
+
+def get_dmu_values(sweep_parameters: dict) -> np.ndarray:
+    """Get the chemical potential shifts of a DMFT sweep.
+
+    Mirrors the construction of the sweep in the DMFT script.
+
+    Parameters
+    ----------
+    `sweep_parameters` : `dict`
+        The chemical potential sweep parameters.
+
+    Returns
+    -------
+    `np.ndarray`
+        The chemical potential shifts of the sweep.
+    """
+    parameters = {**DMU_SWEEP_DEFAULTS, **sweep_parameters}
+    dmu_min = parameters["dmu_min"]
+    dmu_max = parameters["dmu_max"]
+    dmu_step = parameters["dmu_step"]
+    number_of_steps = int((dmu_max - dmu_min) / dmu_step + 1)
+    return np.linspace(dmu_min, dmu_max, number_of_steps)
 
 
 class DMFTCalculation(BaseCalculation):
@@ -16,6 +46,12 @@ class DMFTCalculation(BaseCalculation):
 
     _default_parser_name = "quantum_transport.dmft"
 
+    _OUTPUT_RULES = {
+        "delta_folder": OutputRule("delta_folder/dmu_*.npy"),
+        "sigma_folder": OutputRule("sigma_folder/dmu_*.npy"),
+        "mu_file": OutputRule("mu.txt", required=False),
+    }
+
     @classmethod
     def define(cls, spec) -> None:
         """docstring"""
@@ -83,7 +119,24 @@ class DMFTCalculation(BaseCalculation):
             "mu_file",
             valid_type=orm.SinglefileData,
             required=False,
-            help="The converged chemical potential file",
+            help="The converged chemical potential file, or the initial one if "
+            "the chemical potential is adjusted",
+        )
+
+        spec.input(
+            "restart.delta_folder",
+            valid_type=orm.FolderData,
+            required=False,
+            help="The delta folder of a previous calculation, from which the "
+            "unconverged dmu points are restarted",
+        )
+
+        spec.input(
+            "restart.sigma_folder",
+            valid_type=orm.FolderData,
+            required=False,
+            help="The sigma folder of a previous calculation, whose converged dmu "
+            "points are not recomputed",
         )
 
         spec.output(
@@ -116,6 +169,12 @@ class DMFTCalculation(BaseCalculation):
             "an issue occurred while accessing an expected retrieved file",
         )
 
+        spec.exit_code(
+            410,
+            "ERROR_UNCONVERGED_DMU_POINTS",
+            "the DMFT did not converge for {number} of {total} dmu points",
+        )
+
     def prepare_for_submission(self, folder: Folder) -> CalcInfo:
         """docstring"""
 
@@ -231,11 +290,16 @@ class DMFTCalculation(BaseCalculation):
                 occupancies_filepath,
             ),
         ]
-        calcinfo.retrieve_list = ["results"]
+        calcinfo.retrieve_list = []
+        calcinfo.retrieve_temporary_list = self._get_retrieve_temporary_list()
 
         if self.inputs.adjust_mu:
             codeinfo.cmdline_params.append("--adjust-mu")
-        else:
+
+        elif "mu_file" not in self.inputs:
+            raise ValueError("Missing `mu_file` for a fixed chemical potential")
+
+        if "mu_file" in self.inputs:
             mu_filename: str = self.inputs.mu_file.filename
             mu_filepath = (precomputed_input_dir / mu_filename).as_posix()
             codeinfo.cmdline_params.extend(
@@ -252,4 +316,21 @@ class DMFTCalculation(BaseCalculation):
                 )
             )
 
+        if self.inputs.get("restart"):
+            restart_input_dir = input_dir / "restart"
+            codeinfo.cmdline_params.extend(
+                (
+                    "--restart-folder-path",
+                    restart_input_dir.as_posix(),
+                )
+            )
+            for dirname, restart_folder in self.inputs.restart.items():
+                calcinfo.local_copy_list.append(
+                    (
+                        restart_folder.uuid,
+                        ".",
+                        (restart_input_dir / dirname).as_posix(),
+                    )
+                )
+
         return calcinfo
@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import io
+import itertools
+from pathlib import PurePosixPath
+
 import numpy as np
 from aiida import orm
 from aiida.engine import calcfunction
@@ -34,3 +38,234 @@ def get_scattering_region(
     )[0]
 
     return orm.ArrayData(scattering_region)
+
+
+@calcfunction
+def merge_folders(**folders: orm.FolderData) -> orm.FolderData:
+    """Merge the (flat) contents of several folders into a single folder.
+
+    Parameters
+    ----------
+    `**folders` : `orm.FolderData`
+        The folders to merge, e.g. the per-chunk outputs of a sweep.
+
+    Returns
+    -------
+    `orm.FolderData`
+        A folder holding the files of all input folders.
+
+    Raises
+    ------
+    `ValueError`
+        If a filename is found in more than one folder.
+    """
+
+    merged = orm.FolderData()
+    merged_filenames: set[str] = set()
+
+    for label in sorted(folders):
+        folder = folders[label]
+        for filename in folder.base.repository.list_object_names():
+            if filename in merged_filenames:
+                raise ValueError(f"'{filename}' found in more than one folder")
+            with folder.base.repository.open(filename, "rb") as handle:
+                merged.base.repository.put_object_from_filelike(handle, filename)
+            merged_filenames.add(filename)
+
+    return merged
+
+
+@calcfunction
+def build_sweep_grid(parameters: orm.Dict) -> orm.Dict:
+    """Build the grid of a multi-parameter sweep.
+
+    Parameters
+    ----------
+    `parameters` : `orm.Dict`
+        The values of each swept parameter, as a list or a single value.
+
+    Returns
+    -------
+    `orm.Dict`
+        The parameters of each point of the grid (the Cartesian product of the
+        swept values), by point label, i.e., `branch_<index>`.
+    """
+
+    values = {
+        name: value if isinstance(value, list) else [value]
+        for name, value in parameters.items()
+    }
+
+    return orm.Dict(
+        {
+            f"branch_{index}": dict(zip(values, point))
+            for index, point in enumerate(itertools.product(*values.values()))
+        }
+    )
+
+
+@calcfunction
+def stack_current(current_folder: orm.FolderData) -> dict[str, orm.SinglefileData]:
+    """Stack the per-dmu current files computed alongside the transmission.
+
+    Parameters
+    ----------
+    `current_folder` : `orm.FolderData`
+        The current and its derivative, stacked in a file per dmu value.
+
+    Returns
+    -------
+    `dict[str, orm.SinglefileData]`
+        The current and current derivative data files, ordered by dmu value.
+    """
+
+    filenames = sorted(
+        current_folder.base.repository.list_object_names(),
+        key=lambda filename: float(PurePosixPath(filename).stem.split("_")[-1]),
+    )
+
+    current, derivative = [], []
+    for filename in filenames:
+        with current_folder.base.repository.open(filename, "rb") as handle:
+            dmu_current, dmu_derivative = np.load(io.BytesIO(handle.read()))
+        current.append(dmu_current)
+        derivative.append(dmu_derivative)
+
+    def to_file(array: list[np.ndarray], filename: str) -> orm.SinglefileData:
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(array))
+        buffer.seek(0)
+        return orm.SinglefileData(buffer, filename=filename)
+
+    return {
+        "current_file": to_file(current, "current.npy"),
+        "derivative_file": to_file(derivative, "derivative.npy"),
+    }
+
+
+@calcfunction
+def build_performance_report(timings: orm.Dict) -> orm.Dict:
+    """Build the performance report of a workflow from its process timings.
+
+    Parameters
+    ----------
+    `timings` : `orm.Dict`
+        The timings of the processes of the workflow, as collected by
+        `get_process_timings`.
+
+    Returns
+    -------
+    `orm.Dict`
+        The report, with all times in seconds relative to the workflow start:
+        - `processes`: the phase durations of each process, by pk;
+        - `stages`: the phase durations summed over the processes of a stage;
+        - `critical_path`: the chain of processes, from the last to finish back
+          to the first, each waited for by the next, with the idle time before
+          each of them;
+        - `idle_gaps`: the intervals during which no process was running.
+        Phase durations are `None` where unknown, e.g., the queue time if the
+        scheduler does not report the job start.
+    """
+
+    start = timings["start"]
+    processes: dict[str, dict] = timings["processes"]
+
+    def span(begin: float | None, end: float | None) -> float | None:
+        if begin is None or end is None:
+            return None
+        return round(end - begin, 3)
+
+    def get_finished(pk: str) -> float:
+        return processes[pk]["finished"]
+
+    def get_durations(process: dict) -> dict[str, float | None]:
+        phases = process["phases"]
+        if not phases:  # a calculation function
+            return {"run": span(process["created"], process["finished"])}
+        dispatched = process["dispatched"]
+        started = dispatched if dispatched is not None else phases.get("submit")
+        return {
+            "waiting": span(process["created"], phases.get("upload")),
+            "upload": span(phases.get("upload"), phases.get("submit")),
+            "queue": span(phases.get("submit"), dispatched),
+            "run": span(started, phases.get("stash")),
+            "retrieve": span(phases.get("stash"), phases.get("parse")),
+            "parse": span(phases.get("parse"), process["finished"]),
+        }
+
+    report_processes = {}
+    for pk, process in processes.items():
+        durations = get_durations(process)
+        transfers = [
+            duration
+            for key in ("upload", "retrieve")
+            if (duration := durations.get(key)) is not None
+        ]
+        report_processes[pk] = {
+            "stage": process["stage"],
+            "process_label": process["process_label"],
+            "start": span(start, process["created"]),
+            "end": span(start, process["finished"]),
+            **durations,
+            "transfer": round(sum(transfers), 3) if transfers else None,
+        }
+
+    stages: dict[str, dict] = {}
+    for process in report_processes.values():
+        stage = stages.setdefault(
+            process["stage"],
+            {"number_of_processes": 0, "start": process["start"], "end": 0.0},
+        )
+        stage["number_of_processes"] += 1
+        stage["start"] = min(stage["start"], process["start"])
+        stage["end"] = max(stage["end"], process["end"])
+        for key in ("queue", "run", "transfer", "parse"):
+            if process.get(key) is not None:
+                stage[key] = round(stage.get(key, 0.0) + process[key], 3)
+    for stage in stages.values():
+        stage["wall"] = round(stage["end"] - stage["start"], 3)
+
+    critical_path = []
+    last = max(processes, key=get_finished, default=None)
+    while last is not None:
+        dependencies = [
+            str(dependency) for dependency in processes[last]["dependencies"]
+        ]
+        previous = max(dependencies, key=get_finished, default=None)
+        previous_end = start if previous is None else processes[previous]["finished"]
+        critical_path.append(
+            {
+                "pk": int(last),
+                "stage": report_processes[last]["stage"],
+                "start": report_processes[last]["start"],
+                "end": report_processes[last]["end"],
+                "idle_before": span(previous_end, processes[last]["created"]),
+            }
+        )
+        last = previous
+
+    idle_gaps = []
+    intervals = sorted(
+        (process["created"], process["finished"]) for process in processes.values()
+    )
+    busy_until = start
+    for begin, end in intervals:
+        if begin - busy_until > 1.0:
+            idle_gaps.append(
+                {
+                    "start": span(start, busy_until),
+                    "end": span(start, begin),
+                    "duration": span(busy_until, begin),
+                }
+            )
+        busy_until = max(busy_until, end)
+
+    return orm.Dict(
+        {
+            "total": span(start, busy_until),
+            "processes": report_processes,
+            "stages": stages,
+            "critical_path": critical_path,
+            "idle_gaps": idle_gaps,
+        }
+    )
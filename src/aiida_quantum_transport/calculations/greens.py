@@ -1,13 +1,24 @@
 from __future__ import annotations
 
 import pickle
+import typing as t
 from pathlib import Path
 
 from aiida import orm
-from aiida.common.datastructures import CalcInfo, CodeInfo
+from aiida.common.datastructures import CalcInfo, CodeInfo, CodeRunMode
 from aiida.common.folders import Folder
 
-from .base import BaseCalculation
+from aiida_quantum_transport.data import RemoteFileData
+
+from .base import BaseCalculation, OutputRule
+from .hybridize import (
+    HAMILTONIAN_BLOCKS_FILENAME,
+    SELF_ENERGIES_TABLE_FILENAME,
+    HybridizationCalculation,
+)
+
+# how the self-energy of the right lead is derived from that of the left one
+LEADS_SYMMETRIES = ("none", "auto", "mirror")
 
 
 class GreensFunctionParametersCalculation(BaseCalculation):
@@ -15,6 +26,12 @@ class GreensFunctionParametersCalculation(BaseCalculation):
 
     _default_parser_name = "quantum_transport.greens"
 
+    _OUTPUT_RULES = {
+        "leads_nao_file": OutputRule("leads_nao.npy"),
+        "hamiltonian_blocks_file": OutputRule(HAMILTONIAN_BLOCKS_FILENAME, large=True),
+        "self_energies_file": OutputRule("self_energies.pkl"),
+    }
+
     @classmethod
     def define(cls, spec) -> None:
         """docstring"""
@@ -63,6 +80,88 @@ class GreensFunctionParametersCalculation(BaseCalculation):
             help="",  # TODO fill in
         )
 
+        spec.input(
+            "tabulate_self_energies",
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help="If True, the lead self-energies are tabulated on the real and "
+            "Matsubara energy grids defined by the `hybridization` parameters, "
+            "such that the downstream stages look them up instead of recomputing "
+            "them",
+        )
+
+        spec.input(
+            "minimize_principal_layer",
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help="If True, the principal layer of the leads is reduced to the "
+            "smallest layer their unit cell repeats, still coupled only to its "
+            "nearest neighbours, rather than the unit cell",
+        )
+
+        spec.input(
+            "leads_symmetry",
+            valid_type=orm.Str,
+            default=lambda: orm.Str("none"),
+            validator=cls._validate_leads_symmetry,
+            help="How the self-energy of the right lead is derived: `none`, "
+            "independently; `auto`, mirrored from that of the left lead if the "
+            "leads are found mirror symmetric; or `mirror`, mirrored, failing if "
+            "the leads are not",
+        )
+
+        spec.input(
+            "optimize_partition",
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help="If True, the device is partitioned into the narrowest blocks "
+            "keeping the local orbitals within one, rather than a single central "
+            "block; the partition and its predicted cost are reported",
+        )
+
+        spec.input(
+            "hybridization.code",
+            valid_type=orm.AbstractCode,
+            required=False,
+            help="The hybridization script; if provided, the hybridization is "
+            "computed in the same allocation, from the local results",
+        )
+
+        spec.input(
+            "hybridization.temperature",
+            valid_type=orm.Float,
+            default=lambda: orm.Float(300.0),
+            help="The temperature in Kelvin",
+        )
+
+        spec.input(
+            "hybridization.matsubara_grid_size",
+            valid_type=orm.Int,
+            default=lambda: orm.Int(3000),
+            help="The size of the Matsubara energy grid",
+        )
+
+        spec.input(
+            "hybridization.greens_function_parameters",
+            valid_type=orm.Dict,
+            default=lambda: orm.Dict({}),
+            help="The parameters used to define the greens function",
+        )
+
+        spec.input(
+            "hybridization.energy_grid_parameters",
+            valid_type=orm.Dict,
+            default=lambda: orm.Dict({}),
+            help="The parameters used to define the energy grid",
+        )
+
+        spec.input(
+            "hybridization.parameters",
+            valid_type=orm.Dict,
+            default=lambda: orm.Dict({}),
+            help="The parameters used for orbital hybridization",
+        )
+
         spec.output(
             "remote_results_folder",
             valid_type=orm.RemoteData,
@@ -75,29 +174,90 @@ class GreensFunctionParametersCalculation(BaseCalculation):
         )
 
         spec.output(
-            "hamiltonian_ii_file",
-            valid_type=orm.SinglefileData,
-            help="The pickled diagonal hamiltonian elements file",
+            "hamiltonian_blocks_file",
+            valid_type=(orm.SinglefileData, RemoteFileData),
+            required=False,
+            help="The block-tridiagonal hamiltonian file, of the diagonal and "
+            "off-diagonal hamiltonian elements",
         )
 
         spec.output(
-            "hamiltonian_ij_file",
+            "self_energies_file",
             valid_type=orm.SinglefileData,
-            help="The pickled off-diagonal hamiltonian elements file",
+            help="The pickled self-energies file",
         )
 
         spec.output(
-            "self_energies_file",
+            "partition_file",
             valid_type=orm.SinglefileData,
-            help="The pickled self-energies file",
+            required=False,
+            help="The block partition of the device, with the predicted cost of a "
+            "solve against that of the default partition, if optimized",
         )
 
+        spec.output(
+            "self_energies_table_file",
+            valid_type=(orm.SinglefileData, RemoteFileData),
+            required=False,
+            help="The tabulated lead self-energies file, if tabulated",
+        )
+
+        # computed only if bundled with the greens function parameters
+        spec.expose_outputs(
+            HybridizationCalculation,
+            namespace="hybridization",
+            exclude=["remote_folder", "remote_stash", "retrieved"],
+        )
+
+        for port in spec.outputs.get_port("hybridization").values():
+            port.required = False
+
         spec.exit_code(
             400,
             "ERROR_ACCESSING_OUTPUT_FILE",
             "an issue occurred while accessing an expected retrieved file",
         )
 
+    @staticmethod
+    def _validate_leads_symmetry(value: orm.Str, _) -> str | None:
+        """Validate the symmetry of the leads."""
+        if value.value not in LEADS_SYMMETRIES:
+            return (
+                f"unknown leads symmetry `{value.value}`; expected one of "
+                f"{', '.join(LEADS_SYMMETRIES)}"
+            )
+        return None
+
+    @classmethod
+    def get_output_rules(cls, inputs: t.Mapping) -> dict[str, OutputRule]:
+        """Get the retrieval rules of the outputs, including those of the
+        optimized partition, the tabulated self-energies and the bundled
+        hybridization, if any."""
+
+        rules = dict(cls._OUTPUT_RULES)
+
+        if "optimize_partition" in inputs and inputs["optimize_partition"].value:
+            rules["partition_file"] = OutputRule("partition.json")
+
+        if (
+            "tabulate_self_energies" in inputs
+            and inputs["tabulate_self_energies"].value
+        ):
+            rules["self_energies_table_file"] = OutputRule(
+                SELF_ENERGIES_TABLE_FILENAME,
+                large=True,
+            )
+
+        if "code" in inputs["hybridization"]:
+            rules.update(
+                (f"hybridization.{port}", rule)
+                for port, rule in HybridizationCalculation.get_output_rules(
+                    inputs
+                ).items()
+            )
+
+        return rules
+
     def prepare_for_submission(self, folder: Folder) -> CalcInfo:
         """docstring"""
 
@@ -128,11 +288,26 @@ class GreensFunctionParametersCalculation(BaseCalculation):
 
         precomputed_input_dir = input_dir / "precomputed"
         (temp_dir / precomputed_input_dir).mkdir()
-        leads_hamiltonian_filepath = (precomputed_input_dir / "hs_leads.npy").as_posix()
-        los_hamiltonian_filepath = (precomputed_input_dir / "hs_los.npy").as_posix()
+        leads_hamiltonian_filename = self._get_hamiltonian_filename(
+            self.inputs.leads.remote_results_folder,
+            "hs.npz",
+        )
+        los_hamiltonian_filename = self._get_hamiltonian_filename(
+            self.inputs.los.remote_results_folder,
+            "hs_los.npz",
+        )
+        leads_hamiltonian_filepath = (
+            precomputed_input_dir / f"hs_leads{Path(leads_hamiltonian_filename).suffix}"
+        ).as_posix()
+        los_hamiltonian_filepath = (
+            precomputed_input_dir / los_hamiltonian_filename
+        ).as_posix()
+        los_indices_filepath = (precomputed_input_dir / "los_indices.npy").as_posix()
 
         codeinfo = CodeInfo()
         codeinfo.code_uuid = self.inputs.code.uuid
+        # serial, also when the bundled hybridization runs with MPI
+        codeinfo.withmpi = False
         codeinfo.cmdline_params = [
             "--leads-structure-filename",
             leads_structure_filename,
@@ -148,6 +323,24 @@ class GreensFunctionParametersCalculation(BaseCalculation):
             los_hamiltonian_filepath,
         ]
 
+        if self.inputs.minimize_principal_layer:
+            codeinfo.cmdline_params.append("--minimize-principal-layer")
+
+        if self.inputs.leads_symmetry.value != "none":
+            codeinfo.cmdline_params.extend(
+                ["--leads-symmetry", self.inputs.leads_symmetry.value]
+            )
+
+        # keeping the local orbitals within a single block
+        if self.inputs.optimize_partition:
+            codeinfo.cmdline_params.extend(
+                [
+                    "--optimize-partition",
+                    "--los-indices-filepath",
+                    los_indices_filepath,
+                ]
+            )
+
         leads_data = self.inputs.leads.remote_results_folder
         los_data = self.inputs.los.remote_results_folder
 
@@ -171,15 +364,96 @@ class GreensFunctionParametersCalculation(BaseCalculation):
         calcinfo.remote_symlink_list = [
             (
                 leads_data.computer.uuid,
-                f"{leads_data.get_remote_path()}/hs.npy",
+                f"{leads_data.get_remote_path()}/{leads_hamiltonian_filename}",
                 leads_hamiltonian_filepath,
             ),
             (
                 los_data.computer.uuid,
-                f"{los_data.get_remote_path()}/hs_los.npy",
+                f"{los_data.get_remote_path()}/{los_hamiltonian_filename}",
                 los_hamiltonian_filepath,
             ),
+            (
+                los_data.computer.uuid,
+                f"{los_data.get_remote_path()}/idx_los.npy",
+                los_indices_filepath,
+            ),
         ]
-        calcinfo.retrieve_list = ["results"]
+        calcinfo.retrieve_list = []
+        calcinfo.retrieve_temporary_list = self._get_retrieve_temporary_list()
+
+        # on the grids of the hybridization, shared by the transmission
+        if self.inputs.tabulate_self_energies:
+            self_energies_parameters_filename = "self_energies_parameters.pkl"
+            with open(temp_input_dir / self_energies_parameters_filename, "wb") as file:
+                hybridization = self.inputs.hybridization
+                self_energies_parameters = {
+                    **hybridization.energy_grid_parameters,
+                    "temperature": hybridization.temperature.value,
+                    "matsubara_grid_size": hybridization.matsubara_grid_size.value,
+                }
+                # the broadening of the real grid, set on the self-energies downstream
+                if "eta" in hybridization.greens_function_parameters:
+                    eta = hybridization.greens_function_parameters["eta"]
+                    self_energies_parameters["eta"] = eta
+                pickle.dump(self_energies_parameters, file)
+
+            codeinfo.cmdline_params.extend(
+                [
+                    "--self-energies-parameters-filename",
+                    self_energies_parameters_filename,
+                ]
+            )
+
+        # the hybridization script runs next, on the results of this one
+        if "code" in self.inputs.hybridization:
+            hybridization_parameters_filename = "hybridization_parameters.pkl"
+            with open(temp_input_dir / hybridization_parameters_filename, "wb") as file:
+                hybridization = self.inputs.hybridization
+                parameters = {
+                    **hybridization.greens_function_parameters,
+                    **hybridization.energy_grid_parameters,
+                    **hybridization.parameters,
+                    "temperature": hybridization.temperature.value,
+                    "matsubara_grid_size": hybridization.matsubara_grid_size.value,
+                }
+                pickle.dump(parameters, file)
+
+            hybridization_codeinfo = CodeInfo()
+            hybridization_codeinfo.code_uuid = self.inputs.hybridization.code.uuid
+            hybridization_codeinfo.withmpi = self.inputs.metadata.options.withmpi
+            hybridization_codeinfo.cmdline_params = [
+                "--parameters-filename",
+                hybridization_parameters_filename,
+                "--los-indices-filepath",
+                los_indices_filepath,
+                "--hamiltonian-blocks-filepath",
+                f"results/{HAMILTONIAN_BLOCKS_FILENAME}",
+                "--self-energies-filepath",
+                "results/self_energies.pkl",
+            ]
+
+            if self.inputs.tabulate_self_energies:
+                hybridization_codeinfo.cmdline_params.extend(
+                    [
+                        "--self-energies-table-filepath",
+                        f"results/{SELF_ENERGIES_TABLE_FILENAME}",
+                    ]
+                )
+
+            calcinfo.codes_info.append(hybridization_codeinfo)
+            calcinfo.codes_run_mode = CodeRunMode.SERIAL
 
         return calcinfo
+
+    @staticmethod
+    def _get_hamiltonian_filename(remote_data: orm.RemoteData, default: str) -> str:
+        """Get the name of the hamiltonian file in a results folder.
+
+        The name is that of the `hamiltonian_file` output of the calculation
+        that produced the folder, such that folders holding the legacy dense
+        `.npy` file remain usable. Falls back to `default` otherwise.
+        """
+        creator = remote_data.creator
+        if creator is not None and "hamiltonian_file" in creator.outputs:
+            return creator.outputs.hamiltonian_file.filename
+        return default
@@ -7,7 +7,65 @@ from aiida import orm
 from aiida.common.datastructures import CalcInfo, CodeInfo
 from aiida.common.folders import Folder
 
-from .base import BaseCalculation
+from aiida_quantum_transport.data import RemoteFileData
+
+from .base import BaseCalculation, OutputRule
+
+# the block-tridiagonal hamiltonian file of the greens function parameters
+HAMILTONIAN_BLOCKS_FILENAME = "hamiltonian_blocks.btd"
+
+# the tabulated lead self-energies file of the greens function parameters
+SELF_ENERGIES_TABLE_FILENAME = "self_energies_table.set"
+
+
+def get_hamiltonian_blocks_files(remote_data: orm.RemoteData) -> dict[str, str]:
+    """Get the hamiltonian blocks files of a greens function results folder.
+
+    Folders of greens function calculations that pickled the diagonal and
+    off-diagonal blocks separately, identified by the outputs of the
+    calculation, remain usable.
+
+    Parameters
+    ----------
+    `remote_data` : `orm.RemoteData`
+        The results folder of the greens function calculation.
+
+    Returns
+    -------
+    `dict[str, str]`
+        The names of the files, by the script option taking their path.
+    """
+    creator = remote_data.creator
+    if creator is not None and "hamiltonian_ii_file" in creator.outputs:
+        return {
+            "--hamiltonian-ii-filepath": "hamiltonian_ii.pkl",
+            "--hamiltonian-ij-filepath": "hamiltonian_ij.pkl",
+        }
+    return {"--hamiltonian-blocks-filepath": HAMILTONIAN_BLOCKS_FILENAME}
+
+
+def has_self_energies_table(remote_data: orm.RemoteData) -> bool:
+    """Check if a greens function results folder holds tabulated self-energies.
+
+    The table is identified by the inputs of the calculation, such that it is
+    found also when the retrieval policy left it unreferenced.
+
+    Parameters
+    ----------
+    `remote_data` : `orm.RemoteData`
+        The results folder of the greens function calculation.
+
+    Returns
+    -------
+    `bool`
+        `True` if the lead self-energies were tabulated.
+    """
+    creator = remote_data.creator
+    return (
+        creator is not None
+        and "tabulate_self_energies" in creator.inputs
+        and creator.inputs.tabulate_self_energies.value
+    )
 
 
 class HybridizationCalculation(BaseCalculation):
@@ -15,6 +73,19 @@ class HybridizationCalculation(BaseCalculation):
 
     _default_parser_name = "quantum_transport.hybridize"
 
+    _OUTPUT_RULES = {
+        "hybridization_file": OutputRule("hybridization.bin", large=True),
+        "energies_file": OutputRule("energies.npy"),
+        "hamiltonian_file": OutputRule("hamiltonian.npy"),
+        "eigenvalues_file": OutputRule("eigenvalues.npy"),
+        "matsubara_hybridization_file": OutputRule(
+            "matsubara_hybridization.bin",
+            large=True,
+        ),
+        "matsubara_energies_file": OutputRule("matsubara_energies.npy"),
+        "occupancies_file": OutputRule("occupancies.npy"),
+    }
+
     @classmethod
     def define(cls, spec) -> None:
         """docstring"""
@@ -81,7 +152,8 @@ class HybridizationCalculation(BaseCalculation):
 
         spec.output(
             "hybridization_file",
-            valid_type=orm.SinglefileData,
+            valid_type=(orm.SinglefileData, RemoteFileData),
+            required=False,
             help="",  # TODO fill in
         )
 
@@ -105,7 +177,8 @@ class HybridizationCalculation(BaseCalculation):
 
         spec.output(
             "matsubara_hybridization_file",
-            valid_type=orm.SinglefileData,
+            valid_type=(orm.SinglefileData, RemoteFileData),
+            required=False,
             help="The Matsubara hybridization file",
         )
 
@@ -149,12 +222,6 @@ class HybridizationCalculation(BaseCalculation):
         precomputed_input_dir = input_dir / "precomputed"
         (temp_dir / precomputed_input_dir).mkdir()
         los_indices_filepath = (precomputed_input_dir / "los_indices.npy").as_posix()
-        hamiltonian_ii_filepath = (
-            precomputed_input_dir / "hamiltonian_ii.pkl"
-        ).as_posix()
-        hamiltonian_ij_filepath = (
-            precomputed_input_dir / "hamiltonian_ij.pkl"
-        ).as_posix()
         self_energies_filepath = (
             precomputed_input_dir / "self_energies.pkl"
         ).as_posix()
@@ -166,10 +233,6 @@ class HybridizationCalculation(BaseCalculation):
             parameters_filename,
             "--los-indices-filepath",
             los_indices_filepath,
-            "--hamiltonian-ii-filepath",
-            hamiltonian_ii_filepath,
-            "--hamiltonian-ij-filepath",
-            hamiltonian_ij_filepath,
             "--self-energies-filepath",
             self_energies_filepath,
         ]
@@ -200,22 +263,42 @@ class HybridizationCalculation(BaseCalculation):
                 f"{los_data.get_remote_path()}/idx_los.npy",
                 los_indices_filepath,
             ),
-            (
-                greens_function_data.computer.uuid,
-                f"{greens_function_data.get_remote_path()}/hamiltonian_ii.pkl",
-                hamiltonian_ii_filepath,
-            ),
-            (
-                greens_function_data.computer.uuid,
-                f"{greens_function_data.get_remote_path()}/hamiltonian_ij.pkl",
-                hamiltonian_ij_filepath,
-            ),
             (
                 greens_function_data.computer.uuid,
                 f"{greens_function_data.get_remote_path()}/self_energies.pkl",
                 self_energies_filepath,
             ),
         ]
-        calcinfo.retrieve_list = ["results"]
+        calcinfo.retrieve_list = []
+        calcinfo.retrieve_temporary_list = self._get_retrieve_temporary_list()
+
+        for option, filename in get_hamiltonian_blocks_files(
+            greens_function_data
+        ).items():
+            filepath = (precomputed_input_dir / filename).as_posix()
+            codeinfo.cmdline_params.extend([option, filepath])
+            calcinfo.remote_symlink_list.append(
+                (
+                    greens_function_data.computer.uuid,
+                    f"{greens_function_data.get_remote_path()}/{filename}",
+                    filepath,
+                )
+            )
+
+        if has_self_energies_table(greens_function_data):
+            self_energies_table_filepath = (
+                precomputed_input_dir / SELF_ENERGIES_TABLE_FILENAME
+            ).as_posix()
+            codeinfo.cmdline_params.extend(
+                ["--self-energies-table-filepath", self_energies_table_filepath]
+            )
+            calcinfo.remote_symlink_list.append(
+                (
+                    greens_function_data.computer.uuid,
+                    f"{greens_function_data.get_remote_path()}/"
+                    f"{SELF_ENERGIES_TABLE_FILENAME}",
+                    self_energies_table_filepath,
+                )
+            )
 
         return calcinfo
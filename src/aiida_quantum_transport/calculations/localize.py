@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import pickle
+import typing as t
 from pathlib import Path
 
 import numpy as np
@@ -8,7 +9,9 @@ from aiida import orm
 from aiida.common.datastructures import CalcInfo, CodeInfo
 from aiida.common.folders import Folder
 
-from .base import BaseCalculation
+from aiida_quantum_transport.data import RemoteFileData
+
+from .base import BaseCalculation, OutputRule
 
 
 class LocalizationCalculation(BaseCalculation):
@@ -16,6 +19,14 @@ class LocalizationCalculation(BaseCalculation):
 
     _default_parser_name = "quantum_transport.localize"
 
+    _OUTPUT_RULES = {
+        "index_file": OutputRule("idx_los.npy"),
+        "hamiltonian_file": OutputRule("hs_los.npz", large=True),
+    }
+
+    # the keys of a variant, overriding the inputs of the same name
+    _VARIANT_KEYS = ("active", "lowdin")
+
     @classmethod
     def define(cls, spec) -> None:
         """docstring"""
@@ -53,6 +64,40 @@ class LocalizationCalculation(BaseCalculation):
             help="",  # TODO fill in
         )
 
+        spec.input(
+            "hamiltonian.threshold",
+            valid_type=orm.Float,
+            default=lambda: orm.Float(0.0),
+            help="The magnitude at or below which the elements of the packed "
+            "hamiltonian and overlap matrices are dropped",
+        )
+
+        spec.input(
+            "hamiltonian.compress",
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(True),
+            help="If the hamiltonian file should be compressed",
+        )
+
+        spec.input(
+            "hamiltonian.block_sparse",
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help="If the hamiltonian file should be stored in the block-sparse "
+            "layout of the orbitals of each atom, dropping the atom pairs of "
+            "vanishing blocks",
+        )
+
+        spec.input(
+            "variants",
+            valid_type=orm.Dict,
+            required=False,
+            validator=cls._validate_variants,
+            help="Additional localizations sharing the loaded hamiltonian and the "
+            "subdiagonalization, by name, each overriding the `active` species "
+            "and/or `lowdin`, e.g., `{'c23': {'active': {'C': [2, 3]}}}`",
+        )
+
         spec.output(
             "remote_results_folder",
             valid_type=orm.RemoteData,
@@ -66,16 +111,54 @@ class LocalizationCalculation(BaseCalculation):
 
         spec.output(
             "hamiltonian_file",
-            valid_type=orm.SinglefileData,
+            valid_type=(orm.SinglefileData, RemoteFileData),
+            required=False,
             help="The transformed hamiltonian file",
         )
 
+        spec.output_namespace(
+            "variants",
+            dynamic=True,
+            help="The index and hamiltonian files of each variant",
+        )
+
         spec.exit_code(
             400,
             "ERROR_ACCESSING_OUTPUT_FILE",
             "an issue occurred while accessing an expected retrieved file",
         )
 
+    @classmethod
+    def get_output_rules(cls, inputs: t.Mapping) -> dict[str, OutputRule]:
+        """docstring"""
+
+        rules = dict(cls._OUTPUT_RULES)
+
+        if "variants" in inputs:
+            for name in inputs["variants"].keys():
+                for port, rule in cls._OUTPUT_RULES.items():
+                    rules[f"variants.{name}.{port}"] = rule._replace(
+                        pattern=f"variants/{name}/{rule.pattern}"
+                    )
+
+        return rules
+
+    @classmethod
+    def _validate_variants(cls, value: orm.Dict, _) -> str | None:
+        """Validate the variants."""
+        for name, variant in value.items():
+            if not name.isidentifier():
+                return f"variant name `{name}` is not a valid identifier"
+            if not isinstance(variant, dict):
+                return f"variant `{name}` is not a dictionary"
+            unknown = set(variant) - set(cls._VARIANT_KEYS)
+            if unknown:
+                return (
+                    f"unknown keys {sorted(unknown)} of variant `{name}`; expected "
+                    f"any of {', '.join(cls._VARIANT_KEYS)}"
+                )
+        return None
+
     def prepare_for_submission(self, folder: Folder) -> CalcInfo:
         """docstring"""
 
@@ -89,12 +172,29 @@ class LocalizationCalculation(BaseCalculation):
             active: orm.Dict = self.inputs.scattering.active
             pickle.dump(active.get_dict(), file)
 
+        device_data = self.inputs.device.remote_results_folder
+
+        if not isinstance(device_data, orm.RemoteData):
+            raise ValueError(
+                f"Expected `RemoteData` instance; got `{type(device_data)}`"
+            )
+
+        if device_data.computer is None:
+            raise ValueError("Missing `Computer` node for leads step")
+
+        # the lcao bundle spares loading the full restart file, if exported
+        if self._has_lcao_bundle(device_data):
+            device_filename = "lcao.npz"
+            device_flag = "--lcao-bundle-filepath"
+        else:
+            device_filename = "restart.gpw"
+            device_flag = "--restart-filepath"
+
         precomputed_input_dir = input_dir / "precomputed"
         temp_precomputed_input_dir = temp_dir / precomputed_input_dir
         temp_precomputed_input_dir.mkdir()
-        restart_filename = "restart.gpw"
-        restart_filepath = (
-            precomputed_input_dir / f"device_{restart_filename}"
+        device_filepath = (
+            precomputed_input_dir / f"device_{device_filename}"
         ).as_posix()
         scattering_region_filename = "scatt.npy"
         scattering_region_filepath = (
@@ -110,8 +210,8 @@ class LocalizationCalculation(BaseCalculation):
         codeinfo = CodeInfo()
         codeinfo.code_uuid = self.inputs.code.uuid
         codeinfo.cmdline_params = [
-            "--restart-filepath",
-            restart_filepath,
+            device_flag,
+            device_filepath,
             "--active-species-filename",
             active_species_filename,
             "--scattering-region-filepath",
@@ -121,15 +221,23 @@ class LocalizationCalculation(BaseCalculation):
         if self.inputs.lowdin:
             codeinfo.cmdline_params.append("--lowdin")
 
-        device_data = self.inputs.device.remote_results_folder
+        codeinfo.cmdline_params.extend(
+            [
+                "--hamiltonian-threshold",
+                str(self.inputs.hamiltonian.threshold.value),
+                "--compress" if self.inputs.hamiltonian.compress else "--no-compress",
+            ]
+        )
 
-        if not isinstance(device_data, orm.RemoteData):
-            raise ValueError(
-                f"Expected `RemoteData` instance; got `{type(device_data)}`"
-            )
+        if self.inputs.hamiltonian.block_sparse:
+            codeinfo.cmdline_params.append("--block-sparse")
 
-        if device_data.computer is None:
-            raise ValueError("Missing `Computer` node for leads step")
+        if "variants" in self.inputs:
+            variants_filename = "variants.pkl"
+            with open(temp_input_dir / variants_filename, "wb") as file:
+                variants: orm.Dict = self.inputs.variants
+                pickle.dump(variants.get_dict(), file)
+            codeinfo.cmdline_params.extend(["--variants-filename", variants_filename])
 
         calcinfo = CalcInfo()
         calcinfo.codes_info = [codeinfo]
@@ -137,10 +245,26 @@ class LocalizationCalculation(BaseCalculation):
         calcinfo.remote_symlink_list = [
             (
                 device_data.computer.uuid,
-                f"{device_data.get_remote_path()}/{restart_filename}",
-                restart_filepath,
+                f"{device_data.get_remote_path()}/{device_filename}",
+                device_filepath,
             )
         ]
-        calcinfo.retrieve_list = ["results"]
+        calcinfo.retrieve_list = []
+        calcinfo.retrieve_temporary_list = self._get_retrieve_temporary_list()
 
         return calcinfo
+
+    @staticmethod
+    def _has_lcao_bundle(remote_data: orm.RemoteData) -> bool:
+        """Check if a results folder holds the lcao bundle of its dft calculation.
+
+        The bundle is only present if requested from the calculation that
+        produced the folder. Folders of other origins fall back to the restart
+        file.
+        """
+        creator = remote_data.creator
+        return (
+            creator is not None
+            and "lcao_bundle" in creator.inputs
+            and creator.inputs.lcao_bundle.value
+        )
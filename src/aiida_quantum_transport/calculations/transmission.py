@@ -1,13 +1,18 @@
 from __future__ import annotations
 
 import pickle
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 
 from aiida import orm
-from aiida.common.datastructures import CalcInfo, CodeInfo
+from aiida.common.datastructures import CalcInfo, CodeInfo, CodeRunMode
 from aiida.common.folders import Folder
 
-from .base import BaseCalculation
+from .base import BaseCalculation, OutputRule
+from .hybridize import (
+    SELF_ENERGIES_TABLE_FILENAME,
+    get_hamiltonian_blocks_files,
+    has_self_energies_table,
+)
 
 
 class TransmissionCalculation(BaseCalculation):
@@ -15,6 +20,11 @@ class TransmissionCalculation(BaseCalculation):
 
     _default_parser_name = "quantum_transport.transmission"
 
+    _OUTPUT_RULES = {
+        "transmission_folder": OutputRule("transmission_folder/dmu_*.npy"),
+        "current_folder": OutputRule("current_folder/dmu_*.npy", required=False),
+    }
+
     @classmethod
     def define(cls, spec) -> None:
         """docstring"""
@@ -42,9 +52,33 @@ class TransmissionCalculation(BaseCalculation):
         spec.input(
             "dmft.remote_results_folder",
             valid_type=orm.RemoteData,
+            required=False,
             help="The results folder of the dmft sweep calculation",
         )
 
+        spec.input(
+            "dmft.sigma_folder",
+            valid_type=orm.FolderData,
+            required=False,
+            help="The (merged) sigma folder of the dmft sweep, used in place of the "
+            "results folder",
+        )
+
+        spec.input(
+            "dmft.sigma_filenames",
+            valid_type=orm.List,
+            required=False,
+            help="The subset of sigma files (dmu values) to compute; all if not "
+            "provided",
+        )
+
+        spec.input(
+            "compute_dft_transmission",
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(True),
+            help="True if the transmission without the dmft self-energy is computed",
+        )
+
         spec.input(
             "greens_function_parameters",
             valid_type=orm.Dict,
@@ -59,6 +93,44 @@ class TransmissionCalculation(BaseCalculation):
             help="The parameters used to define the energy grid",
         )
 
+        spec.input(
+            "parameters",
+            valid_type=orm.Dict,
+            default=lambda: orm.Dict({}),
+            help="The parameters used for the transmission, e.g., the adaptive "
+            "refinement of the energy grid",
+        )
+
+        spec.input(
+            "current.code",
+            valid_type=orm.AbstractCode,
+            required=False,
+            help="The current script; if provided, the current is computed "
+            "alongside the transmission, as each transmission file is written",
+        )
+
+        spec.input(
+            "current.parameters",
+            valid_type=orm.Dict,
+            default=lambda: orm.Dict({}),
+            help="The parameters used to compute current",
+        )
+
+        spec.input(
+            "current.temperature",
+            valid_type=orm.Float,
+            default=lambda: orm.Float(300.0),
+            help="The temperature in Kelvin",
+        )
+
+        spec.input(
+            "hybridization.remote_results_folder",
+            valid_type=orm.RemoteData,
+            required=False,
+            help="The results folder of the hybridization calculation, required "
+            "to compute the current",
+        )
+
         spec.output(
             "remote_results_folder",
             valid_type=orm.RemoteData,
@@ -70,6 +142,14 @@ class TransmissionCalculation(BaseCalculation):
             help="The transmission folder",
         )
 
+        spec.output(
+            "current_folder",
+            valid_type=orm.FolderData,
+            required=False,
+            help="The current and its derivative per dmu value, if computed "
+            "alongside the transmission",
+        )
+
         spec.exit_code(
             400,
             "ERROR_ACCESSING_OUTPUT_FILE",
@@ -89,19 +169,13 @@ class TransmissionCalculation(BaseCalculation):
             parameters = {
                 **self.inputs.greens_function_parameters,
                 **self.inputs.energy_grid_parameters,
+                **self.inputs.parameters,
             }
             pickle.dump(parameters, file)
 
         precomputed_input_dir = input_dir / "precomputed"
         (temp_dir / precomputed_input_dir).mkdir()
         los_indices_filepath = (precomputed_input_dir / "los_indices.npy").as_posix()
-        leads_nao_filepath = (precomputed_input_dir / "leads_nao.npy").as_posix()
-        hamiltonian_ii_filepath = (
-            precomputed_input_dir / "hamiltonian_ii.pkl"
-        ).as_posix()
-        hamiltonian_ij_filepath = (
-            precomputed_input_dir / "hamiltonian_ij.pkl"
-        ).as_posix()
         self_energies_filepath = (
             precomputed_input_dir / "self_energies.pkl"
         ).as_posix()
@@ -114,21 +188,27 @@ class TransmissionCalculation(BaseCalculation):
             parameters_filename,
             "--los-indices-filepath",
             los_indices_filepath,
-            "--leads-nao-filepath",
-            leads_nao_filepath,
-            "--hamiltonian-ii-filepath",
-            hamiltonian_ii_filepath,
-            "--hamiltonian-ij-filepath",
-            hamiltonian_ij_filepath,
             "--self-energies-filepath",
             self_energies_filepath,
             "--sigma-folder-path",
             sigma_folder_path,
         ]
 
+        if not self.inputs.compute_dft_transmission:
+            codeinfo.cmdline_params.append("--no-dft-transmission")
+
+        compute_current = "code" in self.inputs.current
+
         los_data = self.inputs.los.remote_results_folder
         greens_function_data = self.inputs.greens_function.remote_results_folder
-        dmft_data = self.inputs.dmft.remote_results_folder
+        dmft_data = self.inputs.dmft.get("remote_results_folder")
+        sigma_folder = self.inputs.dmft.get("sigma_folder")
+
+        if (dmft_data is None) == (sigma_folder is None):
+            raise ValueError(
+                "Expected exactly one of `dmft.remote_results_folder` "
+                "and `dmft.sigma_folder`"
+            )
 
         if not isinstance(los_data, orm.RemoteData):
             raise ValueError(f"Expected `RemoteData` instance; got `{type(los_data)}`")
@@ -144,11 +224,21 @@ class TransmissionCalculation(BaseCalculation):
         if greens_function_data.computer is None:
             raise ValueError("Missing `Computer` node for greens function step")
 
-        if not isinstance(dmft_data, orm.RemoteData):
-            raise ValueError(f"Expected `RemoteData` instance; got `{type(dmft_data)}`")
+        if dmft_data is not None:
+            if not isinstance(dmft_data, orm.RemoteData):
+                raise ValueError(
+                    f"Expected `RemoteData` instance; got `{type(dmft_data)}`"
+                )
 
-        if dmft_data.computer is None:
-            raise ValueError("Missing `Computer` node for dmft step")
+            if dmft_data.computer is None:
+                raise ValueError("Missing `Computer` node for dmft step")
+
+        if compute_current and "remote_results_folder" not in self.inputs.get(
+            "hybridization", {}
+        ):
+            raise ValueError(
+                "Expected `hybridization.remote_results_folder` to compute the current"
+            )
 
         calcinfo = CalcInfo()
         calcinfo.codes_info = [codeinfo]
@@ -159,32 +249,116 @@ class TransmissionCalculation(BaseCalculation):
                 f"{los_data.get_remote_path()}/idx_los.npy",
                 los_indices_filepath,
             ),
-            (
-                greens_function_data.computer.uuid,
-                f"{greens_function_data.get_remote_path()}/leads_nao.npy",
-                leads_nao_filepath,
-            ),
-            (
-                greens_function_data.computer.uuid,
-                f"{greens_function_data.get_remote_path()}/hamiltonian_ii.pkl",
-                hamiltonian_ii_filepath,
-            ),
-            (
-                greens_function_data.computer.uuid,
-                f"{greens_function_data.get_remote_path()}/hamiltonian_ij.pkl",
-                hamiltonian_ij_filepath,
-            ),
             (
                 greens_function_data.computer.uuid,
                 f"{greens_function_data.get_remote_path()}/self_energies.pkl",
                 self_energies_filepath,
             ),
-            (
-                dmft_data.computer.uuid,
-                f"{dmft_data.get_remote_path()}/sigma_folder",
-                sigma_folder_path,
-            ),
         ]
-        calcinfo.retrieve_list = ["results"]
+        calcinfo.retrieve_list = []
+        calcinfo.retrieve_temporary_list = self._get_retrieve_temporary_list()
+
+        for option, filename in get_hamiltonian_blocks_files(
+            greens_function_data
+        ).items():
+            filepath = (precomputed_input_dir / filename).as_posix()
+            codeinfo.cmdline_params.extend([option, filepath])
+            calcinfo.remote_symlink_list.append(
+                (
+                    greens_function_data.computer.uuid,
+                    f"{greens_function_data.get_remote_path()}/{filename}",
+                    filepath,
+                )
+            )
+
+        if has_self_energies_table(greens_function_data):
+            self_energies_table_filepath = (
+                precomputed_input_dir / SELF_ENERGIES_TABLE_FILENAME
+            ).as_posix()
+            codeinfo.cmdline_params.extend(
+                ["--self-energies-table-filepath", self_energies_table_filepath]
+            )
+            calcinfo.remote_symlink_list.append(
+                (
+                    greens_function_data.computer.uuid,
+                    f"{greens_function_data.get_remote_path()}/"
+                    f"{SELF_ENERGIES_TABLE_FILENAME}",
+                    self_energies_table_filepath,
+                )
+            )
+
+        # link/copy the whole sigma folder, or only the requested files
+        if "sigma_filenames" in self.inputs.dmft:
+            (temp_dir / sigma_folder_path).mkdir()
+            sigma_files = [
+                (filename, f"{sigma_folder_path}/{filename}")
+                for filename in self.inputs.dmft.sigma_filenames.get_list()
+            ]
+        else:
+            sigma_files = [(".", sigma_folder_path)]
+
+        if dmft_data is not None:
+            remote_sigma_folder = (
+                PurePosixPath(dmft_data.get_remote_path()) / "sigma_folder"
+            )
+            calcinfo.remote_symlink_list.extend(
+                (
+                    dmft_data.computer.uuid,
+                    (remote_sigma_folder / source).as_posix(),
+                    target,
+                )
+                for source, target in sigma_files
+            )
+        else:
+            calcinfo.local_copy_list.extend(
+                (
+                    sigma_folder.uuid,
+                    source,
+                    target,
+                )
+                for source, target in sigma_files
+            )
+
+        # the current script processes the transmission files as they are written
+        if compute_current:
+            current_parameters_filename = "current_parameters.pkl"
+            with open(temp_input_dir / current_parameters_filename, "wb") as file:
+                current_parameters = {
+                    **self.inputs.current.parameters.get_dict(),
+                    "temperature": self.inputs.current.temperature.value,
+                }
+                pickle.dump(current_parameters, file)
+
+            energies_filepath = (precomputed_input_dir / "energies.npy").as_posix()
+            done_filepath = "results/transmission.done"
+
+            codeinfo.cmdline_params.extend(["--done-filepath", done_filepath])
+
+            current_codeinfo = CodeInfo()
+            current_codeinfo.code_uuid = self.inputs.current.code.uuid
+            # a single process polling the transmission folder, next to the mpi run
+            current_codeinfo.withmpi = False
+            current_codeinfo.cmdline_params = [
+                "--parameters-filename",
+                current_parameters_filename,
+                "--energies-filepath",
+                energies_filepath,
+                "--transmission-folder-path",
+                "results/transmission_folder",
+                "--done-filepath",
+                done_filepath,
+            ]
+
+            hybridization_data = self.inputs.hybridization.remote_results_folder
+
+            calcinfo.codes_info.append(current_codeinfo)
+            calcinfo.codes_run_mode = CodeRunMode.PARALLEL
+            calcinfo.remote_symlink_list.append(
+                (
+                    hybridization_data.computer.uuid,
+                    f"{hybridization_data.get_remote_path()}/energies.npy",
+                    energies_filepath,
+                )
+            )
 
         return calcinfo
@@ -1,5 +1,7 @@
 from .custom import CustomData
+from .remote import RemoteFileData
 
 __all__ = [
     "CustomData",
+    "RemoteFileData",
 ]
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+
+from aiida import orm
+
+from aiida_quantum_transport.formats.manifest import get_checksum
+
+
+class RemoteFileData(orm.RemoteData):
+    """A lazy reference to a file left on the remote computer.
+
+    The node points to the remote folder holding the file, and records the
+    name, size and checksum of the file, such that it can be fetched and
+    verified on demand.
+    """
+
+    def __init__(
+        self,
+        remote_path: str,
+        filename: str,
+        size: int | None = None,
+        checksum: str | None = None,
+        **kwargs,
+    ) -> None:
+        """Construct a reference to a remote file.
+
+        Parameters
+        ----------
+        `remote_path` : `str`
+            The absolute path to the remote folder holding the file.
+        `filename` : `str`
+            The name of the file.
+        `size` : `int | None`
+            The size of the file in bytes, if known.
+        `checksum` : `str | None`
+            The SHA-256 checksum of the file, if known.
+        """
+        super().__init__(remote_path=remote_path, **kwargs)
+        self.base.attributes.set("filename", filename)
+        self.base.attributes.set("size", size)
+        self.base.attributes.set("checksum", checksum)
+
+    @property
+    def filename(self) -> str:
+        """The name of the file."""
+        return self.base.attributes.get("filename")
+
+    @property
+    def size(self) -> int | None:
+        """The size of the file in bytes, if known."""
+        return self.base.attributes.get("size", None)
+
+    @property
+    def checksum(self) -> str | None:
+        """The SHA-256 checksum of the file, if known."""
+        return self.base.attributes.get("checksum", None)
+
+    def get_file_path(self) -> str:
+        """Get the absolute path to the file on the remote computer."""
+        return f"{self.get_remote_path()}/{self.filename}"
+
+    def fetch(self) -> orm.SinglefileData:
+        """Retrieve the file from the remote computer.
+
+        Returns
+        -------
+        `orm.SinglefileData`
+            The unstored file node.
+
+        Raises
+        ------
+        `OSError`
+            If the file does not exist anymore on the remote computer.
+        `ValueError`
+            If the checksum of the retrieved file does not match.
+        """
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / self.filename
+            self.getfile(self.filename, str(path))
+
+            if self.checksum is not None and get_checksum(path) != self.checksum:
+                raise ValueError(
+                    f"Checksum mismatch for `{self.get_file_path()}` on "
+                    f"{self.computer.label}; the file changed since the reference "
+                    "was created"
+                )
+
+            return orm.SinglefileData(path)
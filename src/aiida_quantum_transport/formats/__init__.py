@@ -0,0 +1,34 @@
+from .grid import refine_energy_grid
+from .hamiltonian import read_hamiltonian, write_hamiltonian
+from .lcao import read_lcao_bundle, write_lcao_bundle
+from .manifest import MANIFEST_FILENAME, read_manifest, write_manifest
+from .selfenergy import (
+    CachedSelfEnergy,
+    EmbeddedSelfEnergy,
+    MirroredSelfEnergy,
+    TabulatedSelfEnergy,
+    read_self_energy_table,
+    tabulate_self_energies,
+    write_self_energy_table,
+)
+from .tridiagonal import read_block_tridiagonal, write_block_tridiagonal
+
+__all__ = [
+    "CachedSelfEnergy",
+    "EmbeddedSelfEnergy",
+    "MANIFEST_FILENAME",
+    "MirroredSelfEnergy",
+    "TabulatedSelfEnergy",
+    "read_block_tridiagonal",
+    "read_hamiltonian",
+    "read_lcao_bundle",
+    "read_manifest",
+    "read_self_energy_table",
+    "refine_energy_grid",
+    "tabulate_self_energies",
+    "write_block_tridiagonal",
+    "write_hamiltonian",
+    "write_lcao_bundle",
+    "write_manifest",
+    "write_self_energy_table",
+]
@@ -0,0 +1,110 @@
+"""Adaptive energy grids, on which the transmission is sampled.
+
+In adaptive mode, the transmission script samples each transmission on its own
+non-uniform energy grid, refined where the transmission changes sharply, and
+stores the `(E, T)` pair, integrated as such by the current script.
+
+The module depends only on `numpy`, such that it can be imported by the
+scripts on the remote computer.
+"""
+
+from __future__ import annotations
+
+import typing as t
+
+import numpy as np
+
+# the relative height above its neighbours of a sampled peak of the transmission,
+# above which it is tracked, i.e., above the numerical noise of the transmission
+PEAK_PROMINENCE = 1e-6
+
+
+def get_peak_intervals(transmission: np.ndarray) -> np.ndarray:
+    """Get the intervals adjacent to the sampled peaks of the transmission.
+
+    A resonance narrower than the grid shows as a sampled peak at the point
+    nearest to it, whichever side of the point it lies on.
+
+    Parameters
+    ----------
+    `transmission` : `np.ndarray`
+        The transmission on the (sorted) energies of the grid.
+
+    Returns
+    -------
+    `np.ndarray`
+        The indices of the intervals on either side of each peak.
+    """
+    center = transmission[1:-1]
+    left, right = transmission[:-2], transmission[2:]
+    threshold = PEAK_PROMINENCE * np.abs(center)
+    # the first of two equal points of a peak centered between them
+    is_peak = (center - left > threshold) & (center - right >= -threshold)
+    (peaks,) = np.nonzero(is_peak)
+    return np.concatenate((peaks, peaks + 1))
+
+
+def refine_energy_grid(
+    get_transmission: t.Callable[[np.ndarray], np.ndarray],
+    E_min: float,
+    E_max: float,
+    E_coarse_step: float,
+    tolerance: float,
+    max_depth: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Sample the transmission on an adaptively refined energy grid.
+
+    Starting from a coarse uniform grid, the intervals are recursively bisected
+    where the transmission at the midpoint deviates from the linear
+    interpolation of its end points by more than the tolerance, i.e., where the
+    transmission changes sharply. As a resonance narrower than the coarse step
+    may fall between two points, leaving the midpoint test blind to it, the
+    intervals adjacent to each sampled peak are bisected as well, closing in on
+    the resonance at each level.
+
+    Parameters
+    ----------
+    `get_transmission` : `Callable[[np.ndarray], np.ndarray]`
+        Computes the transmission on an array of energies.
+    `E_min` : `float`
+        The lower bound of the energy window.
+    `E_max` : `float`
+        The upper bound of the energy window.
+    `E_coarse_step` : `float`
+        The step of the initial coarse grid.
+    `tolerance` : `float`
+        The (absolute) tolerance on the transmission interpolation error.
+    `max_depth` : `int`
+        The maximum number of bisections, i.e., the finest step is
+        `E_coarse_step / 2**max_depth`.
+
+    Returns
+    -------
+    `tuple[np.ndarray, np.ndarray]`
+        The (non-uniform) energies and transmission.
+    """
+
+    energies = np.linspace(E_min, E_max, int((E_max - E_min) / E_coarse_step) + 1)
+    transmission = get_transmission(energies)
+    refine = np.ones(energies.size - 1, dtype=bool)
+
+    for _ in range(max_depth):
+        refine[get_peak_intervals(transmission)] = True
+        indices = np.flatnonzero(refine)
+        if not indices.size:
+            break
+
+        midpoints = (energies[indices] + energies[indices + 1]) / 2
+        midpoint_transmission = get_transmission(midpoints)
+        interpolated = (transmission[indices] + transmission[indices + 1]) / 2
+        unresolved = np.abs(midpoint_transmission - interpolated) > tolerance
+
+        energies = np.insert(energies, indices + 1, midpoints)
+        transmission = np.insert(transmission, indices + 1, midpoint_transmission)
+
+        # each bisected interval is now two intervals, further refined if needed
+        halves = (indices + np.arange(indices.size))[unresolved]
+        refine = np.zeros(energies.size - 1, dtype=bool)
+        refine[halves] = refine[halves + 1] = True
+
+    return energies, transmission
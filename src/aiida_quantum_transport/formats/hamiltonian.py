@@ -0,0 +1,382 @@
+"""Packed storage of the Hamiltonian and overlap matrices.
+
+The matrices are Hermitian per k-point, such that only their upper triangle is
+stored, in a sparse representation dropping the elements below a threshold.
+Alternatively, the matrices are stored in a block-sparse layout, e.g., of the
+orbitals of each atom, keeping the blocks of the upper block triangle with any
+element above the threshold. The packed arrays are stored in an `.npz` archive,
+optionally compressed.
+
+The module depends only on `numpy`, such that it can be imported by the
+scripts on the remote computer.
+"""
+
+from __future__ import annotations
+
+import typing as t
+from pathlib import Path
+
+import numpy as np
+
+FORMAT_NAME = "hermitian-packed"
+FORMAT_VERSION = 2
+
+LAYOUTS = ("elements", "blocks")
+
+PathOrFile = t.Union[str, Path, t.BinaryIO]
+
+
+def pack_hermitian(
+    matrices: np.ndarray,
+    threshold: float = 0.0,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pack the upper triangle of a stack of Hermitian matrices.
+
+    The stack is packed row by row, to avoid allocating the dense index arrays
+    of the upper triangle of large matrices.
+
+    Parameters
+    ----------
+    `matrices` : `np.ndarray`
+        The `(nk, n, n)` stack of Hermitian matrices.
+    `threshold` : `float`
+        The magnitude at or below which an element is dropped, `0.0` by
+        default, i.e., only exact zeros are dropped.
+
+    Returns
+    -------
+    `tuple[np.ndarray, np.ndarray, np.ndarray]`
+        The flat `i * n + j` indices of the kept elements, the offsets of the
+        elements of each matrix in the former, and the values of the elements.
+    """
+
+    nk, n, _ = matrices.shape
+    index_dtype = np.int32 if n * n <= np.iinfo(np.int32).max else np.int64
+
+    indices, values = [], []
+    indptr = np.zeros(nk + 1, dtype=np.int64)
+
+    for k in range(nk):
+        count = 0
+        for i in range(n):
+            row = matrices[k, i, i:]
+            (columns,) = np.nonzero(np.abs(row) > threshold)
+            indices.append((i * n + i + columns).astype(index_dtype))
+            values.append(row[columns])
+            count += columns.size
+        indptr[k + 1] = indptr[k] + count
+
+    return (
+        np.concatenate(indices) if indices else np.empty(0, dtype=index_dtype),
+        indptr,
+        np.concatenate(values) if values else np.empty(0, dtype=matrices.dtype),
+    )
+
+
+def unpack_hermitian(
+    indices: np.ndarray,
+    indptr: np.ndarray,
+    values: np.ndarray,
+    n: int,
+) -> np.ndarray:
+    """Unpack a stack of Hermitian matrices packed with `pack_hermitian`.
+
+    Parameters
+    ----------
+    `indices` : `np.ndarray`
+        The flat `i * n + j` indices of the packed elements.
+    `indptr` : `np.ndarray`
+        The offsets of the elements of each matrix in `indices`.
+    `values` : `np.ndarray`
+        The values of the packed elements.
+    `n` : `int`
+        The size of the matrices.
+
+    Returns
+    -------
+    `np.ndarray`
+        The dense `(nk, n, n)` stack of Hermitian matrices.
+    """
+
+    nk = indptr.size - 1
+    matrices = np.zeros((nk, n, n), dtype=values.dtype)
+
+    for k in range(nk):
+        elements = slice(indptr[k], indptr[k + 1])
+        rows, columns = np.divmod(indices[elements], n)
+        matrices[k, columns, rows] = values[elements].conj()
+        matrices[k, rows, columns] = values[elements]
+
+    return matrices
+
+
+def get_block_offsets(block_sizes: np.ndarray) -> np.ndarray:
+    """Get the offsets of contiguous blocks of the given sizes.
+
+    Parameters
+    ----------
+    `block_sizes` : `np.ndarray`
+        The positive sizes of the blocks.
+
+    Returns
+    -------
+    `np.ndarray`
+        The `nb + 1` offsets of the blocks, the last being the total size.
+
+    Raises
+    ------
+    `ValueError`
+        If any of the sizes is not positive.
+    """
+
+    block_sizes = np.asarray(block_sizes, dtype=np.int64)
+
+    if np.any(block_sizes <= 0):
+        raise ValueError("Expected positive block sizes")
+
+    return np.insert(np.cumsum(block_sizes), 0, 0)
+
+
+def pack_hermitian_blocks(
+    matrices: np.ndarray,
+    block_sizes: np.ndarray,
+    threshold: float = 0.0,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pack the upper block triangle of a stack of Hermitian matrices.
+
+    The blocks with any element above the threshold are kept whole. Diagonal
+    blocks are stored in full.
+
+    Parameters
+    ----------
+    `matrices` : `np.ndarray`
+        The `(nk, n, n)` stack of Hermitian matrices.
+    `block_sizes` : `np.ndarray`
+        The sizes of the `nb` blocks partitioning the rows and columns.
+    `threshold` : `float`
+        The magnitude at or below which all elements of a block must be for it
+        to be dropped, `0.0` by default, i.e., only blocks of zeros are dropped.
+
+    Returns
+    -------
+    `tuple[np.ndarray, np.ndarray, np.ndarray]`
+        The flat `bi * nb + bj` indices of the kept blocks, the offsets of the
+        blocks of each matrix in the former, and the raveled values of the
+        blocks.
+    """
+
+    nk, n, _ = matrices.shape
+    offsets = get_block_offsets(block_sizes)
+    nb = offsets.size - 1
+
+    if offsets[-1] != n:
+        raise ValueError(f"Expected block sizes adding up to {n}; got {offsets[-1]}")
+
+    indices, values = [], []
+    indptr = np.zeros(nk + 1, dtype=np.int64)
+
+    for k in range(nk):
+        count = 0
+        for bi in range(nb):
+            start = offsets[bi]
+            row = matrices[k, start : offsets[bi + 1], start:]
+            magnitudes = np.maximum.reduceat(
+                np.abs(row).max(axis=0),
+                offsets[bi:-1] - start,
+            )
+            (columns,) = np.nonzero(magnitudes > threshold)
+            for bj in bi + columns:
+                block = row[:, offsets[bj] - start : offsets[bj + 1] - start]
+                values.append(block.ravel())
+            indices.append(bi * nb + bi + columns)
+            count += columns.size
+        indptr[k + 1] = indptr[k] + count
+
+    return (
+        np.concatenate(indices) if indices else np.empty(0, dtype=np.int64),
+        indptr,
+        np.concatenate(values) if values else np.empty(0, dtype=matrices.dtype),
+    )
+
+
+def unpack_hermitian_blocks(
+    indices: np.ndarray,
+    indptr: np.ndarray,
+    values: np.ndarray,
+    block_sizes: np.ndarray,
+) -> np.ndarray:
+    """Unpack a stack of Hermitian matrices packed with `pack_hermitian_blocks`.
+
+    Parameters
+    ----------
+    `indices` : `np.ndarray`
+        The flat `bi * nb + bj` indices of the packed blocks.
+    `indptr` : `np.ndarray`
+        The offsets of the blocks of each matrix in `indices`.
+    `values` : `np.ndarray`
+        The raveled values of the packed blocks.
+    `block_sizes` : `np.ndarray`
+        The sizes of the blocks.
+
+    Returns
+    -------
+    `np.ndarray`
+        The dense `(nk, n, n)` stack of Hermitian matrices.
+    """
+
+    offsets = get_block_offsets(block_sizes)
+    nb = offsets.size - 1
+    n = int(offsets[-1])
+
+    nk = indptr.size - 1
+    matrices = np.zeros((nk, n, n), dtype=values.dtype)
+
+    position = 0
+    for k in range(nk):
+        for index in indices[indptr[k] : indptr[k + 1]]:
+            bi, bj = divmod(int(index), nb)
+            rows = slice(offsets[bi], offsets[bi + 1])
+            columns = slice(offsets[bj], offsets[bj + 1])
+            size = (rows.stop - rows.start) * (columns.stop - columns.start)
+            block = values[position : position + size].reshape(
+                rows.stop - rows.start,
+                columns.stop - columns.start,
+            )
+            position += size
+            matrices[k, rows, columns] = block
+            if bi != bj:
+                matrices[k, columns, rows] = block.T.conj()
+
+    return matrices
+
+
+def write_hamiltonian(
+    file: PathOrFile,
+    H_kMM: np.ndarray,
+    S_kMM: np.ndarray,
+    threshold: float = 0.0,
+    compress: bool = True,
+    *,
+    block_sizes: np.ndarray | None = None,
+) -> None:
+    """Write the Hamiltonian and overlap matrices in the packed format.
+
+    Only the upper triangle of the matrices is stored; the lower triangle is
+    assumed to be its conjugate transpose. If block sizes are given, the
+    matrices are stored in the block-sparse layout.
+
+    Parameters
+    ----------
+    `file` : `str | Path | BinaryIO`
+        The file to write to. A `.npz` extension is appended to paths missing
+        it.
+    `H_kMM` : `np.ndarray`
+        The `(nk, n, n)` Hamiltonian matrices.
+    `S_kMM` : `np.ndarray`
+        The `(nk, n, n)` overlap matrices.
+    `threshold` : `float`
+        The magnitude at or below which an element is dropped, `0.0` by default.
+    `compress` : `bool`
+        If the archive should be compressed, `True` by default.
+    `block_sizes` : `np.ndarray | None`
+        The sizes of the blocks of the block-sparse layout, e.g., the number
+        of orbitals of each atom. If `None` (default), elements are packed.
+    """
+
+    if H_kMM.shape != S_kMM.shape or H_kMM.ndim != 3:
+        raise ValueError(
+            "Expected Hamiltonian and overlap stacks of equal `(nk, n, n)` "
+            f"shape; got `{H_kMM.shape}` and `{S_kMM.shape}`"
+        )
+
+    arrays: dict[str, t.Any] = {
+        "format": np.array(FORMAT_NAME),
+        "version": np.array(FORMAT_VERSION),
+        "shape": np.array(H_kMM.shape[:2]),
+        "threshold": np.array(threshold),
+        "layout": np.array("elements" if block_sizes is None else "blocks"),
+    }
+
+    if block_sizes is not None:
+        arrays["block_sizes"] = np.asarray(block_sizes)
+
+    for name, matrices in (("H", H_kMM), ("S", S_kMM)):
+        if block_sizes is None:
+            indices, indptr, values = pack_hermitian(matrices, threshold)
+        else:
+            indices, indptr, values = pack_hermitian_blocks(
+                matrices,
+                block_sizes,
+                threshold,
+            )
+        arrays[f"{name}_indices"] = indices
+        arrays[f"{name}_indptr"] = indptr
+        arrays[f"{name}_values"] = values
+
+    save = np.savez_compressed if compress else np.savez
+    save(file, **arrays)
+
+
+def read_hamiltonian(file: PathOrFile) -> tuple[np.ndarray, np.ndarray]:
+    """Read the Hamiltonian and overlap matrices.
+
+    Both layouts of the packed format and the legacy dense `(H_kMM, S_kMM)`
+    `.npy` format are supported.
+
+    Parameters
+    ----------
+    `file` : `str | Path | BinaryIO`
+        The file to read from.
+
+    Returns
+    -------
+    `tuple[np.ndarray, np.ndarray]`
+        The dense `(nk, n, n)` Hamiltonian and overlap matrices.
+
+    Raises
+    ------
+    `ValueError`
+        If the file is of an unknown format or version.
+    """
+
+    data = np.load(file)
+
+    if isinstance(data, np.ndarray):
+        H_kMM, S_kMM = data
+        return H_kMM, S_kMM
+
+    with data:
+        if "format" not in data or str(data["format"]) != FORMAT_NAME:
+            raise ValueError("Unknown Hamiltonian file format")
+
+        version = int(data["version"])
+        if version > FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported Hamiltonian file version {version}; "
+                f"expected at most {FORMAT_VERSION}"
+            )
+
+        _, n = data["shape"]
+        layout = str(data["layout"]) if "layout" in data else "elements"
+
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown Hamiltonian file layout `{layout}`")
+
+        H_kMM, S_kMM = (
+            unpack_hermitian(
+                data[f"{name}_indices"],
+                data[f"{name}_indptr"],
+                data[f"{name}_values"],
+                int(n),
+            )
+            if layout == "elements"
+            else unpack_hermitian_blocks(
+                data[f"{name}_indices"],
+                data[f"{name}_indptr"],
+                data[f"{name}_values"],
+                data["block_sizes"],
+            )
+            for name in ("H", "S")
+        )
+
+    return H_kMM, S_kMM
@@ -0,0 +1,124 @@
+"""Compact export of the LCAO data of a dft calculation.
+
+The bundle holds what the localization needs from a dft calculation, i.e., the
+Hamiltonian and overlap matrices at the first k-point, the Fermi level, the
+number of atomic orbitals per atom and the atoms, such that it can be run
+without loading the full restart file of the calculation.
+"""
+
+from __future__ import annotations
+
+import typing as t
+
+import numpy as np
+
+from .hamiltonian import PathOrFile, pack_hermitian, unpack_hermitian
+
+LCAO_FORMAT_NAME = "lcao-bundle"
+LCAO_FORMAT_VERSION = 1
+
+
+def write_lcao_bundle(
+    file: PathOrFile,
+    H_MM: np.ndarray,
+    S_MM: np.ndarray,
+    *,
+    fermi_level: float,
+    nao_a: np.ndarray,
+    atoms: t.Any,
+    compress: bool = True,
+) -> None:
+    """Write the LCAO bundle of a dft calculation.
+
+    The matrices are stored as their Hermitian-packed upper triangle.
+
+    Parameters
+    ----------
+    `file` : `str | Path | BinaryIO`
+        The file to write to. A `.npz` extension is appended to paths missing
+        it.
+    `H_MM` : `np.ndarray`
+        The `(n, n)` Hamiltonian matrix, not shifted by the Fermi level.
+    `S_MM` : `np.ndarray`
+        The `(n, n)` overlap matrix.
+    `fermi_level` : `float`
+        The Fermi level.
+    `nao_a` : `np.ndarray`
+        The number of atomic orbitals of each atom.
+    `atoms` : `ase.Atoms`
+        The atoms, of which the numbers, positions, cell and periodicity are
+        stored.
+    `compress` : `bool`
+        If the archive should be compressed, `True` by default.
+    """
+
+    arrays: dict[str, t.Any] = {
+        "format": np.array(LCAO_FORMAT_NAME),
+        "version": np.array(LCAO_FORMAT_VERSION),
+        "fermi_level": np.array(fermi_level),
+        "nao": np.asarray(nao_a),
+        "numbers": np.asarray(atoms.numbers),
+        "positions": np.asarray(atoms.positions),
+        "cell": np.asarray(atoms.cell[:]),
+        "pbc": np.asarray(atoms.pbc),
+    }
+
+    for name, matrix in (("H", H_MM), ("S", S_MM)):
+        indices, indptr, values = pack_hermitian(matrix[None, ...])
+        arrays[f"{name}_indices"] = indices
+        arrays[f"{name}_indptr"] = indptr
+        arrays[f"{name}_values"] = values
+
+    save = np.savez_compressed if compress else np.savez
+    save(file, **arrays)
+
+
+def read_lcao_bundle(file: PathOrFile) -> dict[str, t.Any]:
+    """Read the LCAO bundle of a dft calculation.
+
+    Parameters
+    ----------
+    `file` : `str | Path | BinaryIO`
+        The file to read from.
+
+    Returns
+    -------
+    `dict[str, Any]`
+        The dense `H` and `S` matrices, the `fermi_level`, the `nao` per atom,
+        and the `numbers`, `positions`, `cell` and `pbc` of the atoms.
+
+    Raises
+    ------
+    `ValueError`
+        If the file is of an unknown format or version.
+    """
+
+    with np.load(file) as data:
+        if "format" not in data or str(data["format"]) != LCAO_FORMAT_NAME:
+            raise ValueError("Unknown LCAO bundle format")
+
+        version = int(data["version"])
+        if version > LCAO_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported LCAO bundle version {version}; "
+                f"expected at most {LCAO_FORMAT_VERSION}"
+            )
+
+        n = int(data["nao"].sum())
+
+        bundle = {
+            name: unpack_hermitian(
+                data[f"{name}_indices"],
+                data[f"{name}_indptr"],
+                data[f"{name}_values"],
+                n,
+            )[0]
+            for name in ("H", "S")
+        }
+
+        bundle["fermi_level"] = float(data["fermi_level"])
+
+        for name in ("nao", "numbers", "positions", "cell", "pbc"):
+            bundle[name] = data[name]
+
+    return bundle
@@ -0,0 +1,90 @@
+"""Manifest of the size and checksum of the files of a results directory.
+
+The manifest is written on the remote computer, such that files left there by
+the retrieval policy of a calculation can be referenced with their metadata,
+without being transferred.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import typing as t
+from pathlib import Path
+
+MANIFEST_FILENAME = "manifest.json"
+
+_CHUNK_SIZE = 2**24
+
+
+def get_checksum(path: str | Path) -> str:
+    """Get the SHA-256 checksum of a file, read in chunks.
+
+    Parameters
+    ----------
+    `path` : `str | Path`
+        The path to the file.
+
+    Returns
+    -------
+    `str`
+        The hexadecimal digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_manifest(
+    directory: str | Path,
+    filenames: t.Iterable[str] | None = None,
+) -> None:
+    """Write the manifest of the files of a directory.
+
+    Parameters
+    ----------
+    `directory` : `str | Path`
+        The directory.
+    `filenames` : `Iterable[str] | None`
+        The files to include, relative to the directory, all the files of the
+        directory and its sub-directories by default.
+    """
+
+    directory = Path(directory)
+
+    if filenames is None:
+        filenames = sorted(
+            path.relative_to(directory).as_posix()
+            for path in directory.rglob("*")
+            if path.is_file() and path.name != MANIFEST_FILENAME
+        )
+
+    manifest = {
+        filename: {
+            "size": (directory / filename).stat().st_size,
+            "checksum": get_checksum(directory / filename),
+        }
+        for filename in filenames
+    }
+
+    with open(directory / MANIFEST_FILENAME, "w") as file:
+        json.dump(manifest, file, indent=2)
+
+
+def read_manifest(path: str | Path) -> dict[str, dict]:
+    """Read a manifest.
+
+    Parameters
+    ----------
+    `path` : `str | Path`
+        The path to the manifest.
+
+    Returns
+    -------
+    `dict[str, dict]`
+        The `size` and `checksum` of each file, by filename.
+    """
+    with open(path) as file:
+        return json.load(file)
@@ -0,0 +1,329 @@
+"""Lead self-energies, shared by the stages evaluating them.
+
+A lead self-energy computed on a principal layer smaller than the block of the
+device it couples to is wrapped in an `EmbeddedSelfEnergy`, placing it on the
+orbitals of the block adjacent to the lead. In mirror-symmetric junctions, the
+self-energy of the right lead is a `MirroredSelfEnergy`, derived from the
+`CachedSelfEnergy` of the left lead at the same energy.
+
+The self-energies of the leads are tabulated on one or more energy grids, e.g.,
+the real and Matsubara grids, and stored in a memory-mappable block file (see
+`tridiagonal`). Downstream, each lead self-energy is wrapped in a
+`TabulatedSelfEnergy`, looking up the energies of its tables instead of
+recomputing the surface Green's function, and falling back to the wrapped
+self-energy otherwise. As the self-energies depend on the broadening `eta` of
+the Green's function, each table records the `eta` it was computed with, and
+is only looked up at the same broadening.
+
+The module depends only on `numpy`, such that it can be imported by the
+scripts on the remote computer.
+"""
+
+from __future__ import annotations
+
+import typing as t
+from pathlib import Path
+
+import numpy as np
+
+from .tridiagonal import read_blocks, write_blocks
+
+SELF_ENERGY_TABLE_FORMAT_NAME = "self-energy-table"
+SELF_ENERGY_TABLE_FORMAT_VERSION = 2
+
+# the tolerance within which an energy (and broadening) is looked up in a table
+ENERGY_TOLERANCE = 1e-10
+
+SelfEnergyTable = t.Mapping[str, tuple[np.ndarray, t.Sequence[np.ndarray], float]]
+
+
+def write_self_energy_table(file: str | Path, grids: SelfEnergyTable) -> None:
+    """Write the self-energies of the leads, tabulated on energy grids.
+
+    Parameters
+    ----------
+    `file` : `str | Path`
+        The file to write to.
+    `grids` : `Mapping[str, tuple[np.ndarray, Sequence[np.ndarray], float]]`
+        The energies of each grid, by name, the `(n_energies, n, n)`
+        self-energies of each lead on the grid, in the order of the leads, and
+        the broadening `eta` they were computed with.
+    """
+
+    blocks = {}
+    for grid, (energies, sigmas, _) in grids.items():
+        blocks[f"{grid}/energies"] = np.asarray(energies)
+        for lead, sigma in enumerate(sigmas):
+            blocks[f"{grid}/{lead}"] = sigma
+
+    write_blocks(
+        file,
+        blocks,
+        SELF_ENERGY_TABLE_FORMAT_NAME,
+        SELF_ENERGY_TABLE_FORMAT_VERSION,
+        grids={grid: len(sigmas) for grid, (_, sigmas, _) in grids.items()},
+        etas={grid: float(eta) for grid, (_, _, eta) in grids.items()},
+    )
+
+
+def read_self_energy_table(
+    file: str | Path,
+    mmap: bool = True,
+) -> dict[str, tuple[np.ndarray, list[np.ndarray], float]]:
+    """Read the self-energies of the leads, tabulated on energy grids.
+
+    Parameters
+    ----------
+    `file` : `str | Path`
+        The file to read from.
+    `mmap` : `bool`
+        If the tables should be views of a copy-on-write memory map of the
+        file, `True` by default. Otherwise, they are read into memory.
+
+    Returns
+    -------
+    `dict[str, tuple[np.ndarray, list[np.ndarray], float]]`
+        The energies of each grid, by name, the self-energies of each lead on
+        the grid, and the broadening they were computed with.
+
+    Raises
+    ------
+    `ValueError`
+        If the file is of an unknown format or version.
+    """
+
+    header, blocks = read_blocks(
+        file,
+        SELF_ENERGY_TABLE_FORMAT_NAME,
+        SELF_ENERGY_TABLE_FORMAT_VERSION,
+        mmap,
+    )
+
+    return {
+        grid: (
+            blocks[f"{grid}/energies"],
+            [blocks[f"{grid}/{lead}"] for lead in range(number_of_leads)],
+            header["etas"][grid],
+        )
+        for grid, number_of_leads in header["grids"].items()
+    }
+
+
+class SelfEnergyWrapper:
+    """Base of the wrappers of a lead self-energy.
+
+    All attributes but the retarded self-energy and the broadening matrix
+    derived from it are delegated to the wrapped self-energy. The broadening
+    `eta`, set on the self-energies by the Green's function, is forwarded to
+    the wrapped self-energy as well.
+    """
+
+    def __init__(self, selfenergy: t.Any) -> None:
+        self.selfenergy = selfenergy
+
+    def __getattr__(self, name: str) -> t.Any:
+        # not yet set while unpickling
+        if name == "selfenergy":
+            raise AttributeError(name)
+        return getattr(self.selfenergy, name)
+
+    @property
+    def eta(self) -> float:
+        """The broadening of the wrapped self-energy."""
+        return self.selfenergy.eta
+
+    @eta.setter
+    def eta(self, eta: float) -> None:
+        self.selfenergy.eta = eta
+
+    def retarded(self, energy: complex) -> np.ndarray:
+        """Get the retarded self-energy."""
+        return self.selfenergy.retarded(energy)
+
+    def get_lambda(self, energy: complex) -> np.ndarray:
+        """Get the broadening matrix, from the (wrapped) retarded self-energy."""
+        sigma = self.retarded(energy)
+        return 1.0j * (sigma - sigma.T.conj())
+
+
+class EmbeddedSelfEnergy(SelfEnergyWrapper):
+    """A lead self-energy embedded into the block of the device it couples to.
+
+    The lead couples only to the orbitals of the block adjacent to it, i.e.,
+    the first principal layer of the block for the left lead, and the last one
+    for the right lead.
+    """
+
+    def __init__(self, selfenergy: t.Any, nao: int, offset: int) -> None:
+        """Construct an embedded self-energy.
+
+        Parameters
+        ----------
+        `selfenergy` : `qtpyt.base.leads.LeadSelfEnergy`
+            The self-energy of the lead, on its principal layer.
+        `nao` : `int`
+            The number of orbitals of the block.
+        `offset` : `int`
+            The index of the first orbital of the block the lead couples to.
+        """
+        super().__init__(selfenergy)
+        self.nao = nao
+        self.offset = offset
+
+    def retarded(self, energy: complex) -> np.ndarray:
+        """Get the retarded self-energy on the orbitals of the block."""
+        sigma_pl = self.selfenergy.retarded(energy)
+        end = self.offset + sigma_pl.shape[0]
+        sigma = np.zeros((self.nao, self.nao), dtype=complex)
+        sigma[self.offset : end, self.offset : end] = sigma_pl
+        return sigma
+
+
+class CachedSelfEnergy(SelfEnergyWrapper):
+    """A lead self-energy remembering its value at the last energy.
+
+    Shared by a `MirroredSelfEnergy`, the self-energy is computed once per
+    energy for both leads.
+    """
+
+    def __init__(self, selfenergy: t.Any) -> None:
+        """Construct a cached self-energy.
+
+        Parameters
+        ----------
+        `selfenergy` : `qtpyt.base.leads.LeadSelfEnergy`
+            The self-energy to cache.
+        """
+        super().__init__(selfenergy)
+        self.energy: complex | None = None
+        self.sigma: np.ndarray | None = None
+
+    def retarded(self, energy: complex) -> np.ndarray:
+        """Get the retarded self-energy, computed if not at the last energy."""
+        if self.sigma is None or energy != self.energy:
+            self.sigma = self.selfenergy.retarded(energy)
+            self.energy = energy
+        # a copy, such that callers cannot alter the cache
+        return np.array(self.sigma)
+
+    @property
+    def eta(self) -> float:
+        """The broadening of the wrapped self-energy."""
+        return self.selfenergy.eta
+
+    @eta.setter
+    def eta(self, eta: float) -> None:
+        # the cached self-energy was computed with the previous broadening
+        if eta != self.selfenergy.eta:
+            self.sigma = None
+        self.selfenergy.eta = eta
+
+
+class MirroredSelfEnergy(SelfEnergyWrapper):
+    """The self-energy of a lead, mirroring that of the opposite lead.
+
+    In a junction symmetric under a mirror exchanging its leads, represented
+    on the orbitals of the lead blocks by the signed permutation `P`, the
+    self-energy of the right lead is `P sigma_L P^T`, where `sigma_L` is that
+    of the left lead at the same energy.
+    """
+
+    def __init__(
+        self,
+        selfenergy: t.Any,
+        permutation: np.ndarray,
+        signs: np.ndarray,
+    ) -> None:
+        """Construct a mirrored self-energy.
+
+        Parameters
+        ----------
+        `selfenergy` : `CachedSelfEnergy`
+            The self-energy of the opposite lead.
+        `permutation` : `np.ndarray`
+            The orbital each orbital is mirrored onto.
+        `signs` : `np.ndarray`
+            The sign each orbital picks up under the mirror.
+        """
+        super().__init__(selfenergy)
+        self.permutation = permutation
+        self.signs = signs
+
+    def retarded(self, energy: complex) -> np.ndarray:
+        """Get the retarded self-energy, mirrored from the opposite lead."""
+        sigma = self.selfenergy.retarded(energy)
+        mirrored = sigma[np.ix_(self.permutation, self.permutation)]
+        return self.signs[:, None] * mirrored * self.signs[None, :]
+
+
+class TabulatedSelfEnergy(SelfEnergyWrapper):
+    """A lead self-energy looked up from its tables.
+
+    Energies missing from the tables, e.g., those of an adaptively refined
+    grid, and those at a broadening other than that of their table, are
+    delegated to the wrapped self-energy.
+    """
+
+    def __init__(
+        self,
+        selfenergy: t.Any,
+        tables: t.Sequence[tuple[np.ndarray, np.ndarray, float]],
+    ) -> None:
+        """Construct a tabulated self-energy.
+
+        Parameters
+        ----------
+        `selfenergy` : `qtpyt.base.leads.LeadSelfEnergy`
+            The self-energy the tables were computed from.
+        `tables` : `Sequence[tuple[np.ndarray, np.ndarray, float]]`
+            The energies, the self-energy on them, and the broadening it was
+            computed with, of each grid.
+        """
+        super().__init__(selfenergy)
+        self.tables = tables
+
+    def retarded(self, energy: complex) -> np.ndarray:
+        """Get the retarded self-energy, looked up if tabulated."""
+        for energies, sigma, eta in self.tables:
+            if abs(eta - self.eta) >= ENERGY_TOLERANCE:
+                continue
+            (indices,) = np.nonzero(np.abs(energies - energy) < ENERGY_TOLERANCE)
+            if indices.size:
+                # a copy, such that callers cannot alter the table
+                return np.array(sigma[indices[0]])
+        return self.selfenergy.retarded(energy)
+
+
+def tabulate_self_energies(
+    self_energies: t.Sequence[tuple[int, t.Any]],
+    grids: SelfEnergyTable,
+) -> list[tuple[int, TabulatedSelfEnergy]]:
+    """Wrap the self-energies of the leads in their tabulated counterparts.
+
+    Parameters
+    ----------
+    `self_energies` : `Sequence[tuple[int, LeadSelfEnergy]]`
+        The self-energies of the leads, with the index of the block they
+        couple to.
+    `grids` : `Mapping[str, tuple[np.ndarray, Sequence[np.ndarray], float]]`
+        The tables, as read by `read_self_energy_table`.
+
+    Returns
+    -------
+    `list[tuple[int, TabulatedSelfEnergy]]`
+        The tabulated self-energies, with the index of the block they couple
+        to.
+    """
+    return [
+        (
+            index,
+            TabulatedSelfEnergy(
+                selfenergy,
+                [
+                    (energies, sigmas[lead], eta)
+                    for energies, sigmas, eta in grids.values()
+                ],
+            ),
+        )
+        for lead, (index, selfenergy) in enumerate(self_energies)
+    ]
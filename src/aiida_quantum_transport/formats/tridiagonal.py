@@ -0,0 +1,239 @@
+"""Memory-mappable storage of block-tridiagonal Hamiltonian and overlap matrices.
+
+The diagonal `(h_ii, s_ii)` and off-diagonal `(h_ij, s_ij)` blocks are stored
+raw in a single file, following a JSON header indexing them. The blocks are
+aligned such that they can be viewed in place from a memory map of the file,
+allowing the processes of a node to share the pages of the file rather than
+each holding a private copy of the matrices.
+
+The layout of the file, shared by the other block files of the plugin, is
+- the magic string `QTBTD` padded to 8 bytes
+- the length of the header, as a little-endian 64-bit unsigned integer
+- the header, as UTF-8 encoded JSON, holding the name and version of the
+  format and the index of the blocks
+- the blocks, starting at the first multiple of `ALIGNMENT` past the header,
+  each at an offset, relative to the start of the blocks, that is a multiple
+  of `ALIGNMENT`
+
+The module depends only on `numpy`, such that it can be imported by the
+scripts on the remote computer.
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+import typing as t
+from pathlib import Path
+
+import numpy as np
+
+BTD_FORMAT_NAME = "block-tridiagonal"
+BTD_FORMAT_VERSION = 1
+
+MAGIC = b"QTBTD\x00\x00\x00"
+ALIGNMENT = 64
+
+HSList = t.Sequence[t.Sequence[np.ndarray]]
+
+
+def _align(offset: int) -> int:
+    """Round an offset up to the next multiple of the alignment."""
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_blocks(
+    file: str | Path,
+    blocks: t.Mapping[str, np.ndarray],
+    format_name: str,
+    format_version: int,
+    **metadata,
+) -> None:
+    """Write named arrays as aligned blocks, following a JSON header.
+
+    Parameters
+    ----------
+    `file` : `str | Path`
+        The file to write to.
+    `blocks` : `Mapping[str, np.ndarray]`
+        The arrays, by name.
+    `format_name` : `str`
+        The name of the format of the file.
+    `format_version` : `int`
+        The version of the format of the file.
+    `**metadata`
+        Additional (JSON-serializable) entries of the header.
+    """
+
+    arrays = {key: np.ascontiguousarray(array) for key, array in blocks.items()}
+
+    index: dict[str, dict[str, t.Any]] = {}
+    offset = 0
+    for key, array in arrays.items():
+        index[key] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset = _align(offset + array.nbytes)
+
+    header = json.dumps(
+        {
+            "format": format_name,
+            "version": format_version,
+            **metadata,
+            "blocks": index,
+        }
+    ).encode()
+
+    start = _align(len(MAGIC) + 8 + len(header))
+
+    with open(file, "wb") as stream:
+        stream.write(MAGIC)
+        stream.write(struct.pack("<Q", len(header)))
+        stream.write(header)
+        for key, array in arrays.items():
+            stream.seek(start + index[key]["offset"])
+            stream.write(array.tobytes())
+
+
+def read_blocks(
+    file: str | Path,
+    format_name: str,
+    format_version: int,
+    mmap: bool = True,
+) -> tuple[dict[str, t.Any], dict[str, np.ndarray]]:
+    """Read the named arrays of a block file.
+
+    Parameters
+    ----------
+    `file` : `str | Path`
+        The file to read from.
+    `format_name` : `str`
+        The expected name of the format of the file.
+    `format_version` : `int`
+        The latest supported version of the format.
+    `mmap` : `bool`
+        If the arrays should be views of a copy-on-write memory map of the
+        file, `True` by default, such that the unmodified pages are shared by
+        the processes reading the file. Otherwise, the file is read into
+        memory.
+
+    Returns
+    -------
+    `tuple[dict[str, Any], dict[str, np.ndarray]]`
+        The header and the arrays, by name.
+
+    Raises
+    ------
+    `ValueError`
+        If the file is of an unknown format or version.
+    """
+
+    with open(file, "rb") as stream:
+        if stream.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Unknown {format_name} file format")
+        (length,) = struct.unpack("<Q", stream.read(8))
+        header = json.loads(stream.read(length))
+
+    if header["format"] != format_name:
+        raise ValueError(
+            f"Expected a {format_name} file; got a {header['format']} file"
+        )
+
+    version = header["version"]
+    if version > format_version:
+        raise ValueError(
+            f"Unsupported {format_name} file version {version}; "
+            f"expected at most {format_version}"
+        )
+
+    start = _align(len(MAGIC) + 8 + length)
+
+    buffer: np.ndarray
+    if mmap:
+        buffer = np.memmap(file, dtype=np.uint8, mode="c")
+    else:
+        buffer = np.fromfile(file, dtype=np.uint8)
+
+    arrays = {}
+    for key, block in header["blocks"].items():
+        dtype = np.dtype(block["dtype"])
+        begin = start + block["offset"]
+        end = begin + dtype.itemsize * int(np.prod(block["shape"]))
+        arrays[key] = buffer[begin:end].view(dtype).reshape(block["shape"])
+
+    return header, arrays
+
+
+def write_block_tridiagonal(
+    file: str | Path,
+    hs_list_ii: HSList,
+    hs_list_ij: HSList,
+) -> None:
+    """Write block-tridiagonal Hamiltonian and overlap matrices.
+
+    Parameters
+    ----------
+    `file` : `str | Path`
+        The file to write to.
+    `hs_list_ii` : `Sequence[Sequence[np.ndarray]]`
+        The `(h_ii, s_ii)` diagonal blocks.
+    `hs_list_ij` : `Sequence[Sequence[np.ndarray]]`
+        The `(h_ij, s_ij)` blocks coupling each diagonal block to the next.
+    """
+
+    blocks = {
+        f"{kind}/{i}/{name}": matrix
+        for kind, hs_list in (("ii", hs_list_ii), ("ij", hs_list_ij))
+        for i, hs in enumerate(hs_list)
+        for name, matrix in zip(("h", "s"), hs)
+    }
+
+    write_blocks(
+        file,
+        blocks,
+        BTD_FORMAT_NAME,
+        BTD_FORMAT_VERSION,
+        sizes={"ii": len(hs_list_ii), "ij": len(hs_list_ij)},
+    )
+
+
+def read_block_tridiagonal(
+    file: str | Path,
+    mmap: bool = True,
+) -> tuple[list[tuple[np.ndarray, np.ndarray]], list[tuple[np.ndarray, np.ndarray]]]:
+    """Read block-tridiagonal Hamiltonian and overlap matrices.
+
+    Parameters
+    ----------
+    `file` : `str | Path`
+        The file to read from.
+    `mmap` : `bool`
+        If the blocks should be views of a copy-on-write memory map of the
+        file, `True` by default, such that the unmodified pages are shared by
+        the processes reading the file. Otherwise, the blocks are read into
+        memory.
+
+    Returns
+    -------
+    `tuple[list[tuple[np.ndarray, np.ndarray]], list[tuple[np.ndarray, np.ndarray]]]`
+        The `(h_ii, s_ii)` diagonal and `(h_ij, s_ij)` off-diagonal blocks.
+
+    Raises
+    ------
+    `ValueError`
+        If the file is of an unknown format or version.
+    """
+
+    header, blocks = read_blocks(file, BTD_FORMAT_NAME, BTD_FORMAT_VERSION, mmap)
+
+    hs_list_ii, hs_list_ij = (
+        [
+            (blocks[f"{kind}/{i}/h"], blocks[f"{kind}/{i}/s"])
+            for i in range(header["sizes"][kind])
+        ]
+        for kind in ("ii", "ij")
+    )
+
+    return hs_list_ii, hs_list_ij
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+from contextlib import ExitStack
+from glob import has_magic
+from pathlib import Path, PurePosixPath
+
+from aiida import orm
+from aiida.parsers import Parser
+
+from aiida_quantum_transport.calculations.base import BaseCalculation, OutputRule
+from aiida_quantum_transport.data import RemoteFileData
+from aiida_quantum_transport.formats import MANIFEST_FILENAME, read_manifest
+from aiida_quantum_transport.formats.manifest import get_checksum
+
+
+class BaseParser(Parser):
+    """docstring"""
+
+    def _get_remote_results_path(self, path: str = "") -> str:
+        """Get the path to (a sub-folder of) the remote results folder."""
+        return (
+            PurePosixPath(self.node.get_remote_workdir()) / "results" / path
+        ).as_posix()
+
+    def _get_remote_results_folder(self, path: str = "") -> orm.RemoteData:
+        """Get (a sub-folder of) the results folder on the remote computer."""
+        return orm.RemoteData(
+            self._get_remote_results_path(path),
+            computer=self.node.computer,
+        )
+
+    def _get_results_dir(
+        self,
+        retrieved_temporary_folder: str | None,
+        stack: ExitStack,
+    ) -> Path:
+        """Get the local results directory, retrieved for parsing.
+
+        Calculations retrieving the results into the repository, such as those
+        run before the output rules were introduced, are parsed from there.
+        """
+
+        if retrieved_temporary_folder is not None:
+            results_dir = Path(retrieved_temporary_folder) / "results"
+            if results_dir.is_dir():
+                return results_dir
+
+        if "results" in self.retrieved.base.repository.list_object_names():
+            return Path(stack.enter_context(self.retrieved.as_path())) / "results"
+
+        raise OSError("missing results directory")
+
+    def _out_results(self, retrieved_temporary_folder: str | None) -> None:
+        """Attach the outputs of the results directory, by their rules.
+
+        Outputs are stored straight from the retrieved files. The large outputs
+        left on the remote computer by the retrieval policy are attached as
+        remote references if the policy is `on_demand`, and skipped if it is
+        `never`. Outputs exceeding their size cap are attached as remote
+        references.
+
+        Parameters
+        ----------
+        `retrieved_temporary_folder` : `str | None`
+            The folder holding the files retrieved for parsing.
+
+        Raises
+        ------
+        `OSError`
+            If a required output is missing.
+        """
+
+        process_class: type[BaseCalculation] = self.node.process_class
+        inputs = self.node.inputs
+        policy = process_class.get_retrieval_policy(inputs)
+
+        with ExitStack() as stack:
+            results_dir = self._get_results_dir(retrieved_temporary_folder, stack)
+
+            manifest_path = results_dir / MANIFEST_FILENAME
+            manifest = read_manifest(manifest_path) if manifest_path.is_file() else {}
+
+            for port, rule in process_class.get_output_rules(inputs).items():
+                if rule.large and policy != "always":
+                    if policy == "on_demand":
+                        self.out(
+                            port,
+                            self._get_remote_reference(
+                                rule,
+                                **manifest.get(rule.pattern, {}),
+                            ),
+                        )
+                    continue
+
+                node = self._get_output_node(results_dir, port, rule)
+                if node is not None:
+                    self.out(port, node)
+
+    def _get_output_node(
+        self,
+        results_dir: Path,
+        port: str,
+        rule: OutputRule,
+    ) -> orm.Data | None:
+        """Get the node of an output from the retrieved results directory."""
+
+        if has_magic(rule.pattern):
+            paths = sorted(results_dir.glob(rule.pattern))
+            if not paths and not rule.required:
+                return None
+        else:
+            path = results_dir / rule.pattern
+            if not path.exists():
+                if rule.required:
+                    raise OSError(f"missing output `{rule.pattern}`")
+                return None
+            paths = [path]
+
+        size = sum(
+            file.stat().st_size
+            for path in paths
+            for file in (path.rglob("*") if path.is_dir() else [path])
+            if file.is_file()
+        )
+
+        if rule.max_size is not None and size > rule.max_size:
+            self.logger.warning(
+                f"`{rule.pattern}` ({size} bytes) exceeds the size cap of `{port}` "
+                f"({rule.max_size} bytes); attaching it as a remote reference"
+            )
+            if paths[0].is_dir():
+                return self._get_remote_results_folder(rule.pattern)
+            return self._get_remote_reference(
+                rule,
+                size=size,
+                checksum=None if has_magic(rule.pattern) else get_checksum(paths[0]),
+            )
+
+        if has_magic(rule.pattern):
+            base_dir = results_dir / self._get_glob_base(rule.pattern)
+            folder = orm.FolderData()
+            for path in paths:
+                folder.base.repository.put_object_from_file(
+                    str(path),
+                    path.relative_to(base_dir).as_posix(),
+                )
+            return folder
+
+        if paths[0].is_dir():
+            return orm.FolderData(tree=paths[0])
+
+        return orm.SinglefileData(paths[0])
+
+    def _get_remote_reference(
+        self,
+        rule: OutputRule,
+        size: int | None = None,
+        checksum: str | None = None,
+    ) -> orm.RemoteData:
+        """Get a reference to an output left on the remote computer.
+
+        Globs are referenced by the folder holding their matches, and paths by
+        a `RemoteFileData` carrying the size and checksum of the file, if known.
+        """
+
+        if has_magic(rule.pattern):
+            return self._get_remote_results_folder(self._get_glob_base(rule.pattern))
+
+        path = PurePosixPath(rule.pattern)
+        return RemoteFileData(
+            remote_path=self._get_remote_results_path(path.parent.as_posix()),
+            filename=path.name,
+            size=size,
+            checksum=checksum,
+            computer=self.node.computer,
+        )
+
+    @staticmethod
+    def _get_glob_base(pattern: str) -> str:
+        """Get the leading part of a glob free of wildcards."""
+        parts = []
+        for part in PurePosixPath(pattern).parts:
+            if has_magic(part):
+                break
+            parts.append(part)
+        return PurePosixPath(*parts).as_posix() if parts else ""
@@ -1,39 +1,53 @@
 from __future__ import annotations
 
-from pathlib import Path
-
-from aiida import orm
+import numpy as np
 from aiida.engine import ExitCode
-from aiida.parsers import Parser
+
+from aiida_quantum_transport.calculations.dmft import get_dmu_values
+
+from .base import BaseParser
 
 
-class DMFTParser(Parser):
+class DMFTParser(BaseParser):
     """docstring"""
 
     def parse(self, **kwargs) -> ExitCode | None:
         """docstring"""
 
-        try:
-            self.out(
-                "remote_results_folder",
-                orm.RemoteData(
-                    f"{self.node.get_remote_workdir()}/results",
-                    computer=self.node.computer,
-                ),
-            )
-            with self.retrieved.as_path() as retrieved_path:
-                root = Path(retrieved_path) / "results"
+        total = self._get_number_of_dmu_points()
 
-                path = root / "delta_folder"
-                self.out("delta_folder", orm.FolderData(tree=path))
+        try:
+            self.out("remote_results_folder", self._get_remote_results_folder())
+            self._out_results(kwargs.get("retrieved_temporary_folder"))
+        except OSError:
+            # e.g., killed by the walltime before writing any result, such that
+            # none of the points converged, and all are restarted
+            if "sigma_folder" not in self.outputs:
+                return self.exit_codes.ERROR_UNCONVERGED_DMU_POINTS.format(
+                    number=total,
+                    total=total,
+                )
+            return self.exit_codes.ERROR_ACCESSING_OUTPUT_FILE
 
-                path = root / "sigma_folder"
-                self.out("sigma_folder", orm.FolderData(tree=path))
+        # sigma is saved only for converged points
+        sigma_folder = self.outputs.sigma_folder
+        number_of_converged = len(sigma_folder.base.repository.list_object_names())
+        if number_of_converged < total:
+            return self.exit_codes.ERROR_UNCONVERGED_DMU_POINTS.format(
+                number=total - number_of_converged,
+                total=total,
+            )
 
-                if self.node.inputs.adjust_mu:
-                    path = root / "mu.txt"
-                    self.out("mu_file", orm.SinglefileData(path))
-        except OSError:
+        if self.node.inputs.adjust_mu and "mu_file" not in self.outputs:
             return self.exit_codes.ERROR_ACCESSING_OUTPUT_FILE
 
         return None
+
+    def _get_number_of_dmu_points(self) -> int:
+        """Get the number of dmu points of the (chunk of the) sweep."""
+        parameters = self.node.inputs.sweep.parameters.get_dict()
+        chunks = np.array_split(
+            get_dmu_values(parameters),
+            parameters.get("number_of_chunks", 1),
+        )
+        return chunks[parameters.get("chunk_index", 0)].size
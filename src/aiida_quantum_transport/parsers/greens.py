@@ -1,39 +1,27 @@
 from __future__ import annotations
 
-from pathlib import Path
-
-from aiida import orm
 from aiida.engine import ExitCode
-from aiida.parsers import Parser
 
+from .base import BaseParser
 
-class GreensFunctionParametersParser(Parser):
-    """docstring"""
 
-    _OUTPUT_FILES = [
-        "leads_nao.npy",
-        "hamiltonian_ii.pkl",
-        "hamiltonian_ij.pkl",
-        "self_energies.pkl",
-    ]
+class GreensFunctionParametersParser(BaseParser):
+    """docstring"""
 
     def parse(self, **kwargs) -> ExitCode | None:
         """docstring"""
 
         try:
-            self.out(
-                "remote_results_folder",
-                orm.RemoteData(
-                    f"{self.node.get_remote_workdir()}/results",
-                    computer=self.node.computer,
-                ),
-            )
-            with self.retrieved.as_path() as retrieved_path:
-                results_dir = Path(retrieved_path) / "results"
-                for filename in self._OUTPUT_FILES:
-                    path = results_dir / filename
-                    prefix = filename.split(".")[0]
-                    self.out(f"{prefix}_file", orm.SinglefileData(path))
+            self.out("remote_results_folder", self._get_remote_results_folder())
+
+            # the results of a bundled hybridization are split into its own outputs
+            if "code" in self.node.inputs.hybridization:
+                self.out(
+                    "hybridization.remote_results_folder",
+                    self._get_remote_results_folder(),
+                )
+
+            self._out_results(kwargs.get("retrieved_temporary_folder"))
         except OSError:
             return self.exit_codes.ERROR_ACCESSING_OUTPUT_FILE
 
@@ -1,5 +1,11 @@
 from .coulomb_diamonds import CoulombDiamondsWorkChain
+from .coulomb_diamonds_campaign import CoulombDiamondsCampaignWorkChain
+from .coulomb_diamonds_sweep import CoulombDiamondsSweepWorkChain
+from .dmft import DMFTBaseWorkChain
 
 __all__ = [
     "CoulombDiamondsWorkChain",
+    "CoulombDiamondsSweepWorkChain",
+    "CoulombDiamondsCampaignWorkChain",
+    "DMFTBaseWorkChain",
 ]
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+from collections.abc import Mapping
 from typing import TYPE_CHECKING
 
+import numpy as np
 from aiida import orm
-from aiida.engine import ToContext, WorkChain
+from aiida.engine import ToContext, WorkChain, append_, if_
 
 from aiida_quantum_transport.calculations import (
     CurrentCalculation,
@@ -13,16 +15,41 @@ from aiida_quantum_transport.calculations import (
     HybridizationCalculation,
     LocalizationCalculation,
     TransmissionCalculation,
+    build_performance_report,
     get_scattering_region,
+    merge_folders,
+    stack_current,
+)
+from aiida_quantum_transport.calculations.dmft import get_dmu_values
+
+from .dmft import DMFTBaseWorkChain
+from .resources import (
+    estimate_stage_options,
+    get_number_of_bias_points,
+    get_number_of_energies,
+    get_number_of_kpoints,
+    get_number_of_orbitals,
+)
+from .utils import (
+    STAGE_KEY_EXTRA,
+    find_dft_parent,
+    find_stage,
+    get_content_hash,
+    get_number_of_chunks,
+    get_process_timings,
+    get_stage_key,
 )
 
 if TYPE_CHECKING:
+    from aiida.engine import CalcJob
     from aiida.engine.processes.workchains.workchain import WorkChainSpec
 
 
 class CoulombDiamondsWorkChain(WorkChain):
     """A workflow for generating Coulomb Diamonds from transmission data."""
 
+    _DMU_POINTS_PER_CHUNK = 10
+
     @classmethod
     def define(cls, spec: WorkChainSpec) -> None:
         """Define the workflow specifications (input, output, outline, etc.).
@@ -35,12 +62,47 @@ class CoulombDiamondsWorkChain(WorkChain):
 
         super().define(spec)
 
+        spec.input(
+            "use_stage_cache",
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help="If True, the dft, localization, greens function and hybridization "
+            "stages reuse finished calculations of previous runs with identical inputs",
+        )
+
+        spec.input(
+            "resources.automatic",
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help="If True, the MPI ranks, threads and walltime of each calculation "
+            "are estimated from the size of the system, replacing those of its "
+            "metadata options",
+        )
+
+        spec.input(
+            "resources.parameters",
+            valid_type=orm.Dict,
+            default=lambda: orm.Dict({}),
+            help="The resource estimation settings, e.g., `cores_per_machine`, "
+            "`max_machines` or `target_walltime`, and per-stage overrides of the "
+            "estimated options under `stages`",
+        )
+
         spec.input(
             "dft.code",
             valid_type=orm.AbstractCode,
             help="The DFT script",
         )
 
+        spec.input(
+            "dft.warm_start",
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help="If True, the dft calculations not given a parent folder or "
+            "restart file are seeded with the latest compatible previous run, if any "
+            "(opt-in, as it makes the results depend on the contents of the database)",
+        )
+
         spec.expose_inputs(
             DFTCalculation,
             namespace="dft.leads",
@@ -53,6 +115,18 @@ class CoulombDiamondsWorkChain(WorkChain):
             exclude=["code"],
         )
 
+        # the localization reads the device dft from the lcao bundle
+        spec.inputs.get_port("dft.device.lcao_bundle").default = lambda: orm.Bool(True)
+
+        for namespace in ("leads", "device"):
+            spec.input(
+                f"dft.{namespace}.remote_results_folder",
+                valid_type=orm.RemoteData,
+                required=False,
+                help=f"The results folder of a previous {namespace} dft calculation; "
+                "if provided, the calculation is skipped",
+            )
+
         # TODO rethink this one (redefines localization input)
         spec.input(
             "scattering.region",
@@ -70,13 +144,45 @@ class CoulombDiamondsWorkChain(WorkChain):
         spec.expose_inputs(
             LocalizationCalculation,
             namespace="localization",
-            include=["code", "lowdin", "metadata"],
+            include=[
+                "code",
+                "lowdin",
+                "hamiltonian",
+                "variants",
+                "retrieval_policy",
+                "metadata",
+            ],
+        )
+
+        spec.input(
+            "localization.remote_results_folder",
+            valid_type=orm.RemoteData,
+            required=False,
+            help="The results folder of a previous localization calculation; "
+            "if provided, the calculation is skipped",
         )
 
         spec.expose_inputs(
             GreensFunctionParametersCalculation,
             namespace="greens_function",
-            include=["code", "basis", "metadata"],
+            include=[
+                "code",
+                "basis",
+                "leads_symmetry",
+                "minimize_principal_layer",
+                "optimize_partition",
+                "tabulate_self_energies",
+                "retrieval_policy",
+                "metadata",
+            ],
+        )
+
+        spec.input(
+            "greens_function.remote_results_folder",
+            valid_type=orm.RemoteData,
+            required=False,
+            help="The results folder of a previous greens function parameters "
+            "calculation; if provided, the calculation is skipped",
         )
 
         spec.input(
@@ -96,7 +202,29 @@ class CoulombDiamondsWorkChain(WorkChain):
         spec.expose_inputs(
             HybridizationCalculation,
             namespace="hybridization",
-            include=["code", "temperature", "matsubara_grid_size", "metadata"],
+            include=[
+                "code",
+                "temperature",
+                "matsubara_grid_size",
+                "retrieval_policy",
+                "metadata",
+            ],
+        )
+
+        spec.input(
+            "hybridization.remote_results_folder",
+            valid_type=orm.RemoteData,
+            required=False,
+            help="The results folder of a previous hybridization calculation; "
+            "if provided, the calculation is skipped",
+        )
+
+        spec.input(
+            "hybridization.bundled",
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help="If True, the hybridization runs right after the greens function "
+            "parameters, in the same allocation",
         )
 
         spec.expose_inputs(
@@ -105,12 +233,26 @@ class CoulombDiamondsWorkChain(WorkChain):
             include=["code", "parameters"],
         )
 
+        spec.expose_inputs(
+            DMFTBaseWorkChain,
+            namespace="dmft",
+            include=["max_iterations"],
+        )
+
         spec.expose_inputs(
             DMFTCalculation,
             namespace="dmft.converge_mu",
             include=["adjust_mu", "metadata"],
         )
 
+        spec.input(
+            "dmft.converge_mu.mu_file",
+            valid_type=orm.SinglefileData,
+            required=False,
+            help="The converged chemical potential file of a previous calculation; "
+            "if provided, the calculation is skipped",
+        )
+
         spec.expose_inputs(
             DMFTCalculation,
             namespace="dmft.sweep_mu",
@@ -124,10 +266,26 @@ class CoulombDiamondsWorkChain(WorkChain):
             help="The chemical potential sweep parameters",
         )
 
+        spec.input(
+            "dmft.sweep_mu.number_of_chunks",
+            valid_type=orm.Int,
+            required=False,
+            help="The number of concurrent calculations the chemical potential sweep "
+            "is split into; derived from the size of the sweep if not provided",
+        )
+
         spec.expose_inputs(
             TransmissionCalculation,
             namespace="transmission",
-            include=["code", "metadata"],
+            include=["code", "parameters", "metadata"],
+        )
+
+        spec.input(
+            "transmission.number_of_shards",
+            valid_type=orm.Int,
+            default=lambda: orm.Int(1),
+            help="The number of concurrent calculations the dmu values of the "
+            "transmission are split across",
         )
 
         spec.expose_inputs(
@@ -136,6 +294,14 @@ class CoulombDiamondsWorkChain(WorkChain):
             include=["code", "parameters", "metadata"],
         )
 
+        spec.input(
+            "current.pipelined",
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help="If True, the current is computed alongside the transmission, "
+            "as each transmission file is written",
+        )
+
         spec.expose_outputs(
             DFTCalculation,
             namespace="dft.leads",
@@ -154,6 +320,7 @@ class CoulombDiamondsWorkChain(WorkChain):
         spec.expose_outputs(
             GreensFunctionParametersCalculation,
             namespace="greens_function",
+            exclude=["hybridization"],
         )
 
         spec.expose_outputs(
@@ -171,44 +338,215 @@ class CoulombDiamondsWorkChain(WorkChain):
             namespace="dmft.sweep_mu",
         )
 
+        # not available when the sweep is split into several calculations
+        for port in ("remote_folder", "remote_results_folder", "retrieved"):
+            spec.outputs.get_port(f"dmft.sweep_mu.{port}").required = False
+
         spec.expose_outputs(
             TransmissionCalculation,
             namespace="transmission",
         )
 
+        # not available when the transmission is split into several calculations
+        for port in ("remote_folder", "remote_results_folder", "retrieved"):
+            spec.outputs.get_port(f"transmission.{port}").required = False
+
         spec.expose_outputs(
             CurrentCalculation,
             namespace="current",
         )
 
+        # not available when the current is computed alongside the transmission
+        for port in ("remote_folder", "remote_results_folder", "retrieved"):
+            spec.outputs.get_port(f"current.{port}").required = False
+
+        spec.output(
+            "performance_report",
+            valid_type=orm.Dict,
+            help="The queue, run and transfer times of each stage, the critical "
+            "path through the stages, and the idle gaps of the workflow",
+        )
+
+        # not available when the stage is resumed from precomputed results
+        for namespace in (
+            "dft.leads",
+            "dft.device",
+            "localization",
+            "greens_function",
+            "hybridization",
+            "dmft.converge_mu",
+        ):
+            for output in spec.outputs.get_port(namespace).values():
+                output.required = False
+
+        # each step waits only for the stages its submissions depend on, e.g.,
+        # the localization starts as soon as the device dft is done, while the
+        # leads dft is only waited for by the greens function parameters
         spec.outline(
-            cls.run_dft,
+            cls.setup,
+            cls.check_precomputed_results,
             cls.define_scattering_region,
-            cls.transform_basis,
-            cls.generate_greens_function_parameters,
-            cls.compute_hybridization,
-            cls.run_dmft_converge_mu,
+            if_(cls.should_run_dft)(
+                cls.run_dft,
+            ),
+            if_(cls.should_transform_basis)(
+                cls.transform_basis,
+            ),
+            if_(cls.should_generate_greens_function_parameters)(
+                cls.generate_greens_function_parameters,
+            ),
+            if_(cls.should_compute_hybridization)(
+                cls.compute_hybridization,
+            ),
+            if_(cls.should_run_dmft_converge_mu)(
+                cls.run_dmft_converge_mu,
+            ),
             cls.run_dmft_sweep_mu,
+            cls.merge_dmft_sweep_mu,
             cls.compute_transmission,
-            cls.compute_current,
+            cls.merge_transmission,
+            if_(cls.should_pipeline_current)(
+                cls.collect_current,
+            ).else_(
+                cls.compute_current,
+            ),
             cls.gather_results,
         )
 
-    def run_dft(self):
+        spec.exit_code(
+            301,
+            "ERROR_MISSING_PRECOMPUTED_RESULTS",
+            "the precomputed results folder of the {stage} stage is missing or empty",
+        )
+
+        spec.exit_code(
+            402,
+            "ERROR_DMFT_FAILED",
+            "the {stage} dmft did not converge within the maximum number of restarts",
+        )
+
+        spec.exit_code(
+            403,
+            "ERROR_TRANSMISSION_FAILED",
+            "the transmission calculation of {number} of {total} shards failed",
+        )
+
+    def setup(self):
         """docstring"""
-        leads_inputs = {
-            "code": self.inputs.dft.code,
-            **self.exposed_inputs(DFTCalculation, namespace="dft.leads"),
+
+        self.ctx.stage_keys = {}
+
+        stage_namespaces = {
+            "dft_leads": self.inputs.dft.leads,
+            "dft_device": self.inputs.dft.device,
+            "localization": self.inputs.localization,
+            "greens_function": self.inputs.greens_function,
+            "hybridization": self.inputs.hybridization,
         }
-        device_inputs = {
-            "code": self.inputs.dft.code,
-            **self.exposed_inputs(DFTCalculation, namespace="dft.device"),
+        self.ctx.precomputed = {
+            stage: namespace.remote_results_folder
+            for stage, namespace in stage_namespaces.items()
+            if "remote_results_folder" in namespace
         }
-        return ToContext(
-            dft_leads=self.submit(DFTCalculation, **leads_inputs),
-            dft_device=self.submit(DFTCalculation, **device_inputs),
+
+        # downstream stages are keyed on the reused folders
+        for stage, remote_results_folder in self.ctx.precomputed.items():
+            self.ctx.stage_keys[stage] = get_content_hash(remote_results_folder)
+
+    def check_precomputed_results(self):
+        """docstring"""
+        for stage, remote_results_folder in self.ctx.precomputed.items():
+            if remote_results_folder.is_empty:
+                return self.exit_codes.ERROR_MISSING_PRECOMPUTED_RESULTS.format(
+                    stage=stage
+                )
+            self.report(
+                f"reusing {remote_results_folder.get_remote_path()} for {stage}"
+            )
+
+    def should_run_dft(self):
+        """docstring"""
+        return self._should_run_dft_leads() or self._should_run_dft_device()
+
+    def should_transform_basis(self):
+        """docstring"""
+        return "localization" not in self.ctx.precomputed
+
+    def should_generate_greens_function_parameters(self):
+        """docstring"""
+        return "greens_function" not in self.ctx.precomputed
+
+    def should_compute_hybridization(self):
+        """docstring"""
+        return "hybridization" not in self.ctx.precomputed and (
+            not self._should_bundle_hybridization()
+        )
+
+    def _should_bundle_hybridization(self) -> bool:
+        """Check if the hybridization runs with the greens function parameters."""
+        return (
+            "bundled" in self.inputs.hybridization
+            and self.inputs.hybridization.bundled.value
+            and "hybridization" not in self.ctx.precomputed
+            and self.should_generate_greens_function_parameters()
+        )
+
+    def should_run_dmft_converge_mu(self):
+        """docstring"""
+        return "mu_file" not in self.inputs.dmft.converge_mu
+
+    def _should_run_dft_leads(self) -> bool:
+        """Check if the leads dft is needed, i.e., by the greens function stage."""
+        return "dft_leads" not in self.ctx.precomputed and (
+            self.should_generate_greens_function_parameters()
+        )
+
+    def _should_run_dft_device(self) -> bool:
+        """Check if the device dft is needed, i.e., by the localization stage."""
+        return "dft_device" not in self.ctx.precomputed and (
+            self.should_transform_basis()
         )
 
+    def run_dft(self):
+        """docstring"""
+
+        awaitables = {}
+
+        if self._should_run_dft_leads():
+            leads_inputs = self._with_resources(
+                "dft",
+                {
+                    "code": self.inputs.dft.code,
+                    **self.exposed_inputs(DFTCalculation, namespace="dft.leads"),
+                },
+                number_of_orbitals=self._get_system_sizes()["number_of_leads_orbitals"],
+                number_of_kpoints=self._get_system_sizes()["number_of_leads_kpoints"],
+            )
+            self.ctx.dft_leads = self._submit_stage(
+                "dft_leads",
+                DFTCalculation,
+                self._with_warm_start("dft_leads", leads_inputs),
+            )
+            # the leads are waited for later on, when first needed
+            if not self.should_transform_basis():
+                awaitables["dft_leads"] = self.ctx.dft_leads
+
+        if self._should_run_dft_device():
+            device_inputs = self._with_resources(
+                "dft",
+                {
+                    "code": self.inputs.dft.code,
+                    **self.exposed_inputs(DFTCalculation, namespace="dft.device"),
+                },
+            )
+            awaitables["dft_device"] = self._submit_stage(
+                "dft_device",
+                DFTCalculation,
+                self._with_warm_start("dft_device", device_inputs),
+            )
+
+        return ToContext(**awaitables)
+
     def define_scattering_region(self):
         """docstring"""
         self.ctx.scattering_region = get_scattering_region(
@@ -220,7 +558,7 @@ class CoulombDiamondsWorkChain(WorkChain):
         """docstring"""
         localization_inputs = {
             "device": {
-                "remote_results_folder": self.ctx.dft_device.outputs.remote_results_folder,
+                "remote_results_folder": self._get_remote_results_folder("dft_device"),
             },
             "scattering": {
                 "region": self.ctx.scattering_region,
@@ -231,12 +569,19 @@ class CoulombDiamondsWorkChain(WorkChain):
                 namespace="localization",
             ),
         }
-        return ToContext(
-            localization=self.submit(
+        awaitables = {
+            "localization": self._submit_stage(
+                "localization",
                 LocalizationCalculation,
-                **localization_inputs,
-            )
-        )
+                self._with_resources("localization", localization_inputs),
+                {
+                    "device.remote_results_folder": self.ctx.stage_keys["dft_device"],
+                },
+            ),
+        }
+        if "dft_leads" in self.ctx:
+            awaitables["dft_leads"] = self.ctx.dft_leads
+        return ToContext(**awaitables)
 
     def generate_greens_function_parameters(self):
         """docstring"""
@@ -244,34 +589,79 @@ class CoulombDiamondsWorkChain(WorkChain):
             "leads": {
                 "structure": self.inputs.dft.leads.structure,
                 "kpoints": self.inputs.dft.leads.kpoints,
-                "remote_results_folder": self.ctx.dft_leads.outputs.remote_results_folder,
+                "remote_results_folder": self._get_remote_results_folder("dft_leads"),
             },
             "device": {
                 "structure": self.inputs.dft.device.structure,
             },
             "los": {
-                "remote_results_folder": self.ctx.localization.outputs.remote_results_folder,
+                "remote_results_folder": self._get_remote_results_folder(
+                    "localization"
+                ),
             },
             **self.exposed_inputs(
                 GreensFunctionParametersCalculation,
                 namespace="greens_function",
             ),
         }
+
+        stage = "greens_function"
+        tabulate_self_energies = greens_function_inputs.get("tabulate_self_energies")
+        if self._should_bundle_hybridization() or (
+            tabulate_self_energies is not None and tabulate_self_energies.value
+        ):
+            # the grids of the hybridization, on which the self-energies are tabulated
+            greens_function_inputs["hybridization"] = {
+                "temperature": self.inputs.hybridization.temperature,
+                "matsubara_grid_size": self.inputs.hybridization.matsubara_grid_size,
+                "greens_function_parameters": self.inputs.greens_function_parameters,
+                "energy_grid_parameters": self.inputs.energy_grid_parameters,
+            }
+
+        if self._should_bundle_hybridization():
+            hybridization_code = self.inputs.hybridization.code
+            greens_function_inputs["hybridization"]["code"] = hybridization_code
+            # sized for the (dominant) hybridization
+            stage = "hybridization"
+
         return ToContext(
-            greens_function=self.submit(
+            greens_function=self._submit_stage(
+                "greens_function",
                 GreensFunctionParametersCalculation,
-                **greens_function_inputs,
+                self._with_resources(stage, greens_function_inputs),
+                {
+                    "leads.remote_results_folder": self.ctx.stage_keys["dft_leads"],
+                    "los.remote_results_folder": self.ctx.stage_keys["localization"],
+                },
             )
         )
 
     def compute_hybridization(self):
         """docstring"""
-        hybridization_inputs = {
+        return ToContext(
+            hybridization=self._submit_stage(
+                "hybridization",
+                HybridizationCalculation,
+                self._with_resources(
+                    "hybridization",
+                    self._get_hybridization_inputs(),
+                ),
+                self._get_hybridization_upstream_keys(),
+            )
+        )
+
+    def _get_hybridization_inputs(self) -> dict:
+        """Get the inputs of the hybridization calculation."""
+        return {
             "los": {
-                "remote_results_folder": self.ctx.localization.outputs.remote_results_folder,
+                "remote_results_folder": self._get_remote_results_folder(
+                    "localization"
+                ),
             },
             "greens_function": {
-                "remote_results_folder": self.ctx.greens_function.outputs.remote_results_folder,
+                "remote_results_folder": self._get_remote_results_folder(
+                    "greens_function"
+                ),
             },
             "greens_function_parameters": self.inputs.greens_function_parameters,
             "energy_grid_parameters": self.inputs.energy_grid_parameters,
@@ -280,12 +670,15 @@ class CoulombDiamondsWorkChain(WorkChain):
                 namespace="hybridization",
             ),
         }
-        return ToContext(
-            hybridization=self.submit(
-                HybridizationCalculation,
-                **hybridization_inputs,
-            )
-        )
+
+    def _get_hybridization_upstream_keys(self) -> dict[str, str]:
+        """Get the keys of the stages upstream of the hybridization calculation."""
+        return {
+            "los.remote_results_folder": self.ctx.stage_keys["localization"],
+            "greens_function.remote_results_folder": self.ctx.stage_keys[
+                "greens_function"
+            ],
+        }
 
     def run_dmft_converge_mu(self):
         """docstring"""
@@ -302,7 +695,9 @@ class CoulombDiamondsWorkChain(WorkChain):
                 "active": self.inputs.scattering.active,
             },
             "hybridization": {
-                "remote_results_folder": self.ctx.hybridization.outputs.remote_results_folder,
+                "remote_results_folder": self._get_remote_results_folder(
+                    "hybridization"
+                ),
             },
             **self.exposed_inputs(
                 DMFTCalculation,
@@ -310,80 +705,243 @@ class CoulombDiamondsWorkChain(WorkChain):
             ),
         }
         return ToContext(
-            dmft_converge_mu=self.submit(
-                DMFTCalculation,
-                **dmft_converge_mu_inputs,
+            dmft_converge_mu=self._submit_dmft(
+                "dmft_converge_mu",
+                dmft_converge_mu_inputs,
+                number_of_dmu=1,
             )
         )
 
     def run_dmft_sweep_mu(self):
         """docstring"""
-        dmft_sweep_mu_inputs = {
-            **self.exposed_inputs(
-                DMFTCalculation,
-                namespace="dmft",
-            ),
-            "device": {
-                "structure": self.inputs.dft.device.structure,
-            },
-            "scattering": {
-                "region": self.ctx.scattering_region,
-                "active": self.inputs.scattering.active,
-            },
-            "hybridization": {
-                "remote_results_folder": self.ctx.hybridization.outputs.remote_results_folder,
-            },
-            "mu_file": self.ctx.dmft_converge_mu.outputs.mu_file,
-            "sweep": {
-                "parameters": self.inputs.dmft.sweep_mu.parameters,
-            },
-            **self.exposed_inputs(
-                DMFTCalculation,
-                namespace="dmft.sweep_mu",
-            ),
-        }
-        return ToContext(
-            dmft_sweep_mu=self.submit(
-                DMFTCalculation,
-                **dmft_sweep_mu_inputs,
+        if (
+            "dmft_converge_mu" in self.ctx
+            and not self.ctx.dmft_converge_mu.is_finished_ok
+        ):
+            return self.exit_codes.ERROR_DMFT_FAILED.format(stage="converge_mu")
+
+        sweep_parameters = self.inputs.dmft.sweep_mu.parameters.get_dict()
+        dmu_values = get_dmu_values(sweep_parameters)
+        number_of_chunks = get_number_of_chunks(
+            dmu_values.size,
+            self.inputs.dmft.sweep_mu.number_of_chunks.value
+            if "number_of_chunks" in self.inputs.dmft.sweep_mu
+            else None,
+            self._DMU_POINTS_PER_CHUNK,
+        )
+        chunks = np.array_split(dmu_values, number_of_chunks)
+
+        for chunk_index in range(number_of_chunks):
+            if number_of_chunks > 1:
+                parameters = orm.Dict(
+                    {
+                        **sweep_parameters,
+                        "number_of_chunks": number_of_chunks,
+                        "chunk_index": chunk_index,
+                    }
+                )
+            else:
+                parameters = self.inputs.dmft.sweep_mu.parameters
+
+            dmft_sweep_mu_inputs = {
+                **self.exposed_inputs(
+                    DMFTCalculation,
+                    namespace="dmft",
+                ),
+                "device": {
+                    "structure": self.inputs.dft.device.structure,
+                },
+                "scattering": {
+                    "region": self.ctx.scattering_region,
+                    "active": self.inputs.scattering.active,
+                },
+                "hybridization": {
+                    "remote_results_folder": self._get_remote_results_folder(
+                        "hybridization"
+                    ),
+                },
+                "mu_file": self._get_mu_file(),
+                "sweep": {
+                    "parameters": parameters,
+                },
+                **self.exposed_inputs(
+                    DMFTCalculation,
+                    namespace="dmft.sweep_mu",
+                ),
+            }
+            self.to_context(
+                dmft_sweep_mu=append_(
+                    self._submit_dmft(
+                        "dmft_sweep_mu",
+                        dmft_sweep_mu_inputs,
+                        number_of_dmu=chunks[chunk_index].size,
+                    )
+                )
             )
+
+    def merge_dmft_sweep_mu(self):
+        """docstring"""
+        if not all(chunk.is_finished_ok for chunk in self.ctx.dmft_sweep_mu):
+            return self.exit_codes.ERROR_DMFT_FAILED.format(stage="sweep_mu")
+
+        if len(self.ctx.dmft_sweep_mu) == 1:
+            (dmft_sweep_mu,) = self.ctx.dmft_sweep_mu
+            self.ctx.dmft_sweep_mu_delta_folder = dmft_sweep_mu.outputs.delta_folder
+            self.ctx.dmft_sweep_mu_sigma_folder = dmft_sweep_mu.outputs.sigma_folder
+            return
+
+        chunks = {
+            f"chunk_{chunk_index}": chunk
+            for chunk_index, chunk in enumerate(self.ctx.dmft_sweep_mu)
+        }
+        self.ctx.dmft_sweep_mu_delta_folder = merge_folders(
+            **{label: chunk.outputs.delta_folder for label, chunk in chunks.items()}
+        )
+        self.ctx.dmft_sweep_mu_sigma_folder = merge_folders(
+            **{label: chunk.outputs.sigma_folder for label, chunk in chunks.items()}
         )
 
     def compute_transmission(self):
         """docstring"""
-        transmission_inputs = {
-            "los": {
-                "remote_results_folder": self.ctx.localization.outputs.remote_results_folder,
-            },
-            "greens_function": {
-                "remote_results_folder": self.ctx.greens_function.outputs.remote_results_folder,
-            },
-            "dmft": {
-                "remote_results_folder": self.ctx.dmft_sweep_mu.outputs.remote_results_folder,
-            },
-            "greens_function_parameters": self.inputs.greens_function_parameters,
-            "energy_grid_parameters": self.inputs.energy_grid_parameters,
-            **self.exposed_inputs(
-                TransmissionCalculation,
-                namespace="transmission",
-            ),
-        }
-        return ToContext(
-            transmission=self.submit(
-                TransmissionCalculation,
-                **transmission_inputs,
+        sigma_folder: orm.FolderData = self.ctx.dmft_sweep_mu_sigma_folder
+        sigma_filenames = sorted(sigma_folder.base.repository.list_object_names())
+        number_of_shards = get_number_of_chunks(
+            len(sigma_filenames),
+            self.inputs.transmission.number_of_shards.value,
+        )
+
+        for shard_index, shard in enumerate(
+            np.array_split(sigma_filenames, number_of_shards)
+        ):
+            dmft_inputs = self._get_dmft_sweep_mu_results()
+            if number_of_shards > 1:
+                dmft_inputs["sigma_filenames"] = orm.List(shard.tolist())
+
+            transmission_inputs = {
+                "los": {
+                    "remote_results_folder": self._get_remote_results_folder(
+                        "localization"
+                    ),
+                },
+                "greens_function": {
+                    "remote_results_folder": self._get_remote_results_folder(
+                        "greens_function"
+                    ),
+                },
+                "dmft": dmft_inputs,
+                "greens_function_parameters": self.inputs.greens_function_parameters,
+                "energy_grid_parameters": self.inputs.energy_grid_parameters,
+                # the shared dft transmission is computed once
+                "compute_dft_transmission": orm.Bool(shard_index == 0),
+                **self.exposed_inputs(
+                    TransmissionCalculation,
+                    namespace="transmission",
+                ),
+            }
+
+            if self.should_pipeline_current():
+                transmission_inputs["current"] = {
+                    "code": self.inputs.current.code,
+                    "parameters": self.inputs.current.parameters,
+                    "temperature": self.inputs.hybridization.temperature,
+                }
+                transmission_inputs["hybridization"] = {
+                    "remote_results_folder": self._get_remote_results_folder(
+                        "hybridization"
+                    ),
+                }
+            self.to_context(
+                transmission=append_(
+                    self.submit(
+                        TransmissionCalculation,
+                        **self._with_resources(
+                            "transmission",
+                            transmission_inputs,
+                            number_of_dmu=shard.size + (shard_index == 0),
+                        ),
+                    )
+                )
             )
+
+    def merge_transmission(self):
+        """docstring"""
+        failed = [shard for shard in self.ctx.transmission if not shard.is_finished_ok]
+        if failed:
+            return self.exit_codes.ERROR_TRANSMISSION_FAILED.format(
+                number=len(failed),
+                total=len(self.ctx.transmission),
+            )
+
+        if len(self.ctx.transmission) == 1:
+            return
+
+        self.ctx.transmission_folder = merge_folders(
+            **{
+                f"shard_{shard_index}": shard.outputs.transmission_folder
+                for shard_index, shard in enumerate(self.ctx.transmission)
+            }
         )
 
+    def should_pipeline_current(self):
+        """docstring"""
+        return self.inputs.current.pipelined.value
+
+    def collect_current(self):
+        """docstring"""
+        # the shards are checked to have succeeded by `merge_transmission`
+        if len(self.ctx.transmission) == 1:
+            (transmission,) = self.ctx.transmission
+            current_folder = transmission.outputs.current_folder
+        else:
+            current_folder = merge_folders(
+                **{
+                    f"shard_{shard_index}": shard.outputs.current_folder
+                    for shard_index, shard in enumerate(self.ctx.transmission)
+                }
+            )
+        self.ctx.current_files = stack_current(current_folder)
+
+    def _get_remote_results_folder(self, stage: str) -> orm.RemoteData:
+        """Get the results folder of a stage, precomputed or run by the workflow."""
+        if stage in self.ctx.precomputed:
+            return self.ctx.precomputed[stage]
+        if stage == "hybridization" and self._should_bundle_hybridization():
+            return self.ctx.greens_function.outputs.hybridization.remote_results_folder
+        return self.ctx[stage].outputs.remote_results_folder
+
+    def _get_mu_file(self) -> orm.SinglefileData:
+        """Get the converged chemical potential file, precomputed or computed."""
+        if "mu_file" in self.inputs.dmft.converge_mu:
+            return self.inputs.dmft.converge_mu.mu_file
+        return self.ctx.dmft_converge_mu.outputs.mu_file
+
+    def _get_dmft_sweep_mu_results(self) -> dict:
+        """Get the results of the chemical potential sweep as consumed downstream."""
+        if len(self.ctx.dmft_sweep_mu) == 1:
+            (dmft_sweep_mu,) = self.ctx.dmft_sweep_mu
+            return {
+                "remote_results_folder": dmft_sweep_mu.outputs.remote_results_folder,
+            }
+        return {"sigma_folder": self.ctx.dmft_sweep_mu_sigma_folder}
+
+    def _get_transmission_results(self) -> dict:
+        """Get the results of the transmission calculation as consumed downstream."""
+        if len(self.ctx.transmission) == 1:
+            (transmission,) = self.ctx.transmission
+            return {
+                "remote_results_folder": transmission.outputs.remote_results_folder,
+            }
+        return {"transmission_folder": self.ctx.transmission_folder}
+
     def compute_current(self):
         """docstring"""
         current_inputs = {
             "hybridization": {
-                "remote_results_folder": self.ctx.hybridization.outputs.remote_results_folder,
-            },
-            "transmission": {
-                "remote_results_folder": self.ctx.transmission.outputs.remote_results_folder,
+                "remote_results_folder": self._get_remote_results_folder(
+                    "hybridization"
+                ),
             },
+            "transmission": self._get_transmission_results(),
             "temperature": self.inputs.hybridization.temperature,
             **self.exposed_inputs(
                 CurrentCalculation,
@@ -393,81 +951,346 @@ class CoulombDiamondsWorkChain(WorkChain):
         return ToContext(
             current=self.submit(
                 CurrentCalculation,
-                **current_inputs,
+                **self._with_resources(
+                    "current",
+                    current_inputs,
+                    number_of_dmu=len(
+                        self.ctx.dmft_sweep_mu_sigma_folder.base.repository.list_object_names()
+                    ),
+                ),
             )
         )
 
+    def _with_warm_start(self, stage: str, inputs: dict) -> dict:
+        """Seed a dft calculation with a compatible previous run, if enabled.
+
+        Parameters
+        ----------
+        `stage` : `str`
+            The name of the stage.
+        `inputs` : `dict`
+            The inputs of the dft calculation.
+
+        Returns
+        -------
+        `dict`
+            The inputs, with the results folder of the previous run as parent
+            folder, if found.
+        """
+
+        if not self.inputs.dft.warm_start or any(
+            port in inputs for port in ("parent_folder", "restart_file")
+        ):
+            return inputs
+
+        parent = find_dft_parent(
+            inputs["code"],
+            inputs["structure"],
+            inputs["parameters"].get_dict(),
+        )
+
+        if parent is None:
+            return inputs
+
+        self.report(f"seeding {stage} with {parent.process_label}<{parent.pk}>")
+        return {**inputs, "parent_folder": parent.outputs.remote_results_folder}
+
+    def _submit_stage(
+        self,
+        stage: str,
+        process_class: type[CalcJob],
+        inputs: dict,
+        upstream_keys: dict[str, str] | None = None,
+    ) -> orm.CalcJobNode:
+        """Submit a stage, or reuse a previous run of it if enabled.
+
+        Parameters
+        ----------
+        `stage` : `str`
+            The name of the stage.
+        `process_class` : `type[CalcJob]`
+            The calculation class of the stage.
+        `inputs` : `dict`
+            The inputs of the calculation.
+        `upstream_keys` : `dict[str, str] | None`
+            The keys of the upstream stages, by (dotted) input port, `None` by
+            default.
+
+        Returns
+        -------
+        `orm.CalcJobNode`
+            The submitted or reused calculation node.
+        """
+
+        key = get_stage_key(process_class, inputs, upstream_keys)
+        self.ctx.stage_keys[stage] = key
+
+        if self.inputs.use_stage_cache:
+            node = find_stage(key)
+            if node is not None:
+                self.report(f"reusing {node.process_label}<{node.pk}> for {stage}")
+                return node
+
+        node = self.submit(
+            process_class,
+            **{
+                **inputs,
+                "metadata": {
+                    **inputs.get("metadata", {}),
+                    "call_link_label": stage,
+                },
+            },
+        )
+        node.base.extras.set(STAGE_KEY_EXTRA, key)
+        return node
+
+    def _submit_dmft(self, stage: str, inputs: dict, **sizes) -> orm.WorkChainNode:
+        """Submit a DMFT calculation, restarted until its dmu points converge.
+
+        Parameters
+        ----------
+        `stage` : `str`
+            The name of the stage.
+        `inputs` : `dict`
+            The inputs of the DMFT calculation.
+        `**sizes`
+            Sizes specific to this calculation, see `_with_resources`.
+
+        Returns
+        -------
+        `orm.WorkChainNode`
+            The submitted restart workflow.
+        """
+        return self.submit(
+            DMFTBaseWorkChain,
+            dmft=self._with_resources("dmft", inputs, **sizes),
+            **self.exposed_inputs(
+                DMFTBaseWorkChain,
+                namespace="dmft",
+            ),
+            metadata={
+                "call_link_label": stage,
+            },
+        )
+
+    def _get_inputs_as_dict(self) -> dict:
+        """Get the inputs of the workflow, less its own metadata, as nested dicts."""
+
+        def to_dict(namespace: Mapping) -> dict:
+            return {
+                name: to_dict(value) if isinstance(value, Mapping) else value
+                for name, value in namespace.items()
+            }
+
+        inputs = to_dict(self.inputs)
+        inputs.pop("metadata", None)
+        return inputs
+
+    def _get_system_sizes(self) -> dict:
+        """Get the sizes of the system and grids the stage costs scale with."""
+
+        if "system_sizes" not in self.ctx:
+            basis = self.inputs.greens_function.basis.get_dict()
+            device: orm.StructureData = self.inputs.dft.device.structure
+            scattering_region = self.ctx.scattering_region.get_array("default")
+            active = self.inputs.scattering.active.get_dict()
+            scattering_symbols = device.get_ase()[scattering_region].symbols
+
+            self.ctx.system_sizes = {
+                "number_of_orbitals": get_number_of_orbitals(device, basis),
+                "number_of_leads_orbitals": get_number_of_orbitals(
+                    self.inputs.dft.leads.structure,
+                    basis,
+                ),
+                "number_of_kpoints": get_number_of_kpoints(
+                    self.inputs.dft.device.kpoints
+                ),
+                "number_of_leads_kpoints": get_number_of_kpoints(
+                    self.inputs.dft.leads.kpoints
+                ),
+                "number_of_energies": get_number_of_energies(
+                    self.inputs.energy_grid_parameters.get_dict()
+                ),
+                "matsubara_grid_size": self.inputs.hybridization.matsubara_grid_size.value,
+                # the active orbitals of each atom, e.g., 2 for {"C": [2, 3]}
+                "number_of_los": sum(
+                    np.size(active[symbol])
+                    for symbol in scattering_symbols
+                    if symbol in active
+                ),
+                # default of the DMFT script
+                "number_of_baths": self.inputs.dmft.parameters.get(
+                    "number_of_baths", 4
+                ),
+                "number_of_dmu": get_dmu_values(
+                    self.inputs.dmft.sweep_mu.parameters.get_dict()
+                ).size,
+                "number_of_bias_points": get_number_of_bias_points(
+                    self.inputs.current.parameters.get_dict()
+                ),
+            }
+
+        return self.ctx.system_sizes
+
+    def _with_resources(self, stage: str, inputs: dict, **sizes) -> dict:
+        """Set the estimated resources of a stage in its metadata options.
+
+        Parameters
+        ----------
+        `stage` : `str`
+            The stage, e.g., `dft` or `transmission`.
+        `inputs` : `dict`
+            The inputs of the calculation.
+        `**sizes`
+            Sizes specific to this calculation, e.g., the number of dmu values of
+            a chunk, overriding those of the system.
+
+        Returns
+        -------
+        `dict`
+            The inputs, with estimated resources if enabled.
+        """
+
+        if not self.inputs.resources.automatic:
+            return inputs
+
+        computer: orm.Computer = inputs["code"].computer
+        options = estimate_stage_options(
+            stage,
+            {**self._get_system_sizes(), **sizes},
+            self.inputs.resources.parameters.get_dict(),
+            computer.get_default_mpiprocs_per_machine() or 1,
+        )
+
+        metadata = dict(inputs.get("metadata", {}))
+        user_options = dict(metadata.get("options", {}))
+        options["environment_variables"] = {
+            **user_options.get("environment_variables", {}),
+            **options["environment_variables"],
+        }
+        metadata["options"] = {**user_options, **options}
+
+        resources = options["resources"]
+        self.report(
+            f"{stage}: {resources['num_machines']} machine(s), "
+            f"{resources['num_mpiprocs_per_machine']} rank(s) per machine, "
+            f"{resources['num_cores_per_mpiproc']} thread(s) per rank, "
+            f"{options['max_wallclock_seconds']} s"
+        )
+
+        return {**inputs, "metadata": metadata}
+
     def gather_results(self):
         """docstring"""
 
-        self.out_many(
-            self.exposed_outputs(
-                self.ctx.dft_leads,
-                DFTCalculation,
-                namespace="dft.leads",
+        if "dft_leads" in self.ctx:
+            self.out_many(
+                self.exposed_outputs(
+                    self.ctx.dft_leads,
+                    DFTCalculation,
+                    namespace="dft.leads",
+                )
             )
-        )
 
-        self.out_many(
-            self.exposed_outputs(
-                self.ctx.dft_device,
-                DFTCalculation,
-                namespace="dft.device",
+        if "dft_device" in self.ctx:
+            self.out_many(
+                self.exposed_outputs(
+                    self.ctx.dft_device,
+                    DFTCalculation,
+                    namespace="dft.device",
+                )
             )
-        )
 
-        self.out_many(
-            self.exposed_outputs(
-                self.ctx.localization,
-                LocalizationCalculation,
-                namespace="localization",
+        if "localization" in self.ctx:
+            self.out_many(
+                self.exposed_outputs(
+                    self.ctx.localization,
+                    LocalizationCalculation,
+                    namespace="localization",
+                )
             )
-        )
 
-        self.out_many(
-            self.exposed_outputs(
-                self.ctx.greens_function,
-                GreensFunctionParametersCalculation,
-                namespace="greens_function",
+        if "greens_function" in self.ctx:
+            self.out_many(
+                self.exposed_outputs(
+                    self.ctx.greens_function,
+                    GreensFunctionParametersCalculation,
+                    namespace="greens_function",
+                )
             )
-        )
 
-        self.out_many(
-            self.exposed_outputs(
-                self.ctx.hybridization,
-                HybridizationCalculation,
-                namespace="hybridization",
+        if "hybridization" in self.ctx:
+            self.out_many(
+                self.exposed_outputs(
+                    self.ctx.hybridization,
+                    HybridizationCalculation,
+                    namespace="hybridization",
+                )
             )
-        )
+        elif self._should_bundle_hybridization():
+            for port, node in self.ctx.greens_function.outputs.hybridization.items():
+                self.out(f"hybridization.{port}", node)
 
-        self.out_many(
-            self.exposed_outputs(
-                self.ctx.dmft_converge_mu,
-                DMFTCalculation,
-                namespace="dmft.converge_mu",
+        if "dmft_converge_mu" in self.ctx:
+            self.out_many(
+                self.exposed_outputs(
+                    self.ctx.dmft_converge_mu,
+                    DMFTCalculation,
+                    namespace="dmft.converge_mu",
+                )
             )
-        )
 
-        self.out_many(
-            self.exposed_outputs(
-                self.ctx.dmft_sweep_mu,
-                DMFTCalculation,
-                namespace="dmft.sweep_mu",
+        if len(self.ctx.dmft_sweep_mu) == 1:
+            self.out_many(
+                self.exposed_outputs(
+                    self.ctx.dmft_sweep_mu[0],
+                    DMFTCalculation,
+                    namespace="dmft.sweep_mu",
+                )
+            )
+        else:
+            self.out(
+                "dmft.sweep_mu.delta_folder",
+                self.ctx.dmft_sweep_mu_delta_folder,
+            )
+            self.out(
+                "dmft.sweep_mu.sigma_folder",
+                self.ctx.dmft_sweep_mu_sigma_folder,
             )
-        )
 
-        self.out_many(
-            self.exposed_outputs(
-                self.ctx.transmission,
-                TransmissionCalculation,
-                namespace="transmission",
+        if len(self.ctx.transmission) == 1:
+            self.out_many(
+                self.exposed_outputs(
+                    self.ctx.transmission[0],
+                    TransmissionCalculation,
+                    namespace="transmission",
+                )
+            )
+        else:
+            self.out(
+                "transmission.transmission_folder",
+                self.ctx.transmission_folder,
             )
-        )
 
-        self.out_many(
-            self.exposed_outputs(
-                self.ctx.current,
-                CurrentCalculation,
-                namespace="current",
+        if self.should_pipeline_current():
+            for label, current_file in self.ctx.current_files.items():
+                self.out(f"current.{label}", current_file)
+        else:
+            self.out_many(
+                self.exposed_outputs(
+                    self.ctx.current,
+                    CurrentCalculation,
+                    namespace="current",
+                )
             )
+
+        self._report_performance()
+
+    def _report_performance(self):
+        """Output the performance report of the processes run so far."""
+        report = build_performance_report(
+            orm.Dict(get_process_timings(self.node)),
         )
+        critical_path = " <- ".join(step["stage"] for step in report["critical_path"])
+        self.report(f"critical path: {critical_path}")
+        self.out("performance_report", report)
@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from aiida import orm
+from aiida.common.links import LinkType
+from aiida.engine import append_, if_
+
+from aiida_quantum_transport.calculations import DFTCalculation
+
+from .coulomb_diamonds import CoulombDiamondsWorkChain
+from .utils import get_stage_key
+
+if TYPE_CHECKING:
+    from aiida.engine.processes.workchains.workchain import WorkChainSpec
+
+
+class CoulombDiamondsCampaignWorkChain(CoulombDiamondsWorkChain):
+    """A workflow for generating Coulomb Diamonds for many devices.
+
+    The devices are grouped by the fingerprint of their leads dft (structure,
+    kpoints, parameters and code), which is run once per group. Each device is
+    then run as a concurrent `CoulombDiamondsWorkChain` starting from the leads
+    results folder of its group.
+    """
+
+    # device-specific, hence not shared by the devices
+    _DEVICE_INPUTS = (
+        ("dft", "device", "structure"),
+        ("dft", "device", "remote_results_folder"),
+        ("localization", "remote_results_folder"),
+        ("greens_function", "remote_results_folder"),
+        ("hybridization", "remote_results_folder"),
+        ("dmft", "converge_mu", "mu_file"),
+    )
+
+    _DEVICE_OUTPUTS = (
+        "dft",
+        "localization",
+        "greens_function",
+        "hybridization",
+        "dmft",
+        "transmission",
+        "current",
+    )
+
+    @classmethod
+    def define(cls, spec: WorkChainSpec) -> None:
+        """Define the workflow specifications (input, output, outline, etc.).
+
+        Parameters
+        ----------
+        `spec` : `WorkChainSpec`
+            The workflow specification.
+        """
+
+        super().define(spec)
+
+        spec.input_namespace(
+            "campaign.devices",
+            valid_type=orm.StructureData,
+            dynamic=True,
+            help="The structures of the devices, by device label",
+        )
+
+        spec.input_namespace(
+            "campaign.leads",
+            valid_type=orm.StructureData,
+            dynamic=True,
+            required=False,
+            help="The structures of the leads, by device label; the devices not "
+            "listed use `dft.leads.structure`",
+        )
+
+        spec.input(
+            "clean_workdir",
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help="If True, the working directories of the leads dft calculations "
+            "are cleaned once all calculations using them have finished",
+        )
+
+        for path in cls._DEVICE_INPUTS:
+            *namespaces, port = path
+            namespace = spec.inputs
+            for name in namespaces:
+                namespace = namespace[name]
+            del namespace[port]
+
+        for namespace in cls._DEVICE_OUTPUTS:
+            del spec.outputs[namespace]
+
+        spec.output_namespace(
+            "leads",
+            valid_type=orm.RemoteData,
+            dynamic=True,
+            help="The results folder of the leads dft of each group, by group label",
+        )
+
+        spec.output_namespace(
+            "devices",
+            dynamic=True,
+            help="The outputs of the workflow of each device, by device label",
+        )
+
+        spec.outline(
+            cls.setup,
+            cls.check_precomputed_results,
+            if_(cls.should_run_dft)(
+                cls.run_dft,
+            ),
+            cls.run_devices,
+            cls.gather_results,
+        )
+
+        spec.exit_code(
+            300,
+            "ERROR_INVALID_CAMPAIGN",
+            "the campaign is invalid: {message}",
+        )
+
+        spec.exit_code(
+            401,
+            "ERROR_DEVICE_FAILED",
+            "one or more devices failed: {devices}",
+        )
+
+        spec.exit_code(
+            403,
+            "ERROR_LEADS_DFT_FAILED",
+            "the leads dft of {group} failed",
+        )
+
+    def setup(self):
+        """docstring"""
+
+        super().setup()
+
+        devices = self.inputs.campaign.devices
+        leads = self.inputs.campaign.get("leads", {})
+
+        if not devices:
+            return self.exit_codes.ERROR_INVALID_CAMPAIGN.format(
+                message="no devices given"
+            )
+
+        unknown_devices = set(leads) - set(devices)
+        if unknown_devices:
+            return self.exit_codes.ERROR_INVALID_CAMPAIGN.format(
+                message=f"leads given for unknown devices {sorted(unknown_devices)}"
+            )
+
+        if leads and "dft_leads" in self.ctx.precomputed:
+            return self.exit_codes.ERROR_INVALID_CAMPAIGN.format(
+                message="per-device leads given along with a precomputed leads "
+                "results folder"
+            )
+
+        # all devices share the precomputed leads
+        if "dft_leads" in self.ctx.precomputed:
+            self.ctx.groups = {"leads_0": sorted(devices)}
+            return
+
+        groups: dict[str, list[str]] = {}
+        for label in sorted(devices):
+            key = get_stage_key(DFTCalculation, self._get_leads_inputs(label))
+            groups.setdefault(key, []).append(label)
+
+        self.ctx.groups = {
+            f"leads_{index}": labels for index, labels in enumerate(groups.values())
+        }
+
+    def should_run_dft(self):
+        """docstring"""
+        return "dft_leads" not in self.ctx.precomputed
+
+    def run_dft(self):
+        """docstring"""
+        for group, labels in self.ctx.groups.items():
+            self.report(f"{group} is shared by {', '.join(labels)}")
+            self.to_context(
+                **{
+                    group: self._submit_stage(
+                        group,
+                        DFTCalculation,
+                        self._with_warm_start(group, self._get_leads_inputs(labels[0])),
+                    )
+                }
+            )
+
+    def run_devices(self):
+        """docstring"""
+
+        for group in self.ctx.groups:
+            if group in self.ctx and not self.ctx[group].is_finished_ok:
+                return self.exit_codes.ERROR_LEADS_DFT_FAILED.format(group=group)
+
+        device_inputs = self._get_inputs_as_dict()
+        del device_inputs["campaign"]
+        del device_inputs["clean_workdir"]
+
+        self.ctx.device_labels = []
+
+        for group, labels in self.ctx.groups.items():
+            for label in labels:
+                inputs = {
+                    **device_inputs,
+                    "dft": {
+                        **device_inputs["dft"],
+                        "leads": {
+                            **device_inputs["dft"]["leads"],
+                            "structure": self._get_leads_structure(label),
+                            "remote_results_folder": self._get_leads_folder(group),
+                        },
+                        "device": {
+                            **device_inputs["dft"]["device"],
+                            "structure": self.inputs.campaign.devices[label],
+                        },
+                    },
+                    "metadata": {
+                        "call_link_label": label,
+                    },
+                }
+                self.to_context(
+                    devices=append_(
+                        self.submit(
+                            CoulombDiamondsWorkChain,
+                            **inputs,
+                        )
+                    )
+                )
+                self.ctx.device_labels.append(label)
+
+    def gather_results(self):
+        """docstring"""
+
+        for group in self.ctx.groups:
+            self.out(f"leads.{group}", self._get_leads_folder(group))
+
+        failed_devices = []
+
+        for label, device in zip(self.ctx.device_labels, self.ctx.devices):
+            if not device.is_finished_ok:
+                failed_devices.append(label)
+            for link in device.base.links.get_outgoing(
+                link_type=LinkType.RETURN,
+            ).all():
+                port = link.link_label.replace("__", ".")
+                self.out(f"devices.{label}.{port}", link.node)
+
+        self._report_performance()
+
+        if failed_devices:
+            return self.exit_codes.ERROR_DEVICE_FAILED.format(
+                devices=", ".join(failed_devices)
+            )
+
+    def on_terminated(self):
+        """Clean the leads dft folders run by the campaign, if requested.
+
+        A folder is kept as long as any calculation using it has not finished,
+        e.g., that of another workflow reusing it from the stage cache.
+        """
+
+        super().on_terminated()
+
+        if not self.inputs.clean_workdir.value:
+            return
+
+        for group in self.ctx.get("groups", {}):
+            node: orm.CalcJobNode | None = self.ctx.get(group)
+
+            # reused from a previous run, hence not ours to clean
+            if node is None or node.caller is None or node.caller.pk != self.node.pk:
+                continue
+
+            if "remote_results_folder" not in node.outputs:
+                continue
+
+            consumers = node.outputs.remote_results_folder.base.links.get_outgoing(
+                link_type=LinkType.INPUT_CALC,
+            ).all_nodes()
+            running = [consumer for consumer in consumers if not consumer.is_terminated]
+            if running:
+                self.report(
+                    f"keeping the folder of {group}, still used by "
+                    f"{', '.join(str(consumer.pk) for consumer in running)}"
+                )
+                continue
+
+            try:
+                node.outputs.remote_folder._clean()
+                self.report(f"cleaned the folder of {group}")
+            except (OSError, KeyError):
+                self.report(f"failed to clean the folder of {group}")
+
+    def _get_leads_structure(self, label: str) -> orm.StructureData:
+        """Get the leads structure of a device."""
+        return self.inputs.campaign.get("leads", {}).get(
+            label,
+            self.inputs.dft.leads.structure,
+        )
+
+    def _get_leads_inputs(self, label: str) -> dict:
+        """Get the inputs of the leads dft calculation of a device."""
+        return {
+            "code": self.inputs.dft.code,
+            **self.exposed_inputs(DFTCalculation, namespace="dft.leads"),
+            "structure": self._get_leads_structure(label),
+        }
+
+    def _get_leads_folder(self, group: str) -> orm.RemoteData:
+        """Get the leads results folder of a group."""
+        if "dft_leads" in self.ctx.precomputed:
+            return self.ctx.precomputed["dft_leads"]
+        return self.ctx[group].outputs.remote_results_folder
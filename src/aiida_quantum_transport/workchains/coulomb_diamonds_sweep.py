@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from aiida import orm
+from aiida.common.links import LinkType
+from aiida.engine import append_, if_
+
+from aiida_quantum_transport.calculations import (
+    DFTCalculation,
+    GreensFunctionParametersCalculation,
+    HybridizationCalculation,
+    LocalizationCalculation,
+    build_sweep_grid,
+)
+
+from .coulomb_diamonds import CoulombDiamondsWorkChain
+
+if TYPE_CHECKING:
+    from aiida.engine.processes.workchains.workchain import WorkChainSpec
+
+
+class CoulombDiamondsSweepWorkChain(CoulombDiamondsWorkChain):
+    """A workflow for generating Coulomb Diamonds over a grid of parameters.
+
+    The dft, localization and greens function stages are shared by all points of
+    the grid. The workflow branches at the hybridization (per temperature and
+    Matsubara grid size) and at the dmft (per U and number of baths), running
+    each point as a concurrent `CoulombDiamondsWorkChain` that reuses the shared
+    stages.
+    """
+
+    _HYBRIDIZATION_SWEEP_KEYS = ("temperature", "matsubara_grid_size")
+    _DMFT_SWEEP_KEYS = ("U", "number_of_baths")
+
+    # the outputs of the individual branches
+    _BRANCH_OUTPUTS = ("hybridization", "dmft", "transmission", "current")
+
+    @classmethod
+    def define(cls, spec: WorkChainSpec) -> None:
+        """Define the workflow specifications (input, output, outline, etc.).
+
+        Parameters
+        ----------
+        `spec` : `WorkChainSpec`
+            The workflow specification.
+        """
+
+        super().define(spec)
+
+        spec.input(
+            "sweep.parameters",
+            valid_type=orm.Dict,
+            help="The swept values (list or single value) of any of "
+            f"{cls._HYBRIDIZATION_SWEEP_KEYS + cls._DMFT_SWEEP_KEYS}; parameters "
+            "not swept are taken from the hybridization and dmft inputs",
+        )
+
+        # branch-specific, hence not shared by the branches
+        del spec.inputs["hybridization"]["remote_results_folder"]
+        del spec.inputs["hybridization"]["bundled"]
+        del spec.inputs["dmft"]["converge_mu"]["mu_file"]
+
+        for namespace in cls._BRANCH_OUTPUTS:
+            del spec.outputs[namespace]
+
+        spec.output(
+            "sweep.grid",
+            valid_type=orm.Dict,
+            help="The parameters of each branch, by branch label",
+        )
+
+        spec.output_namespace(
+            "branches",
+            dynamic=True,
+            help="The hybridization, dmft, transmission and current outputs of "
+            "each branch, by branch label",
+        )
+
+        spec.outline(
+            cls.setup,
+            cls.check_precomputed_results,
+            cls.define_scattering_region,
+            if_(cls.should_run_dft)(
+                cls.run_dft,
+            ),
+            if_(cls.should_transform_basis)(
+                cls.transform_basis,
+            ),
+            if_(cls.should_generate_greens_function_parameters)(
+                cls.generate_greens_function_parameters,
+            ),
+            cls.compute_hybridization,
+            cls.run_branches,
+            cls.gather_results,
+        )
+
+        spec.exit_code(
+            300,
+            "ERROR_INVALID_SWEEP_PARAMETERS",
+            "the sweep parameters contain unknown keys: {keys}",
+        )
+
+        spec.exit_code(
+            401,
+            "ERROR_BRANCH_FAILED",
+            "one or more branches failed: {branches}",
+        )
+
+    def setup(self):
+        """docstring"""
+
+        super().setup()
+
+        sweep_keys = self._HYBRIDIZATION_SWEEP_KEYS + self._DMFT_SWEEP_KEYS
+        unknown_keys = set(self.inputs.sweep.parameters.keys()) - set(sweep_keys)
+        if unknown_keys:
+            return self.exit_codes.ERROR_INVALID_SWEEP_PARAMETERS.format(
+                keys=", ".join(sorted(unknown_keys))
+            )
+
+        self.ctx.grid = build_sweep_grid(self.inputs.sweep.parameters)
+
+    def compute_hybridization(self):
+        """docstring"""
+
+        hybridization_inputs = self._get_hybridization_inputs()
+        upstream_keys = self._get_hybridization_upstream_keys()
+
+        groups = []
+
+        for label, point in self._get_grid_points():
+            group_inputs = self._get_hybridization_sweep_inputs(point)
+            group = {key: node.value for key, node in group_inputs.items()}
+
+            if group not in groups:
+                stage = f"hybridization_{len(groups)}"
+                self.report(f"{label} starts hybridization group {group}")
+                self.to_context(
+                    **{
+                        stage: self._submit_stage(
+                            stage,
+                            HybridizationCalculation,
+                            self._with_resources(
+                                "hybridization",
+                                {**hybridization_inputs, **group_inputs},
+                                matsubara_grid_size=group["matsubara_grid_size"],
+                            ),
+                            upstream_keys,
+                        )
+                    }
+                )
+                groups.append(group)
+
+    def run_branches(self):
+        """docstring"""
+
+        branch_inputs = self._get_inputs_as_dict()
+        del branch_inputs["sweep"]
+        # the branches pick up the shared stages by their keys
+        branch_inputs["use_stage_cache"] = orm.Bool(True)
+
+        for label, point in self._get_grid_points():
+            dmft_parameters = {
+                **self.inputs.dmft.parameters.get_dict(),
+                **{key: point[key] for key in self._DMFT_SWEEP_KEYS if key in point},
+            }
+            inputs = {
+                **branch_inputs,
+                "hybridization": {
+                    **branch_inputs["hybridization"],
+                    **self._get_hybridization_sweep_inputs(point),
+                },
+                "dmft": {
+                    **branch_inputs["dmft"],
+                    "parameters": orm.Dict(dmft_parameters),
+                },
+                "metadata": {
+                    "call_link_label": label,
+                },
+            }
+            self.to_context(
+                branches=append_(
+                    self.submit(
+                        CoulombDiamondsWorkChain,
+                        **inputs,
+                    )
+                )
+            )
+
+    def gather_results(self):
+        """docstring"""
+
+        if "dft_leads" in self.ctx:
+            self.out_many(
+                self.exposed_outputs(
+                    self.ctx.dft_leads,
+                    DFTCalculation,
+                    namespace="dft.leads",
+                )
+            )
+
+        if "dft_device" in self.ctx:
+            self.out_many(
+                self.exposed_outputs(
+                    self.ctx.dft_device,
+                    DFTCalculation,
+                    namespace="dft.device",
+                )
+            )
+
+        if "localization" in self.ctx:
+            self.out_many(
+                self.exposed_outputs(
+                    self.ctx.localization,
+                    LocalizationCalculation,
+                    namespace="localization",
+                )
+            )
+
+        if "greens_function" in self.ctx:
+            self.out_many(
+                self.exposed_outputs(
+                    self.ctx.greens_function,
+                    GreensFunctionParametersCalculation,
+                    namespace="greens_function",
+                )
+            )
+
+        self.out("sweep.grid", self.ctx.grid)
+
+        self._report_performance()
+
+        failed_branches = []
+
+        for (label, _), branch in zip(self._get_grid_points(), self.ctx.branches):
+            if not branch.is_finished_ok:
+                failed_branches.append(label)
+            for link in branch.base.links.get_outgoing(
+                link_type=LinkType.RETURN,
+            ).all():
+                if link.link_label.split("__")[0] in self._BRANCH_OUTPUTS:
+                    port = link.link_label.replace("__", ".")
+                    self.out(f"branches.{label}.{port}", link.node)
+
+        if failed_branches:
+            return self.exit_codes.ERROR_BRANCH_FAILED.format(
+                branches=", ".join(failed_branches)
+            )
+
+    def _get_grid_points(self) -> list[tuple[str, dict]]:
+        """Get the points of the sweep grid, in order."""
+        grid: dict = self.ctx.grid.get_dict()
+        return sorted(grid.items(), key=lambda item: int(item[0].split("_")[-1]))
+
+    def _get_hybridization_sweep_inputs(self, point: dict) -> dict:
+        """Get the hybridization inputs of a point of the sweep grid."""
+        inputs = {
+            "temperature": self.inputs.hybridization.temperature,
+            "matsubara_grid_size": self.inputs.hybridization.matsubara_grid_size,
+        }
+        if "temperature" in point:
+            inputs["temperature"] = orm.Float(point["temperature"])
+        if "matsubara_grid_size" in point:
+            inputs["matsubara_grid_size"] = orm.Int(point["matsubara_grid_size"])
+        return inputs
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from aiida import orm
+from aiida.common import AttributeDict
+from aiida.engine import (
+    BaseRestartWorkChain,
+    ProcessHandlerReport,
+    process_handler,
+    while_,
+)
+
+from aiida_quantum_transport.calculations import DMFTCalculation
+
+if TYPE_CHECKING:
+    from aiida.engine.processes.workchains.workchain import WorkChainSpec
+
+
+class DMFTBaseWorkChain(BaseRestartWorkChain):
+    """A DMFT calculation, restarted until all of its dmu points converge.
+
+    A calculation that runs out of iterations, or of walltime, is resubmitted
+    with its delta and sigma folders as restart inputs, such that converged dmu
+    points are carried over and the others continue from their last delta.
+    """
+
+    _process_class = DMFTCalculation
+
+    @classmethod
+    def define(cls, spec: WorkChainSpec) -> None:
+        """Define the workflow specifications (input, output, outline, etc.).
+
+        Parameters
+        ----------
+        `spec` : `WorkChainSpec`
+            The workflow specification.
+        """
+
+        super().define(spec)
+
+        spec.expose_inputs(
+            DMFTCalculation,
+            namespace="dmft",
+        )
+
+        spec.expose_outputs(DMFTCalculation)
+
+        spec.outline(
+            cls.setup,
+            while_(cls.should_run_process)(
+                cls.run_process,
+                cls.inspect_process,
+            ),
+            cls.results,
+        )
+
+    def setup(self):
+        """docstring"""
+        super().setup()
+        self.ctx.inputs = AttributeDict(
+            self.exposed_inputs(
+                DMFTCalculation,
+                namespace="dmft",
+            )
+        )
+
+    @process_handler(
+        priority=500,
+        exit_codes=[
+            DMFTCalculation.exit_codes.ERROR_UNCONVERGED_DMU_POINTS,
+            DMFTCalculation.exit_codes.ERROR_SCHEDULER_OUT_OF_WALLTIME,
+        ],
+    )
+    def handle_unconverged_dmu_points(
+        self,
+        node: orm.CalcJobNode,
+    ) -> ProcessHandlerReport | None:
+        """Restart the unconverged dmu points from their last delta."""
+
+        # e.g., killed by the walltime before writing any result
+        if "delta_folder" not in node.outputs or "sigma_folder" not in node.outputs:
+            self.report(
+                f"{node.process_label}<{node.pk}> left nothing to restart from; "
+                "restarting from the previous inputs"
+            )
+            return ProcessHandlerReport(do_break=True)
+
+        self.ctx.inputs.restart = {
+            "delta_folder": node.outputs.delta_folder,
+            "sigma_folder": node.outputs.sigma_folder,
+        }
+
+        # continue adjusting from the last chemical potential
+        if self.ctx.inputs.adjust_mu and "mu_file" in node.outputs:
+            self.ctx.inputs.mu_file = node.outputs.mu_file
+
+        self.report(
+            f"{node.process_label}<{node.pk}> failed with: {node.exit_message}; "
+            "restarting the unconverged dmu points"
+        )
+
+        return ProcessHandlerReport(do_break=True)
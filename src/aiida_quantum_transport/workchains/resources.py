@@ -0,0 +1,234 @@
+"""Estimation of the computational resources of the workflow stages."""
+
+from __future__ import annotations
+
+import math
+import typing as t
+
+from aiida import orm
+
+# defaults of the energy grid and bias window in the scripts
+ENERGY_GRID_DEFAULTS = {
+    "E_min": -3.0,
+    "E_max": 3.0,
+    "E_step": 1e-2,
+}
+
+BIAS_DEFAULTS = {
+    "V_min": -2.5,
+    "V_max": 2.5,
+    "dV": 0.1,
+}
+
+RESOURCES_DEFAULTS: dict[str, t.Any] = {
+    "cores_per_machine": None,  # the default of the computer if not provided
+    "max_machines": 1,
+    "target_walltime": 3600,
+    "min_walltime": 600,
+    "max_walltime": 86400,
+    "safety_factor": 2.0,
+    "seconds_per_unit": {},
+    "stages": {},
+}
+
+# rough single-core calibration of the work models below, to be tuned per machine
+SECONDS_PER_UNIT = {
+    "dft": 1e-8,
+    "localization": 1e-9,
+    "greens_function": 1e-9,
+    "hybridization": 1e-9,
+    "dmft": 1e-4,
+    "transmission": 1e-9,
+    "current": 1e-8,
+}
+
+# the dominant scaling of each stage
+_STAGE_WORK = {
+    "dft": lambda sizes: sizes["number_of_kpoints"] * sizes["number_of_orbitals"] ** 3,
+    "localization": lambda sizes: sizes["number_of_orbitals"] ** 3,
+    "greens_function": lambda sizes: (
+        sizes["number_of_leads_kpoints"] * sizes["number_of_leads_orbitals"] ** 3
+        + sizes["number_of_orbitals"] ** 3
+    ),
+    "hybridization": lambda sizes: (
+        (sizes["number_of_energies"] + sizes["matsubara_grid_size"])
+        * sizes["number_of_orbitals"] ** 3
+    ),
+    "dmft": lambda sizes: (
+        sizes["number_of_dmu"]
+        * sizes["matsubara_grid_size"]
+        * sizes["number_of_los"]
+        * 4 ** (sizes["number_of_baths"] + 1)
+    ),
+    "transmission": lambda sizes: (
+        sizes["number_of_dmu"]
+        * sizes["number_of_energies"]
+        * sizes["number_of_orbitals"] ** 3
+    ),
+    "current": lambda sizes: (
+        sizes["number_of_dmu"]
+        * sizes["number_of_bias_points"]
+        * sizes["number_of_energies"]
+    ),
+}
+
+# the number of units the MPI-parallel scripts distribute over ranks
+_STAGE_PARALLELISM = {
+    "dft": lambda sizes: sizes["number_of_kpoints"] * sizes["number_of_orbitals"],
+    "hybridization": lambda sizes: (
+        sizes["number_of_energies"] + sizes["matsubara_grid_size"]
+    ),
+    "transmission": lambda sizes: sizes["number_of_energies"],
+}
+
+
+def get_number_of_orbitals(structure: orm.StructureData, basis: dict) -> int:
+    """Get the number of atomic orbitals of a structure.
+
+    Parameters
+    ----------
+    `structure` : `orm.StructureData`
+        The structure.
+    `basis` : `dict`
+        The number of atomic orbitals per species.
+
+    Returns
+    -------
+    `int`
+        The number of atomic orbitals of the structure.
+    """
+    # species missing from the basis are assumed to be the largest
+    default = max(basis.values(), default=1)
+    return sum(basis.get(symbol, default) for symbol in structure.get_ase().symbols)
+
+
+def get_number_of_kpoints(kpoints: orm.KpointsData) -> int:
+    """Get the number of k-points of a mesh or list.
+
+    Parameters
+    ----------
+    `kpoints` : `orm.KpointsData`
+        The k-points.
+
+    Returns
+    -------
+    `int`
+        The number of k-points.
+    """
+    try:
+        mesh, _ = kpoints.get_kpoints_mesh()
+        return math.prod(mesh)
+    except AttributeError:
+        return len(kpoints.get_kpoints())
+
+
+def get_number_of_energies(energy_grid_parameters: dict) -> int:
+    """Get the size of the real energy grid, as constructed in the scripts.
+
+    Parameters
+    ----------
+    `energy_grid_parameters` : `dict`
+        The energy grid parameters.
+
+    Returns
+    -------
+    `int`
+        The number of energies.
+    """
+    parameters = {**ENERGY_GRID_DEFAULTS, **energy_grid_parameters}
+    E_min, E_max = parameters["E_min"], parameters["E_max"]
+    return int((E_max - E_min) / parameters["E_step"]) + 1
+
+
+def get_number_of_bias_points(current_parameters: dict) -> int:
+    """Get the number of bias points, as constructed in the current script.
+
+    Parameters
+    ----------
+    `current_parameters` : `dict`
+        The current parameters.
+
+    Returns
+    -------
+    `int`
+        The number of bias points.
+    """
+    parameters = {**BIAS_DEFAULTS, **current_parameters}
+    V_min, V_max = parameters["V_min"], parameters["V_max"]
+    return int((V_max - V_min) / parameters["dV"]) + 1
+
+
+def estimate_stage_options(
+    stage: str,
+    sizes: dict,
+    settings: dict,
+    cores_per_machine: int = 1,
+) -> dict:
+    """Estimate the resources of a stage from the size of the system.
+
+    The single-core runtime of the stage is estimated from its dominant scaling.
+    Workers are added until the estimate fits the target walltime, as MPI ranks
+    for the MPI-parallel scripts, or as threads otherwise.
+
+    Parameters
+    ----------
+    `stage` : `str`
+        The stage, one of `dft`, `localization`, `greens_function`,
+        `hybridization`, `dmft`, `transmission`, or `current`.
+    `sizes` : `dict`
+        The sizes of the system and grids the stage scales with.
+    `settings` : `dict`
+        The resource settings, see `RESOURCES_DEFAULTS`. Entries of
+        `settings["stages"][stage]` override the estimated options.
+    `cores_per_machine` : `int`
+        The number of cores per machine, `1` by default. Overridden by
+        `settings["cores_per_machine"]`.
+
+    Returns
+    -------
+    `dict`
+        The metadata options of the stage.
+    """
+
+    settings = {**RESOURCES_DEFAULTS, **settings}
+    cores_per_machine = settings["cores_per_machine"] or cores_per_machine
+    seconds_per_unit = {**SECONDS_PER_UNIT, **settings["seconds_per_unit"]}
+
+    runtime = seconds_per_unit[stage] * _STAGE_WORK[stage](sizes)
+    workers = math.ceil(runtime / settings["target_walltime"])
+
+    if stage in _STAGE_PARALLELISM:
+        max_ranks = min(
+            cores_per_machine * settings["max_machines"],
+            _STAGE_PARALLELISM[stage](sizes),
+        )
+        ranks, threads = max(1, min(workers, max_ranks)), 1
+    else:
+        ranks, threads = 1, max(1, min(workers, cores_per_machine))
+
+    num_machines = math.ceil(ranks / cores_per_machine)
+    walltime = settings["safety_factor"] * runtime / (ranks * threads)
+
+    options = {
+        "withmpi": ranks > 1,
+        "resources": {
+            "num_machines": num_machines,
+            "num_mpiprocs_per_machine": math.ceil(ranks / num_machines),
+            "num_cores_per_mpiproc": threads,
+        },
+        "max_wallclock_seconds": int(
+            min(max(walltime, settings["min_walltime"]), settings["max_walltime"])
+        ),
+        "environment_variables": {
+            "OMP_NUM_THREADS": str(threads),
+        },
+    }
+
+    overrides = settings["stages"].get(stage, {})
+    for option, value in overrides.items():
+        if isinstance(value, dict):
+            options[option] = {**options.get(option, {}), **value}
+        else:
+            options[option] = value
+
+    return options
@@ -0,0 +1,302 @@
+"""Helper functions shared by the workflows of the plugin."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+from typing import TYPE_CHECKING
+
+import numpy as np
+from aiida import orm
+from aiida.common.hashing import make_hash
+from aiida.common.links import LinkType
+
+from aiida_quantum_transport.calculations.base import PHASE_TIMESTAMPS_EXTRA
+
+if TYPE_CHECKING:
+    from aiida.engine import Process
+
+
+def get_number_of_chunks(
+    number_of_points: int,
+    number_of_chunks: int | None = None,
+    points_per_chunk: int = 10,
+) -> int:
+    """Get the number of chunks a sweep is split into.
+
+    Parameters
+    ----------
+    `number_of_points` : `int`
+        The number of points in the sweep.
+    `number_of_chunks` : `int | None`
+        The requested number of chunks, `None` by default.
+        If `None`, derived from `points_per_chunk`.
+    `points_per_chunk` : `int`
+        The targeted number of points per chunk, `10` by default.
+
+    Returns
+    -------
+    `int`
+        The number of chunks, between 1 and `number_of_points`.
+    """
+    if number_of_chunks is None:
+        number_of_chunks = math.ceil(number_of_points / points_per_chunk)
+    return max(1, min(number_of_chunks, number_of_points))
+
+
+STAGE_KEY_EXTRA = "quantum_transport_stage_key"
+
+# inputs only seeding a calculation, hence not affecting its results
+SEED_PORTS = ("parent_folder", "restart_file")
+
+
+def get_stage_key(
+    process_class: type[Process],
+    inputs: dict,
+    upstream_keys: dict[str, str] | None = None,
+) -> str:
+    """Get the content-based key of a workflow stage.
+
+    The key is built from the content hashes of the stage inputs, excluding the
+    metadata and the `SEED_PORTS`. As `RemoteData` nodes hash by remote path,
+    the keys of the stages that produced them are used in their place.
+
+    Parameters
+    ----------
+    `process_class` : `type[Process]`
+        The process class of the stage.
+    `inputs` : `dict`
+        The (nested) inputs of the stage.
+    `upstream_keys` : `dict[str, str] | None`
+        The keys of the upstream stages, by (dotted) input port, `None` by default.
+
+    Returns
+    -------
+    `str`
+        The key of the stage.
+    """
+
+    upstream_keys = upstream_keys or {}
+    contents = {"process": process_class.__name__}
+
+    def collect(namespace: dict, prefix: str = "") -> None:
+        for name, value in namespace.items():
+            port = f"{prefix}{name}"
+            if port == "metadata" or port in SEED_PORTS:
+                continue
+            if port in upstream_keys:
+                contents[port] = upstream_keys[port]
+            elif isinstance(value, dict):
+                collect(value, f"{port}.")
+            elif isinstance(value, orm.Node):
+                contents[port] = get_content_hash(value)
+
+    collect(inputs)
+
+    serialized = json.dumps(contents, sort_keys=True)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def get_content_hash(node: orm.Node) -> str:
+    """Get the content hash of a node, stored or not.
+
+    Parameters
+    ----------
+    `node` : `orm.Node`
+        The node.
+
+    Returns
+    -------
+    `str`
+        The hash of the node, or its UUID if it could not be hashed.
+    """
+    if node.is_stored:
+        node_hash = node.base.caching.get_hash()
+    else:
+        node_hash = make_hash(node.base.caching.get_objects_to_hash())
+    return node_hash or str(node.uuid)
+
+
+def find_stage(key: str) -> orm.CalcJobNode | None:
+    """Find the latest successful calculation of a stage by its key.
+
+    Calculations whose remote working directory was cleaned are ignored.
+
+    Parameters
+    ----------
+    `key` : `str`
+        The key of the stage.
+
+    Returns
+    -------
+    `orm.CalcJobNode | None`
+        The calculation node, `None` if not found.
+    """
+
+    qb = orm.QueryBuilder()
+    qb.append(
+        orm.CalcJobNode,
+        filters={
+            f"extras.{STAGE_KEY_EXTRA}": key,
+            "attributes.process_state": "finished",
+            "attributes.exit_status": 0,
+        },
+        tag="calculation",
+    )
+    qb.order_by({"calculation": {"ctime": "desc"}})
+
+    for (node,) in qb.iterall():
+        if not node.outputs.remote_folder.base.extras.get("cleaned", False):
+            return node
+
+    return None
+
+
+def find_dft_parent(
+    code: orm.AbstractCode,
+    structure: orm.StructureData,
+    parameters: dict,
+    max_displacement: float = 0.5,
+) -> orm.CalcJobNode | None:
+    """Find the latest dft calculation compatible to seed a new one.
+
+    A calculation is compatible if it ran the same code on the same atoms, in
+    the same order and within `max_displacement` of the new positions, and
+    with the same mode and basis, such that its density is a good guess.
+    Calculations whose remote working directory was cleaned are ignored.
+
+    Parameters
+    ----------
+    `code` : `orm.AbstractCode`
+        The code of the new calculation.
+    `structure` : `orm.StructureData`
+        The structure of the new calculation.
+    `parameters` : `dict`
+        The parameters of the new calculation.
+    `max_displacement` : `float`
+        The largest displacement of an atom or cell vector in Angstrom, `0.5` by
+        default.
+
+    Returns
+    -------
+    `orm.CalcJobNode | None`
+        The calculation node, `None` if not found.
+    """
+
+    atoms = structure.get_ase()
+
+    qb = orm.QueryBuilder()
+    qb.append(orm.AbstractCode, filters={"id": code.pk}, tag="code")
+    qb.append(
+        orm.CalcJobNode,
+        with_incoming="code",
+        filters={
+            "process_type": "aiida.calculations:quantum_transport.dft",
+            "attributes.process_state": "finished",
+            "attributes.exit_status": 0,
+        },
+        tag="calculation",
+    )
+    qb.order_by({"calculation": {"ctime": "desc"}})
+
+    for (node,) in qb.iterall():
+        if node.outputs.remote_folder.base.extras.get("cleaned", False):
+            continue
+
+        parent_parameters = node.inputs.parameters.get_dict()
+        if any(
+            parent_parameters.get(name) != parameters.get(name)
+            for name in ("mode", "basis")
+        ):
+            continue
+
+        parent_atoms = node.inputs.structure.get_ase()
+        if parent_atoms.get_chemical_symbols() != atoms.get_chemical_symbols():
+            continue
+
+        displacement = max(
+            np.abs(parent_atoms.positions - atoms.positions).max(initial=0.0),
+            np.abs(parent_atoms.cell[:] - atoms.cell[:]).max(),
+        )
+        if displacement <= max_displacement:
+            return node
+
+    return None
+
+
+def get_process_timings(workflow: orm.WorkflowNode) -> dict:
+    """Get the timestamps and dependencies of the processes run by a workflow.
+
+    Only the processes doing the work, i.e., calculations and calculation
+    functions, are included, at any depth of nested workflows.
+
+    Parameters
+    ----------
+    `workflow` : `orm.WorkflowNode`
+        The workflow.
+
+    Returns
+    -------
+    `dict`
+        The `start` of the workflow, and its `processes` by pk, each with its
+        `stage` (the call link labels from the workflow down), `process_label`,
+        `created` and `finished` times, the timestamps of its `phases`, the
+        scheduler `dispatched` time (if known), and the pks of the processes it
+        depends on.
+    """
+
+    processes = {
+        node.pk: node
+        for node in workflow.called_descendants
+        if isinstance(node, orm.CalculationNode)
+    }
+
+    def get_stage(node: orm.ProcessNode) -> str:
+        labels = []
+        while node.pk != workflow.pk:
+            link = node.base.links.get_incoming(
+                link_type=(LinkType.CALL_CALC, LinkType.CALL_WORK),
+            ).one()
+            # the restart iterations are not stages of their own
+            if not link.link_label.startswith("iteration_"):
+                label = link.link_label
+                labels.append(node.process_label if label == "CALL" else label)
+            node = link.node
+        return ".".join(reversed(labels))
+
+    def get_dependencies(node: orm.CalculationNode) -> set[int]:
+        dependencies = set()
+        for data in node.base.links.get_incoming(
+            link_type=LinkType.INPUT_CALC,
+        ).all_nodes():
+            creator = data.creator
+            if creator is not None and creator.pk in processes:
+                dependencies.add(creator.pk)
+        return dependencies
+
+    timings = {}
+
+    for pk, node in processes.items():
+        phases = node.base.extras.get(PHASE_TIMESTAMPS_EXTRA, {})
+
+        dispatched = None
+        if isinstance(node, orm.CalcJobNode):
+            job_info = node.get_last_job_info()
+            if job_info is not None and job_info.dispatch_time is not None:
+                dispatched = job_info.dispatch_time.timestamp()
+
+        timings[str(pk)] = {
+            "stage": get_stage(node),
+            "process_label": node.process_label,
+            "created": node.ctime.timestamp(),
+            "finished": phases.get("terminated", node.mtime.timestamp()),
+            "phases": phases,
+            "dispatched": dispatched,
+            "dependencies": sorted(get_dependencies(node)),
+        }
+
+    return {
+        "start": workflow.ctime.timestamp(),
+        "processes": timings,
+    }
@@ -0,0 +1,63 @@
+"""Tests for the adaptive refinement of the transmission energy grid."""
+
+import numpy as np
+import pytest
+from aiida_quantum_transport.formats import refine_energy_grid
+
+
+def lorentzian(energy: float, width: float):
+    """A resonance of unit transmission on a small flat background."""
+
+    def get_transmission(energies: np.ndarray) -> np.ndarray:
+        return width**2 / ((energies - energy) ** 2 + width**2) + 1e-3
+
+    return get_transmission
+
+
+@pytest.mark.parametrize(
+    "energy, width",
+    [
+        (0.05, 1e-3),  # on a point of the coarse grid
+        (0.0512, 1e-4),  # between two points, narrower than the coarse step
+        (-1.234, 5e-4),
+    ],
+)
+def test_refine_energy_grid_lorentzian(energy, width):
+    """The resonance is resolved, wherever it falls on the coarse grid."""
+
+    E, T = refine_energy_grid(
+        lorentzian(energy, width),
+        E_min=-3.0,
+        E_max=3.0,
+        E_coarse_step=1e-1,
+        tolerance=1e-3,
+        max_depth=12,
+    )
+
+    assert np.all(np.diff(E) > 0)
+    assert T.max() == pytest.approx(1.0, abs=1e-2)
+    assert E[np.argmax(T)] == pytest.approx(energy, abs=width)
+
+    # the area of the resonance, pi * width, less its tails outside the window
+    area = np.sum(np.diff(E) * (T[1:] + T[:-1] - 2e-3) / 2)
+    assert area == pytest.approx(np.pi * width, rel=2e-2)
+
+    # far fewer points than a uniform grid of the finest step
+    assert E.size < 6.0 / (1e-1 / 2**12) / 100
+
+
+def test_refine_energy_grid_smooth():
+    """A linear transmission is left on the coarse grid."""
+
+    E, T = refine_energy_grid(
+        lambda energies: 0.1 * energies + 0.5,
+        E_min=-3.0,
+        E_max=3.0,
+        E_coarse_step=1e-1,
+        tolerance=1e-3,
+        max_depth=12,
+    )
+
+    # the coarse grid, and the midpoints of its first (and only) bisection
+    assert E.size == 2 * 61 - 1
+    assert np.allclose(T, 0.1 * E + 0.5)